@@ -0,0 +1,155 @@
+"""logs.comercio_id e índices para consulta do histórico
+
+Revision ID: 0a7c5e3b9d26
+Revises: f3b9d2a7c814
+Create Date: 2026-10-18 19:48:12.507734
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0a7c5e3b9d26'
+down_revision: Union[str, Sequence[str], None] = 'f3b9d2a7c814'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+_FN_LOG_ALTERACOES = """
+    CREATE OR REPLACE FUNCTION fn_log_alteracoes() RETURNS trigger AS $$
+    DECLARE
+        pk_col TEXT := TG_ARGV[0];
+        linha_antiga JSONB;
+        antigo JSONB;
+        novo JSONB;
+        v_comercio_id INTEGER;
+    BEGIN
+        IF TG_OP NOT IN ('UPDATE', 'DELETE') THEN
+            RETURN NEW;
+        END IF;
+
+        IF pk_col IS NULL THEN
+            SELECT a.attname INTO pk_col
+            FROM pg_index i
+            JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey)
+            WHERE i.indrelid = TG_RELID AND i.indisprimary
+            LIMIT 1;
+        END IF;
+
+        linha_antiga := to_jsonb(OLD);
+        antigo := linha_antiga;
+        {comercio}
+        IF TG_OP = 'UPDATE' THEN
+            SELECT jsonb_object_agg(o.key, o.value), jsonb_object_agg(o.key, n.value)
+            INTO antigo, novo
+            FROM jsonb_each(linha_antiga) o
+            JOIN jsonb_each(to_jsonb(NEW)) n ON n.key = o.key
+            WHERE o.value IS DISTINCT FROM n.value
+              AND o.key NOT IN ('atualizado_em', 'updated_at');
+
+            IF antigo IS NULL THEN
+                RETURN NEW;  -- nada mudou de fato
+            END IF;
+        END IF;
+
+        IF current_setting('app.logs_assincronos', true) = 'on' THEN
+            INSERT INTO logs_pendentes(tabela_nome, record_id, operacao, alterado_por, antigo_dado, novo_dado{coluna})
+            VALUES (TG_TABLE_NAME, COALESCE(linha_antiga ->> pk_col, ''), TG_OP, app_usuario_id(), antigo, novo{valor});
+        ELSE
+            INSERT INTO logs(tabela_nome, record_id, operacao, alterado_por, antigo_dado, novo_dado{coluna})
+            VALUES (TG_TABLE_NAME, COALESCE(linha_antiga ->> pk_col, ''), TG_OP, app_usuario_id(), antigo, novo{valor});
+        END IF;
+
+        IF TG_OP = 'DELETE' THEN
+            RETURN OLD;
+        END IF;
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql;
+"""
+
+_FN_LOGS_DESCARREGAR = """
+    CREATE OR REPLACE FUNCTION fn_logs_descarregar(p_lote integer DEFAULT 5000)
+    RETURNS integer
+    LANGUAGE plpgsql
+    AS $$
+    DECLARE
+        n integer;
+    BEGIN
+        WITH lote AS (
+            SELECT pendente_id FROM logs_pendentes
+            ORDER BY pendente_id
+            LIMIT p_lote
+            FOR UPDATE SKIP LOCKED
+        ), movidos AS (
+            DELETE FROM logs_pendentes p USING lote
+            WHERE p.pendente_id = lote.pendente_id
+            RETURNING p.*
+        )
+        INSERT INTO logs (tabela_nome, record_id, operacao, alterado_por, alterado_em, antigo_dado, novo_dado{coluna})
+        SELECT m.tabela_nome, m.record_id, m.operacao,
+               -- usuário pode ter sido excluído enquanto a linha esperava
+               (SELECT u.usuario_id FROM usuarios u WHERE u.usuario_id = m.alterado_por),
+               m.alterado_em, m.antigo_dado, m.novo_dado{valor_m}
+        FROM movidos m
+        ORDER BY m.pendente_id;
+        GET DIAGNOSTICS n = ROW_COUNT;
+        RETURN n;
+    END;
+    $$;
+"""
+
+# tabelas cujo registro pertence a um comércio: comercios pela própria PK, o resto pela coluna
+_COMERCIO_DA_LINHA = """
+        v_comercio_id := (linha_antiga ->> CASE WHEN TG_TABLE_NAME = 'comercios' THEN pk_col ELSE 'comercio_id' END)::integer;
+"""
+
+
+def upgrade() -> None:
+    """
+    Upgrade: logs.comercio_id preenchido pelo trigger a partir da linha (uma vez, na
+    escrita), para a API filtrar por comércio sem abrir o JSON. Backfill do histórico
+    pelo payload e, nas linhas de diff sem comercio_id, pela tabela de origem.
+    Índices criados no pai particionado (propagam para as partições; CONCURRENTLY
+    não é suportado em tabela particionada, então há lock de escrita durante a criação).
+    """
+    op.add_column('logs', sa.Column('comercio_id', sa.Integer(), nullable=True))
+    op.add_column('logs_pendentes', sa.Column('comercio_id', sa.Integer(), nullable=True))
+
+    op.execute(sa.DDL(_FN_LOG_ALTERACOES.format(
+        comercio=_COMERCIO_DA_LINHA, coluna=", comercio_id", valor=", v_comercio_id")))
+    op.execute(sa.DDL(_FN_LOGS_DESCARREGAR.format(coluna=", comercio_id", valor_m=", m.comercio_id")))
+
+    op.execute(sa.DDL("""
+    UPDATE logs
+    SET comercio_id = CASE
+        WHEN tabela_nome = 'comercios' THEN NULLIF(record_id, '')::integer
+        ELSE (COALESCE(antigo_dado, novo_dado)::jsonb ->> 'comercio_id')::integer
+    END
+    WHERE comercio_id IS NULL AND tabela_nome <> 'usuarios' AND tabela_nome <> 'enderecos';
+    """))
+    for tabela, pk in (('produtos', 'produto_id'), ('fornecedores', 'fornecedor_id'), ('convites', 'convite_id')):
+        op.execute(sa.DDL(f"""
+        UPDATE logs l
+        SET comercio_id = t.comercio_id
+        FROM {tabela} t
+        WHERE l.comercio_id IS NULL AND l.tabela_nome = '{tabela}' AND l.record_id = t.{pk}::text;
+        """))
+
+    op.create_index('ix_logs_registro', 'logs',
+                    ['tabela_nome', 'record_id', sa.text('alterado_em DESC'), sa.text('log_id DESC')])
+    op.create_index('ix_logs_comercio_alterado_em', 'logs',
+                    ['comercio_id', sa.text('alterado_em DESC'), sa.text('log_id DESC')])
+
+
+def downgrade() -> None:
+    """Downgrade: volta as funções sem comercio_id e remove coluna e índices."""
+    op.drop_index('ix_logs_comercio_alterado_em', table_name='logs')
+    op.drop_index('ix_logs_registro', table_name='logs')
+    op.execute(sa.DDL(_FN_LOG_ALTERACOES.format(comercio="", coluna="", valor="")))
+    op.execute(sa.DDL(_FN_LOGS_DESCARREGAR.format(coluna="", valor_m="")))
+    op.drop_column('logs_pendentes', 'comercio_id')
+    op.drop_column('logs', 'comercio_id')
@@ -0,0 +1,40 @@
+"""app_usuario_id() trata app.usuario_id vazio como NULL
+
+Revision ID: 1d4f8a6c3e72
+Revises: 0a7c5e3b9d26
+Create Date: 2026-10-18 20:31:06.842159
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1d4f8a6c3e72'
+down_revision: Union[str, Sequence[str], None] = '0a7c5e3b9d26'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """
+    Upgrade: app.usuario_id agora é setado no nível da sessão e fica na conexão do
+    pool; sem usuário logado a aplicação limpa com '' (um GUC customizado não volta a
+    ser "não definido"), que aqui precisa virar NULL em vez de erro no cast.
+    """
+    op.execute(sa.DDL("""
+    CREATE OR REPLACE FUNCTION app_usuario_id() RETURNS integer AS $$
+      SELECT NULLIF(current_setting('app.usuario_id', true), '')::int;
+    $$ LANGUAGE sql STABLE;
+    """))
+
+
+def downgrade() -> None:
+    """Downgrade: volta o cast direto."""
+    op.execute(sa.DDL("""
+    CREATE OR REPLACE FUNCTION app_usuario_id() RETURNS integer AS $$
+      SELECT (current_setting('app.usuario_id', true))::int;
+    $$ LANGUAGE sql STABLE;
+    """))
@@ -0,0 +1,149 @@
+"""Policies RLS com array de comércios do usuário calculado uma vez por statement
+
+Revision ID: 2b7e9c4d1f83
+Revises: 1d4f8a6c3e72
+Create Date: 2026-10-18 20:58:37.214906
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2b7e9c4d1f83'
+down_revision: Union[str, Sequence[str], None] = '1d4f8a6c3e72'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (SELECT f()) vira InitPlan: roda uma vez por statement e o ANY usa o índice em comercio_id
+_USUARIO = "(SELECT app_usuario_id())"
+_MEMBRO = "comercio_id = ANY ((SELECT fn_comercios_do_usuario()))"
+_OPERADOR = "comercio_id = ANY ((SELECT fn_comercios_operados_pelo_usuario()))"
+
+
+def _existe(tabela: str, alias: str = "cu", operador: bool = False) -> str:
+    """EXISTS correlacionado das policies antigas (fada8cbded5a / ce51fffa5490)."""
+    filtro = f"\n            AND {alias}.permissao = 'operador'" if operador else ""
+    return f"""EXISTS (
+          SELECT 1 FROM comercios_usuarios {alias}
+          WHERE {alias}.comercio_id = {tabela}.comercio_id
+            AND {alias}.usuario_id = app_usuario_id(){filtro}
+        )"""
+
+
+# nome -> (tabela, comando, USING, WITH CHECK) ; None = cláusula ausente
+POLICIES_NOVAS = {
+    "comercios_select": ("comercios", "SELECT", f"proprietario_id = {_USUARIO} OR {_MEMBRO}", None),
+    "comercios_update": ("comercios", "UPDATE",
+                         f"proprietario_id = {_USUARIO} OR {_OPERADOR}",
+                         f"proprietario_id = {_USUARIO} OR {_OPERADOR}"),
+    "comercios_insert": ("comercios", "INSERT", None,
+                         f"proprietario_id = {_USUARIO} AND "
+                         f"(SELECT COUNT(*) FROM comercios c WHERE c.proprietario_id = {_USUARIO}) < 5"),
+    "comercios_usuarios_select": ("comercios_usuarios", "SELECT", f"usuario_id = {_USUARIO} OR {_OPERADOR}", None),
+    "comercios_usuarios_manage": ("comercios_usuarios", "ALL", _OPERADOR, _OPERADOR),
+    "produtos_select": ("produtos", "SELECT", _MEMBRO, None),
+    "produtos_update": ("produtos", "UPDATE", _MEMBRO, _MEMBRO),
+    "produtos_insert": ("produtos", "INSERT", None, _MEMBRO),
+    "convites_select": ("convites", "SELECT", _MEMBRO, None),
+    "convites_insert": ("convites", "INSERT", None, _OPERADOR),
+    "unidade_medidas_select": ("unidade_medidas", "SELECT", f"comercio_id IS NULL OR {_MEMBRO}", None),
+    "unidade_medidas_insert": ("unidade_medidas", "INSERT", None, f"comercio_id IS NULL OR {_MEMBRO}"),
+    "unidade_medidas_update": ("unidade_medidas", "UPDATE",
+                               f"comercio_id IS NULL OR {_MEMBRO}", f"comercio_id IS NULL OR {_MEMBRO}"),
+    "unidade_medidas_delete": ("unidade_medidas", "DELETE", f"comercio_id IS NULL OR {_OPERADOR}", None),
+}
+
+POLICIES_ANTIGAS = {
+    "comercios_select": ("comercios", "SELECT",
+                         f"proprietario_id = app_usuario_id() OR {_existe('comercios')}", None),
+    "comercios_update": ("comercios", "UPDATE",
+                         f"proprietario_id = app_usuario_id() OR {_existe('comercios', operador=True)}",
+                         f"proprietario_id = app_usuario_id() OR {_existe('comercios', operador=True)}"),
+    "comercios_insert": ("comercios", "INSERT", None,
+                         "proprietario_id = app_usuario_id() AND "
+                         "(SELECT COUNT(*) FROM comercios c WHERE c.proprietario_id = app_usuario_id()) < 5"),
+    "comercios_usuarios_select": ("comercios_usuarios", "SELECT",
+                                  f"usuario_id = app_usuario_id() OR {_existe('comercios_usuarios', 'cu2', True)}",
+                                  None),
+    "comercios_usuarios_manage": ("comercios_usuarios", "ALL",
+                                  _existe('comercios_usuarios', 'cu2', True),
+                                  _existe('comercios_usuarios', 'cu2', True)),
+    "produtos_select": ("produtos", "SELECT", _existe('produtos'), None),
+    "produtos_update": ("produtos", "UPDATE", _existe('produtos'), _existe('produtos')),
+    "produtos_insert": ("produtos", "INSERT", None, _existe('produtos')),
+    "convites_select": ("convites", "SELECT", _existe('convites'), None),
+    "convites_insert": ("convites", "INSERT", None, _existe('convites', operador=True)),
+    "unidade_medidas_select": ("unidade_medidas", "SELECT",
+                               f"comercio_id IS NULL OR {_existe('unidade_medidas')}", None),
+    "unidade_medidas_insert": ("unidade_medidas", "INSERT", None,
+                               f"comercio_id IS NULL OR {_existe('unidade_medidas')}"),
+    "unidade_medidas_update": ("unidade_medidas", "UPDATE",
+                               f"comercio_id IS NULL OR {_existe('unidade_medidas')}",
+                               f"comercio_id IS NULL OR {_existe('unidade_medidas')}"),
+    "unidade_medidas_delete": ("unidade_medidas", "DELETE",
+                               f"comercio_id IS NULL OR {_existe('unidade_medidas', operador=True)}", None),
+}
+
+
+def _recriar_policies(policies: dict) -> None:
+    for nome, (tabela, comando, using, check) in policies.items():
+        op.execute(f"DROP POLICY IF EXISTS {nome} ON {tabela};")
+        sql = f"CREATE POLICY {nome} ON {tabela}\n      FOR {comando}"
+        if using is not None:
+            sql += f"\n      USING ({using})"
+        if check is not None:
+            sql += f"\n      WITH CHECK ({check})"
+        op.execute(sa.DDL(sql + ";"))
+
+
+def upgrade() -> None:
+    """
+    Upgrade: as policies deixam de ter EXISTS correlacionado em comercios_usuarios
+    (executado por linha) e passam a comparar comercio_id com o array de comércios do
+    usuário, calculado uma vez por statement via InitPlan.
+    - fn_comercios_do_usuario / fn_comercios_operados_pelo_usuario: SQL STABLE,
+      SECURITY DEFINER (leem comercios_usuarios sem passar pela policy dela — o que
+      também acaba com a auto-referência da policy de comercios_usuarios) e
+      search_path fixo. Usam ix_comercios_usuarios_usuario_comercio.
+    - mesma semântica das policies antigas, inclusive a exigência de 'operador'.
+    """
+    op.execute(sa.DDL("""
+    CREATE OR REPLACE FUNCTION fn_comercios_do_usuario()
+    RETURNS integer[]
+    LANGUAGE sql
+    STABLE
+    SECURITY DEFINER
+    SET search_path = public, pg_temp
+    AS $$
+        SELECT COALESCE(array_agg(cu.comercio_id), '{}')
+        FROM comercios_usuarios cu
+        WHERE cu.usuario_id = app_usuario_id();
+    $$;
+    """))
+    op.execute(sa.DDL("""
+    CREATE OR REPLACE FUNCTION fn_comercios_operados_pelo_usuario()
+    RETURNS integer[]
+    LANGUAGE sql
+    STABLE
+    SECURITY DEFINER
+    SET search_path = public, pg_temp
+    AS $$
+        SELECT COALESCE(array_agg(cu.comercio_id), '{}')
+        FROM comercios_usuarios cu
+        WHERE cu.usuario_id = app_usuario_id()
+          AND cu.permissao = 'operador';
+    $$;
+    """))
+
+    _recriar_policies(POLICIES_NOVAS)
+
+
+def downgrade() -> None:
+    """Downgrade: volta as policies com EXISTS e remove as funções."""
+    _recriar_policies(POLICIES_ANTIGAS)
+    op.execute("DROP FUNCTION IF EXISTS fn_comercios_operados_pelo_usuario();")
+    op.execute("DROP FUNCTION IF EXISTS fn_comercios_do_usuario();")
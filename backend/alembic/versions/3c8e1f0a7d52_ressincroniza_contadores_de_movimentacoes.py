@@ -0,0 +1,67 @@
+"""Ressincroniza contadores de movimentações
+
+Revision ID: 3c8e1f0a7d52
+Revises: b963b5ebfb9a
+Create Date: 2026-10-18 11:02:17.530981
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c8e1f0a7d52'
+down_revision: Union[str, Sequence[str], None] = 'b963b5ebfb9a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """
+    Upgrade: leva contadores mov_entrada/mov_saida até o MAX(codigo) atual.
+    Até aqui o código das movimentações vinha de MAX(codigo)+1 e os contadores
+    ficaram para trás; a partir de agora eles são a fonte do código.
+    """
+    t_movimentacoes = sa.table(
+        'movimentacoes',
+        sa.column('comercio_id', sa.Integer),
+        sa.column('tipo', sa.String),
+        sa.column('codigo', sa.Integer),
+    )
+    t_contadores = sa.table(
+        'contadores_locais',
+        sa.column('comercio_id', sa.Integer),
+        sa.column('scope', sa.String),
+        sa.column('ultimo_codigo', sa.Integer),
+        sa.column('updated_at', sa.DateTime(timezone=True)),
+    )
+
+    select_max = sa.select(
+        t_movimentacoes.c.comercio_id,
+        (sa.literal("mov_") + t_movimentacoes.c.tipo).label("scope"),
+        sa.func.max(t_movimentacoes.c.codigo).label("ultimo_codigo"),
+        sa.func.now().label("updated_at")
+    ).group_by(
+        t_movimentacoes.c.comercio_id,
+        t_movimentacoes.c.tipo
+    )
+
+    insert_stmt = pg_insert(t_contadores).from_select(
+        ['comercio_id', 'scope', 'ultimo_codigo', 'updated_at'],
+        select_max
+    )
+    op.execute(insert_stmt.on_conflict_do_update(
+        index_elements=['comercio_id', 'scope'],
+        set_={
+            'ultimo_codigo': sa.func.greatest(t_contadores.c.ultimo_codigo, insert_stmt.excluded.ultimo_codigo),
+            'updated_at': sa.func.now()
+        }
+    ))
+
+
+def downgrade() -> None:
+    """Downgrade: nada a desfazer (contadores só avançaram)."""
+    pass
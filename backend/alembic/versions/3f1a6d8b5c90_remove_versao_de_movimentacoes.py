@@ -0,0 +1,52 @@
+"""Remove os triggers de versão de movimentacoes (linha quente por comércio)
+
+Revision ID: 3f1a6d8b5c90
+Revises: 2b7e9c4d1f83
+Create Date: 2026-10-18 21:40:19.305712
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1a6d8b5c90'
+down_revision: Union[str, Sequence[str], None] = '2b7e9c4d1f83'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """
+    Upgrade: todo UPDATE em movimentacoes (inclusive o do cabeçalho a cada item lido no
+    caixa) subia (comercio_id, 'movimentacoes') em versoes_colecoes e segurava essa linha
+    até o commit, serializando os caixas do comércio. O ETag das listagens de
+    movimentações passa a vir de um hash das próprias linhas (versoes_service).
+    """
+    for sufixo in ("ins", "upd", "del"):
+        op.execute(f"DROP TRIGGER IF EXISTS trg_versao_movimentacoes_{sufixo} ON movimentacoes;")
+    op.execute(sa.DDL("DELETE FROM versoes_colecoes WHERE colecao = 'movimentacoes';"))
+
+
+def downgrade() -> None:
+    """Downgrade: recria os triggers de statement da revisão 5e8b2c6d9f14."""
+    op.execute(sa.DDL("""
+    CREATE TRIGGER trg_versao_movimentacoes_ins
+    AFTER INSERT ON movimentacoes
+    REFERENCING NEW TABLE AS novas
+    FOR EACH STATEMENT EXECUTE FUNCTION fn_incrementar_versao_colecao('movimentacoes');
+    """))
+    op.execute(sa.DDL("""
+    CREATE TRIGGER trg_versao_movimentacoes_upd
+    AFTER UPDATE ON movimentacoes
+    REFERENCING OLD TABLE AS antigas NEW TABLE AS novas
+    FOR EACH STATEMENT EXECUTE FUNCTION fn_incrementar_versao_colecao('movimentacoes');
+    """))
+    op.execute(sa.DDL("""
+    CREATE TRIGGER trg_versao_movimentacoes_del
+    AFTER DELETE ON movimentacoes
+    REFERENCING OLD TABLE AS antigas
+    FOR EACH STATEMENT EXECUTE FUNCTION fn_incrementar_versao_colecao('movimentacoes');
+    """))
@@ -0,0 +1,58 @@
+"""Nome de fornecedor único por comércio (case-insensitive)
+
+Revision ID: 4a9c2e7f1b36
+Revises: 3f1a6d8b5c90
+Create Date: 2026-10-18 22:05:51.638027
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4a9c2e7f1b36'
+down_revision: Union[str, Sequence[str], None] = '3f1a6d8b5c90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """
+    Upgrade: ux_fornecedores_comercio_lower_nome (único) substitui o índice comum da
+    revisão 7a2d94c0e6b1, para o get-or-create do resolvedor usar ON CONFLICT e duas
+    importações simultâneas não criarem o mesmo fornecedor duas vezes.
+    Falha antes de criar o índice se já houver nomes repetidos (juntar na mão antes).
+    """
+    conn = op.get_bind()
+    dup_count = conn.scalar(sa.text(
+        "SELECT COUNT(*) FROM ("
+        "  SELECT comercio_id, lower(nome) FROM fornecedores"
+        "  GROUP BY comercio_id, lower(nome) HAVING COUNT(*) > 1"
+        ") t"
+    ))
+    if dup_count:
+        raise sa.exc.OperationalError(
+            f"Não dá para criar o índice único: {dup_count} nomes de fornecedor repetidos "
+            "no mesmo comércio (ignorando maiúsculas). Junte os duplicados antes de migrar.",
+            None, None,
+        )
+
+    # CONCURRENTLY não roda dentro de transação
+    with op.get_context().autocommit_block():
+        op.create_index('ux_fornecedores_comercio_lower_nome', 'fornecedores',
+                        ['comercio_id', sa.text('lower(nome)')], unique=True,
+                        postgresql_concurrently=True, if_not_exists=True)
+        op.drop_index('ix_fornecedores_comercio_lower_nome', table_name='fornecedores',
+                      postgresql_concurrently=True, if_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade: volta o índice comum."""
+    with op.get_context().autocommit_block():
+        op.create_index('ix_fornecedores_comercio_lower_nome', 'fornecedores',
+                        ['comercio_id', sa.text('lower(nome)')], unique=False,
+                        postgresql_concurrently=True, if_not_exists=True)
+        op.drop_index('ux_fornecedores_comercio_lower_nome', table_name='fornecedores',
+                      postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,105 @@
+"""Cria versoes_colecoes e triggers de versão das listagens
+
+Revision ID: 5e8b2c6d9f14
+Revises: 7a2d94c0e6b1
+Create Date: 2026-10-18 14:21:43.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e8b2c6d9f14'
+down_revision: Union[str, Sequence[str], None] = '7a2d94c0e6b1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# tabela -> nome da coleção (o mesmo usado em versoes_service)
+TABELAS = {
+    "produtos": "produtos",
+    "categorias": "categorias",
+    "fornecedores": "fornecedores",
+    "unidade_medidas": "unidades",
+    "movimentacoes": "movimentacoes",
+}
+
+
+def upgrade() -> None:
+    """
+    Upgrade: versão por (comercio_id, coleção), incrementada por triggers FOR EACH
+    STATEMENT com transition tables — um UPDATE de mil linhas sobe a versão uma vez
+    por comércio afetado, não mil. Unidades globais (comercio_id NULL) usam comercio_id 0.
+    """
+    op.create_table(
+        'versoes_colecoes',
+        sa.Column('comercio_id', sa.Integer(), nullable=False),
+        sa.Column('colecao', sa.String(length=32), nullable=False),
+        sa.Column('versao', sa.BigInteger(), server_default='0', nullable=False),
+        sa.Column('atualizado_em', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('comercio_id', 'colecao'),
+    )
+
+    # ORDER BY: vários comércios no mesmo statement travam as linhas sempre na mesma ordem
+    op.execute(sa.DDL("""
+    CREATE OR REPLACE FUNCTION fn_incrementar_versao_colecao()
+    RETURNS trigger
+    LANGUAGE plpgsql
+    AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            INSERT INTO versoes_colecoes (comercio_id, colecao, versao)
+            SELECT DISTINCT COALESCE(comercio_id, 0), TG_ARGV[0], 1 FROM novas ORDER BY 1
+            ON CONFLICT (comercio_id, colecao)
+            DO UPDATE SET versao = versoes_colecoes.versao + 1, atualizado_em = now();
+        ELSIF TG_OP = 'DELETE' THEN
+            INSERT INTO versoes_colecoes (comercio_id, colecao, versao)
+            SELECT DISTINCT COALESCE(comercio_id, 0), TG_ARGV[0], 1 FROM antigas ORDER BY 1
+            ON CONFLICT (comercio_id, colecao)
+            DO UPDATE SET versao = versoes_colecoes.versao + 1, atualizado_em = now();
+        ELSE
+            INSERT INTO versoes_colecoes (comercio_id, colecao, versao)
+            SELECT c, TG_ARGV[0], 1 FROM (
+                SELECT COALESCE(comercio_id, 0) AS c FROM novas
+                UNION
+                SELECT COALESCE(comercio_id, 0) FROM antigas
+            ) afetados ORDER BY 1
+            ON CONFLICT (comercio_id, colecao)
+            DO UPDATE SET versao = versoes_colecoes.versao + 1, atualizado_em = now();
+        END IF;
+        RETURN NULL;
+    END;
+    $$;
+    """))
+
+    # transition tables exigem um trigger por evento
+    for tabela, colecao in TABELAS.items():
+        op.execute(sa.DDL(f"""
+        CREATE TRIGGER trg_versao_{tabela}_ins
+        AFTER INSERT ON {tabela}
+        REFERENCING NEW TABLE AS novas
+        FOR EACH STATEMENT EXECUTE FUNCTION fn_incrementar_versao_colecao('{colecao}');
+        """))
+        op.execute(sa.DDL(f"""
+        CREATE TRIGGER trg_versao_{tabela}_upd
+        AFTER UPDATE ON {tabela}
+        REFERENCING OLD TABLE AS antigas NEW TABLE AS novas
+        FOR EACH STATEMENT EXECUTE FUNCTION fn_incrementar_versao_colecao('{colecao}');
+        """))
+        op.execute(sa.DDL(f"""
+        CREATE TRIGGER trg_versao_{tabela}_del
+        AFTER DELETE ON {tabela}
+        REFERENCING OLD TABLE AS antigas
+        FOR EACH STATEMENT EXECUTE FUNCTION fn_incrementar_versao_colecao('{colecao}');
+        """))
+
+
+def downgrade() -> None:
+    """Downgrade: remove triggers, função e tabela."""
+    for tabela in TABELAS:
+        for sufixo in ("ins", "upd", "del"):
+            op.execute(f"DROP TRIGGER IF EXISTS trg_versao_{tabela}_{sufixo} ON {tabela};")
+    op.execute("DROP FUNCTION IF EXISTS fn_incrementar_versao_colecao();")
+    op.drop_table('versoes_colecoes')
@@ -0,0 +1,53 @@
+"""Versão global de acessos: sobe quando vínculos de comercios_usuarios somem ou mudam
+
+Revision ID: 6c1e4b8a2d57
+Revises: 4a9c2e7f1b36
+Create Date: 2026-10-18 23:12:08.471395
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6c1e4b8a2d57'
+down_revision: Union[str, Sequence[str], None] = '4a9c2e7f1b36'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """
+    Upgrade: (0, 'acessos') em versoes_colecoes sobe a cada DELETE/UPDATE em
+    comercios_usuarios (inclusive o cascade da exclusão de um comércio). Cada worker
+    confere essa versão e limpa o cache local de acessos (usuarios_service) quando ela
+    muda. INSERT não sobe: o cache só guarda positivos, um vínculo novo não o invalida.
+    """
+    op.execute(sa.DDL("""
+    CREATE OR REPLACE FUNCTION fn_incrementar_versao_acessos()
+    RETURNS trigger
+    LANGUAGE plpgsql
+    AS $$
+    BEGIN
+        INSERT INTO versoes_colecoes (comercio_id, colecao, versao)
+        VALUES (0, 'acessos', 1)
+        ON CONFLICT (comercio_id, colecao)
+        DO UPDATE SET versao = versoes_colecoes.versao + 1, atualizado_em = now();
+        RETURN NULL;
+    END;
+    $$;
+    """))
+    op.execute(sa.DDL("""
+    CREATE TRIGGER trg_versao_acessos
+    AFTER UPDATE OR DELETE ON comercios_usuarios
+    FOR EACH STATEMENT EXECUTE FUNCTION fn_incrementar_versao_acessos();
+    """))
+
+
+def downgrade() -> None:
+    """Downgrade: remove trigger, função e a linha da versão."""
+    op.execute("DROP TRIGGER IF EXISTS trg_versao_acessos ON comercios_usuarios;")
+    op.execute("DROP FUNCTION IF EXISTS fn_incrementar_versao_acessos();")
+    op.execute(sa.DDL("DELETE FROM versoes_colecoes WHERE comercio_id = 0 AND colecao = 'acessos';"))
@@ -0,0 +1,41 @@
+"""Índices lower(nome) para os resolvedores
+
+Revision ID: 7a2d94c0e6b1
+Revises: 3c8e1f0a7d52
+Create Date: 2026-10-18 13:40:05.771342
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7a2d94c0e6b1'
+down_revision: Union[str, Sequence[str], None] = '3c8e1f0a7d52'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+INDICES = (
+    ('ix_categorias_comercio_lower_nome', 'categorias', ['comercio_id', sa.text('lower(nome)')]),
+    ('ix_fornecedores_comercio_lower_nome', 'fornecedores', ['comercio_id', sa.text('lower(nome)')]),
+    ('ix_unidade_medidas_lower_sigla', 'unidade_medidas', [sa.text('lower(sigla)')]),
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema: índices funcionais para busca case-insensitive por nome/sigla."""
+    # CONCURRENTLY não roda dentro de transação
+    with op.get_context().autocommit_block():
+        for nome, tabela, colunas in INDICES:
+            op.create_index(nome, tabela, colunas, unique=False,
+                            postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema: remove os índices funcionais."""
+    with op.get_context().autocommit_block():
+        for nome, tabela, _ in INDICES:
+            op.drop_index(nome, table_name=tabela, postgresql_concurrently=True, if_exists=True)
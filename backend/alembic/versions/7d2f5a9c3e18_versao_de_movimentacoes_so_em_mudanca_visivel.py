@@ -0,0 +1,91 @@
+"""Versão de movimentações só em INSERT, DELETE e mudança de estado/linha fechada
+
+Revision ID: 7d2f5a9c3e18
+Revises: 6c1e4b8a2d57
+Create Date: 2026-10-18 23:48:36.905214
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7d2f5a9c3e18'
+down_revision: Union[str, Sequence[str], None] = '6c1e4b8a2d57'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """
+    Upgrade: (comercio_id, 'movimentacoes') volta a existir em versoes_colecoes, mas só
+    sobe quando a parte "parada" da listagem muda: movimentação criada ou apagada, troca
+    de estado, ou qualquer alteração numa movimentação já fechada. O UPDATE do cabeçalho
+    a cada item lido no caixa (movimentação aberta, estado igual) não toca a versão, então
+    não volta a linha quente da 3f1a6d8b5c90. As abertas entram no ETag por hash
+    (versoes_service.etag_movimentacoes), lidas pelo índice parcial das abertas.
+    """
+    op.execute(sa.DDL("""
+    CREATE OR REPLACE FUNCTION fn_incrementar_versao_movimentacoes()
+    RETURNS trigger
+    LANGUAGE plpgsql
+    AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            INSERT INTO versoes_colecoes (comercio_id, colecao, versao)
+            SELECT DISTINCT comercio_id, 'movimentacoes', 1 FROM novas ORDER BY 1
+            ON CONFLICT (comercio_id, colecao)
+            DO UPDATE SET versao = versoes_colecoes.versao + 1, atualizado_em = now();
+        ELSIF TG_OP = 'DELETE' THEN
+            INSERT INTO versoes_colecoes (comercio_id, colecao, versao)
+            SELECT DISTINCT comercio_id, 'movimentacoes', 1 FROM antigas ORDER BY 1
+            ON CONFLICT (comercio_id, colecao)
+            DO UPDATE SET versao = versoes_colecoes.versao + 1, atualizado_em = now();
+        ELSE
+            INSERT INTO versoes_colecoes (comercio_id, colecao, versao)
+            SELECT c, 'movimentacoes', 1 FROM (
+                SELECT a.comercio_id AS c
+                FROM antigas a JOIN novas n ON n.mov_id = a.mov_id
+                WHERE a.estado IS DISTINCT FROM n.estado
+                   OR a.comercio_id IS DISTINCT FROM n.comercio_id
+                   OR (a.estado <> 'aberta' AND (a.*) IS DISTINCT FROM (n.*))
+                UNION
+                SELECT n.comercio_id
+                FROM antigas a JOIN novas n ON n.mov_id = a.mov_id
+                WHERE a.comercio_id IS DISTINCT FROM n.comercio_id
+            ) afetados ORDER BY 1
+            ON CONFLICT (comercio_id, colecao)
+            DO UPDATE SET versao = versoes_colecoes.versao + 1, atualizado_em = now();
+        END IF;
+        RETURN NULL;
+    END;
+    $$;
+    """))
+    op.execute(sa.DDL("""
+    CREATE TRIGGER trg_versao_movimentacoes_ins
+    AFTER INSERT ON movimentacoes
+    REFERENCING NEW TABLE AS novas
+    FOR EACH STATEMENT EXECUTE FUNCTION fn_incrementar_versao_movimentacoes();
+    """))
+    op.execute(sa.DDL("""
+    CREATE TRIGGER trg_versao_movimentacoes_upd
+    AFTER UPDATE ON movimentacoes
+    REFERENCING OLD TABLE AS antigas NEW TABLE AS novas
+    FOR EACH STATEMENT EXECUTE FUNCTION fn_incrementar_versao_movimentacoes();
+    """))
+    op.execute(sa.DDL("""
+    CREATE TRIGGER trg_versao_movimentacoes_del
+    AFTER DELETE ON movimentacoes
+    REFERENCING OLD TABLE AS antigas
+    FOR EACH STATEMENT EXECUTE FUNCTION fn_incrementar_versao_movimentacoes();
+    """))
+
+
+def downgrade() -> None:
+    """Downgrade: volta ao estado da 3f1a6d8b5c90 (sem versão de movimentações)."""
+    for sufixo in ("ins", "upd", "del"):
+        op.execute(f"DROP TRIGGER IF EXISTS trg_versao_movimentacoes_{sufixo} ON movimentacoes;")
+    op.execute("DROP FUNCTION IF EXISTS fn_incrementar_versao_movimentacoes();")
+    op.execute(sa.DDL("DELETE FROM versoes_colecoes WHERE colecao = 'movimentacoes';"))
@@ -0,0 +1,253 @@
+"""Cria resumos_comercio (contadores do dashboard) e triggers de manutenção
+
+Revision ID: 9b3e7f2a4c61
+Revises: 5e8b2c6d9f14
+Create Date: 2026-10-18 15:47:09.602318
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9b3e7f2a4c61'
+down_revision: Union[str, Sequence[str], None] = '5e8b2c6d9f14'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# aplica o delta das linhas (sinal +1 = estado novo, -1 = estado antigo) no resumo
+_DELTA_PRODUTOS = """
+            UPDATE resumos_comercio r
+            SET zero_count = r.zero_count + d.dz,
+                low_count = r.low_count + d.dl,
+                atualizado_em = now()
+            FROM (
+                SELECT l.comercio_id,
+                       sum(l.sinal * (l.quantidade_estoque = 0)::int) AS dz,
+                       sum(l.sinal * fn_produto_estoque_baixo(l.quantidade_estoque, l.limite_estoque, rr.limite_global)::int) AS dl
+                FROM ({fonte}) l
+                JOIN resumos_comercio rr ON rr.comercio_id = l.comercio_id
+                GROUP BY l.comercio_id
+            ) d
+            WHERE r.comercio_id = d.comercio_id AND (d.dz <> 0 OR d.dl <> 0);
+"""
+
+_DELTA_MOVIMENTACOES = """
+            UPDATE resumos_comercio r
+            SET faturamento_total = r.faturamento_total + d.df,
+                atualizado_em = now()
+            FROM (
+                SELECT l.comercio_id,
+                       sum(CASE WHEN lower(l.tipo) = 'saida' AND lower(l.estado) = 'fechada'
+                                THEN l.sinal * l.valor_total ELSE 0 END) AS df
+                FROM ({fonte}) l
+                GROUP BY l.comercio_id
+            ) d
+            WHERE r.comercio_id = d.comercio_id AND d.df <> 0;
+"""
+
+
+def _funcao_delta(nome: str, modelo: str, colunas: str) -> str:
+    novas = f"SELECT {colunas}, 1 AS sinal FROM novas"
+    antigas = f"SELECT {colunas}, -1 AS sinal FROM antigas"
+    return f"""
+    CREATE OR REPLACE FUNCTION {nome}()
+    RETURNS trigger
+    LANGUAGE plpgsql
+    AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+{modelo.format(fonte=novas)}
+        ELSIF TG_OP = 'DELETE' THEN
+{modelo.format(fonte=antigas)}
+        ELSE
+{modelo.format(fonte=novas + " UNION ALL " + antigas)}
+        END IF;
+        RETURN NULL;
+    END;
+    $$;
+    """
+
+
+def _triggers_de_statement(tabela: str, funcao: str) -> None:
+    # transition tables exigem um trigger por evento
+    op.execute(sa.DDL(f"""
+    CREATE TRIGGER trg_resumo_{tabela}_ins AFTER INSERT ON {tabela}
+    REFERENCING NEW TABLE AS novas
+    FOR EACH STATEMENT EXECUTE FUNCTION {funcao}();
+    """))
+    op.execute(sa.DDL(f"""
+    CREATE TRIGGER trg_resumo_{tabela}_upd AFTER UPDATE ON {tabela}
+    REFERENCING OLD TABLE AS antigas NEW TABLE AS novas
+    FOR EACH STATEMENT EXECUTE FUNCTION {funcao}();
+    """))
+    op.execute(sa.DDL(f"""
+    CREATE TRIGGER trg_resumo_{tabela}_del AFTER DELETE ON {tabela}
+    REFERENCING OLD TABLE AS antigas
+    FOR EACH STATEMENT EXECUTE FUNCTION {funcao}();
+    """))
+
+
+def upgrade() -> None:
+    """
+    Upgrade: uma linha por comércio com zero_count, low_count, limite_global e
+    faturamento_total. Triggers de statement em produtos/movimentacoes aplicam deltas;
+    mudança do limite global (ou da configuração ligada ao comércio) recalcula low_count.
+    Backfill no fim; divergências depois disso são corrigidas por `flask reconciliar-resumos`.
+    """
+    op.create_table(
+        'resumos_comercio',
+        sa.Column('comercio_id', sa.Integer(), nullable=False),
+        sa.Column('zero_count', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('low_count', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('limite_global', sa.Integer(), nullable=True),
+        sa.Column('faturamento_total', sa.Numeric(precision=18, scale=4), server_default='0', nullable=False),
+        sa.Column('atualizado_em', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.ForeignKeyConstraint(['comercio_id'], ['comercios.comercio_id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('comercio_id'),
+    )
+
+    # mesmo critério do card: limite do produto quando existe, senão o global
+    op.execute(sa.DDL("""
+    CREATE OR REPLACE FUNCTION fn_produto_estoque_baixo(qtd integer, limite integer, limite_global integer)
+    RETURNS boolean
+    LANGUAGE sql
+    IMMUTABLE
+    AS $$
+        SELECT qtd > 0 AND CASE
+            WHEN limite IS NOT NULL THEN limite > 0 AND qtd < limite
+            ELSE COALESCE(limite_global, 0) > 0 AND qtd < limite_global
+        END;
+    $$;
+    """))
+
+    op.execute(sa.DDL("""
+    CREATE OR REPLACE FUNCTION fn_recalcular_estoque_baixo(p_comercio_id integer)
+    RETURNS void
+    LANGUAGE plpgsql
+    AS $$
+    DECLARE
+        v_limite integer;
+    BEGIN
+        SELECT trunc(cfg.nivel_alerta_minimo)::integer INTO v_limite
+        FROM comercios c
+        JOIN configuracoes_comercio cfg ON cfg.id = c.configuracao_id
+        WHERE c.comercio_id = p_comercio_id;
+
+        UPDATE resumos_comercio r
+        SET limite_global = v_limite,
+            low_count = (
+                SELECT count(*) FROM produtos p
+                WHERE p.comercio_id = p_comercio_id
+                  AND fn_produto_estoque_baixo(p.quantidade_estoque, p.limite_estoque, v_limite)
+            ),
+            atualizado_em = now()
+        WHERE r.comercio_id = p_comercio_id;
+    END;
+    $$;
+    """))
+
+    op.execute(sa.DDL(_funcao_delta(
+        "fn_resumo_produtos", _DELTA_PRODUTOS, "comercio_id, quantidade_estoque, limite_estoque")))
+    op.execute(sa.DDL(_funcao_delta(
+        "fn_resumo_movimentacoes", _DELTA_MOVIMENTACOES, "comercio_id, tipo, estado, valor_total")))
+    _triggers_de_statement("produtos", "fn_resumo_produtos")
+    _triggers_de_statement("movimentacoes", "fn_resumo_movimentacoes")
+
+    op.execute(sa.DDL("""
+    CREATE OR REPLACE FUNCTION fn_resumo_comercio()
+    RETURNS trigger
+    LANGUAGE plpgsql
+    AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            INSERT INTO resumos_comercio (comercio_id) VALUES (NEW.comercio_id)
+            ON CONFLICT (comercio_id) DO NOTHING;
+        END IF;
+        PERFORM fn_recalcular_estoque_baixo(NEW.comercio_id);
+        RETURN NULL;
+    END;
+    $$;
+    """))
+    op.execute(sa.DDL("""
+    CREATE TRIGGER trg_resumo_comercios_ins
+    AFTER INSERT ON comercios
+    FOR EACH ROW EXECUTE FUNCTION fn_resumo_comercio();
+    """))
+    op.execute(sa.DDL("""
+    CREATE TRIGGER trg_resumo_comercios_config
+    AFTER UPDATE OF configuracao_id ON comercios
+    FOR EACH ROW
+    WHEN (OLD.configuracao_id IS DISTINCT FROM NEW.configuracao_id)
+    EXECUTE FUNCTION fn_resumo_comercio();
+    """))
+
+    op.execute(sa.DDL("""
+    CREATE OR REPLACE FUNCTION fn_resumo_configuracao()
+    RETURNS trigger
+    LANGUAGE plpgsql
+    AS $$
+    DECLARE
+        v_comercio_id integer;
+    BEGIN
+        FOR v_comercio_id IN
+            SELECT comercio_id FROM comercios WHERE configuracao_id = NEW.id ORDER BY comercio_id
+        LOOP
+            PERFORM fn_recalcular_estoque_baixo(v_comercio_id);
+        END LOOP;
+        RETURN NULL;
+    END;
+    $$;
+    """))
+    op.execute(sa.DDL("""
+    CREATE TRIGGER trg_resumo_configuracoes_comercio
+    AFTER UPDATE OF nivel_alerta_minimo ON configuracoes_comercio
+    FOR EACH ROW
+    WHEN (trunc(OLD.nivel_alerta_minimo) IS DISTINCT FROM trunc(NEW.nivel_alerta_minimo))
+    EXECUTE FUNCTION fn_resumo_configuracao();
+    """))
+
+    # backfill
+    op.execute(sa.DDL("""
+    INSERT INTO resumos_comercio (comercio_id, zero_count, low_count, limite_global, faturamento_total)
+    SELECT c.comercio_id,
+           COALESCE(p.zero_count, 0),
+           COALESCE(p.low_count, 0),
+           trunc(cfg.nivel_alerta_minimo)::integer,
+           COALESCE(m.faturamento_total, 0)
+    FROM comercios c
+    LEFT JOIN configuracoes_comercio cfg ON cfg.id = c.configuracao_id
+    LEFT JOIN LATERAL (
+        SELECT count(*) FILTER (WHERE pp.quantidade_estoque = 0) AS zero_count,
+               count(*) FILTER (WHERE fn_produto_estoque_baixo(
+                   pp.quantidade_estoque, pp.limite_estoque, trunc(cfg.nivel_alerta_minimo)::integer)) AS low_count
+        FROM produtos pp WHERE pp.comercio_id = c.comercio_id
+    ) p ON true
+    LEFT JOIN LATERAL (
+        SELECT sum(mm.valor_total) AS faturamento_total
+        FROM movimentacoes mm
+        WHERE mm.comercio_id = c.comercio_id
+          AND lower(mm.tipo) = 'saida' AND lower(mm.estado) = 'fechada'
+    ) m ON true
+    ON CONFLICT (comercio_id) DO NOTHING;
+    """))
+
+
+def downgrade() -> None:
+    """Downgrade: remove triggers, funções e tabela."""
+    for tabela in ("produtos", "movimentacoes"):
+        for sufixo in ("ins", "upd", "del"):
+            op.execute(f"DROP TRIGGER IF EXISTS trg_resumo_{tabela}_{sufixo} ON {tabela};")
+    op.execute("DROP TRIGGER IF EXISTS trg_resumo_comercios_ins ON comercios;")
+    op.execute("DROP TRIGGER IF EXISTS trg_resumo_comercios_config ON comercios;")
+    op.execute("DROP TRIGGER IF EXISTS trg_resumo_configuracoes_comercio ON configuracoes_comercio;")
+    op.execute("DROP FUNCTION IF EXISTS fn_resumo_configuracao();")
+    op.execute("DROP FUNCTION IF EXISTS fn_resumo_comercio();")
+    op.execute("DROP FUNCTION IF EXISTS fn_resumo_movimentacoes();")
+    op.execute("DROP FUNCTION IF EXISTS fn_resumo_produtos();")
+    op.execute("DROP FUNCTION IF EXISTS fn_recalcular_estoque_baixo(integer);")
+    op.execute("DROP FUNCTION IF EXISTS fn_produto_estoque_baixo(integer, integer, integer);")
+    op.drop_table('resumos_comercio')
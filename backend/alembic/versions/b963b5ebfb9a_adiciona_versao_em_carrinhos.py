@@ -0,0 +1,35 @@
+"""Adiciona versao em carrinhos
+
+Revision ID: b963b5ebfb9a
+Revises: fe9ad05bbe3f
+Create Date: 2026-10-18 10:12:40.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b963b5ebfb9a'
+down_revision: Union[str, Sequence[str], None] = 'fe9ad05bbe3f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema: add versao column to carrinhos (incrementada a cada alteração de item)."""
+    op.add_column(
+        'carrinhos',
+        sa.Column('versao', sa.Integer(), nullable=False, server_default=sa.text('0')),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema: remove versao column from carrinhos if it exists."""
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    columns = [col['name'] for col in inspector.get_columns('carrinhos')]
+    if 'versao' in columns:
+        op.drop_column('carrinhos', 'versao')
@@ -0,0 +1,57 @@
+"""Cria movimentacoes_mensais (rollup do gráfico mensal)
+
+Revision ID: c2a6d8e4f037
+Revises: 9b3e7f2a4c61
+Create Date: 2026-10-18 16:58:31.274415
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c2a6d8e4f037'
+down_revision: Union[str, Sequence[str], None] = '9b3e7f2a4c61'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """
+    Upgrade: totais por (comercio_id, tipo, ano, mes) das movimentações com fechado_em,
+    com backfill a partir do histórico. Daqui em diante a aplicação mantém a tabela
+    (finalizar_movimentacao e exclusão de movimentação fechada).
+    """
+    op.create_table(
+        'movimentacoes_mensais',
+        sa.Column('comercio_id', sa.Integer(), nullable=False),
+        sa.Column('tipo', sa.String(length=7), nullable=False),
+        sa.Column('ano', sa.SmallInteger(), nullable=False),
+        sa.Column('mes', sa.SmallInteger(), nullable=False),
+        sa.Column('mov_count', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('total_itens', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('valor_total', sa.Numeric(precision=18, scale=4), server_default='0', nullable=False),
+        sa.ForeignKeyConstraint(['comercio_id'], ['comercios.comercio_id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('comercio_id', 'tipo', 'ano', 'mes'),
+    )
+
+    op.execute(sa.DDL("""
+    INSERT INTO movimentacoes_mensais (comercio_id, tipo, ano, mes, mov_count, total_itens, valor_total)
+    SELECT comercio_id,
+           lower(tipo),
+           extract(year FROM fechado_em)::smallint,
+           extract(month FROM fechado_em)::smallint,
+           count(*),
+           COALESCE(sum(total_itens), 0),
+           COALESCE(sum(valor_total), 0)
+    FROM movimentacoes
+    WHERE fechado_em IS NOT NULL
+    GROUP BY 1, 2, 3, 4;
+    """))
+
+
+def downgrade() -> None:
+    """Downgrade: remove a tabela."""
+    op.drop_table('movimentacoes_mensais')
@@ -0,0 +1,63 @@
+"""Índices compostos/parciais para as consultas das rotas
+
+Revision ID: d81f4b7c2e95
+Revises: c2a6d8e4f037
+Create Date: 2026-10-18 17:36:52.840177
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd81f4b7c2e95'
+down_revision: Union[str, Sequence[str], None] = 'c2a6d8e4f037'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (nome, tabela, colunas, where)
+INDICES = (
+    # /movimentacoes/abertas: comercio + estado='aberta' ORDER BY mov_id
+    ('ix_movimentacoes_comercio_abertas', 'movimentacoes', ['comercio_id', 'mov_id'],
+     sa.text("estado = 'aberta'")),
+    # listagem de movimentações (ORDER BY mov_id) e as buscas por (comercio_id, mov_id)
+    ('ix_movimentacoes_comercio_mov', 'movimentacoes', ['comercio_id', 'mov_id'], None),
+    # rotas de carrinho buscam a movimentação pelo carrinho_id
+    ('ix_movimentacoes_carrinho_id', 'movimentacoes', ['carrinho_id'], None),
+    # movimentações fechadas por período
+    ('ix_movimentacoes_comercio_fechado_em', 'movimentacoes', ['comercio_id', 'fechado_em'],
+     sa.text("fechado_em IS NOT NULL")),
+    # estoque zerado/baixo (filtro da listagem e reconciliação dos resumos)
+    ('ix_produtos_comercio_estoque', 'produtos', ['comercio_id', 'quantidade_estoque'], None),
+    # ?nome= da listagem de produtos: lower(nome) LIKE 'prefixo%'
+    ('ix_produtos_comercio_lower_nome', 'produtos',
+     ['comercio_id', sa.text('lower(nome) text_pattern_ops')], None),
+    # último convite do comércio
+    ('ix_convites_comercio_criado_em', 'convites', ['comercio_id', sa.text('criado_em DESC')], None),
+    # acesso por usuário (uq_comercio_usuario começa por comercio_id)
+    ('ix_comercios_usuarios_usuario_comercio', 'comercios_usuarios', ['usuario_id', 'comercio_id'], None),
+)
+
+
+def upgrade() -> None:
+    """
+    Upgrade schema: índices para os filtros quentes das rotas. Ficam de fora as linhas do
+    carrinho por carrinho_id (ix_carrinho_itens_carrinho_id foi removido na e42402e034ca,
+    mas o índice único de uq_carrinho_produto (carrinho_id, produto_id) atende a busca) e
+    movimentacoes.link, que já é único.
+    """
+    # CONCURRENTLY não roda dentro de transação
+    with op.get_context().autocommit_block():
+        for nome, tabela, colunas, where in INDICES:
+            op.create_index(nome, tabela, colunas, unique=False, postgresql_where=where,
+                            postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema: remove os índices."""
+    with op.get_context().autocommit_block():
+        for nome, tabela, _, _ in INDICES:
+            op.drop_index(nome, table_name=tabela, postgresql_concurrently=True, if_exists=True)
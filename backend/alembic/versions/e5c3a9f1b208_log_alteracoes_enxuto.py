@@ -0,0 +1,147 @@
+"""fn_log_alteracoes enxuto: PK por argumento e só o diff no UPDATE
+
+Revision ID: e5c3a9f1b208
+Revises: d81f4b7c2e95
+Create Date: 2026-10-18 18:12:44.395170
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5c3a9f1b208'
+down_revision: Union[str, Sequence[str], None] = 'd81f4b7c2e95'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (trigger, tabela, coluna PK)
+TRIGGERS = (
+    ('trg_log_usuarios', 'usuarios', 'usuario_id'),
+    ('trg_log_comercios', 'comercios', 'comercio_id'),
+    ('trg_log_convites', 'convites', 'convite_id'),
+    ('trg_fornecedor_changes', 'fornecedores', 'fornecedor_id'),
+    ('trg_produto_changes', 'produtos', 'produto_id'),
+    ('trg_enderecos_log', 'enderecos', 'endereco_id'),
+)
+
+
+def upgrade() -> None:
+    """
+    Upgrade: nova fn_log_alteracoes.
+    - coluna PK vem de TG_ARGV[0] (sem consultar pg_index/pg_attribute a cada linha);
+      sem argumento, cai na busca no catálogo como antes
+    - UPDATE grava só as chaves alteradas (antigo_dado/novo_dado com os mesmos campos)
+    - UPDATE sem mudança real (ignorando atualizado_em/updated_at) não gera log
+    - alterado_por = app_usuario_id(); NULL fora de requisição (o 0 antigo quebrava a FK)
+    Os triggers são recriados com a PK como argumento e só para UPDATE/DELETE
+    (o INSERT de enderecos chamava a função à toa).
+    """
+    op.execute(sa.DDL("""
+    CREATE OR REPLACE FUNCTION fn_log_alteracoes() RETURNS trigger AS $$
+    DECLARE
+        pk_col TEXT := TG_ARGV[0];
+        linha_antiga JSONB;
+        antigo JSONB;
+        novo JSONB;
+    BEGIN
+        IF TG_OP NOT IN ('UPDATE', 'DELETE') THEN
+            RETURN NEW;
+        END IF;
+
+        IF pk_col IS NULL THEN
+            SELECT a.attname INTO pk_col
+            FROM pg_index i
+            JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey)
+            WHERE i.indrelid = TG_RELID AND i.indisprimary
+            LIMIT 1;
+        END IF;
+
+        linha_antiga := to_jsonb(OLD);
+        antigo := linha_antiga;
+
+        IF TG_OP = 'UPDATE' THEN
+            SELECT jsonb_object_agg(o.key, o.value), jsonb_object_agg(o.key, n.value)
+            INTO antigo, novo
+            FROM jsonb_each(linha_antiga) o
+            JOIN jsonb_each(to_jsonb(NEW)) n ON n.key = o.key
+            WHERE o.value IS DISTINCT FROM n.value
+              AND o.key NOT IN ('atualizado_em', 'updated_at');
+
+            IF antigo IS NULL THEN
+                RETURN NEW;  -- nada mudou de fato
+            END IF;
+        END IF;
+
+        INSERT INTO logs(tabela_nome, record_id, operacao, alterado_por, antigo_dado, novo_dado)
+        VALUES (
+            TG_TABLE_NAME,
+            COALESCE(linha_antiga ->> pk_col, ''),
+            TG_OP,
+            app_usuario_id(),
+            antigo,
+            novo
+        );
+
+        IF TG_OP = 'DELETE' THEN
+            RETURN OLD;
+        END IF;
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql;
+    """))
+
+    for trigger, tabela, pk in TRIGGERS:
+        op.execute(f"DROP TRIGGER IF EXISTS {trigger} ON {tabela};")
+        op.execute(sa.DDL(f"""
+        CREATE TRIGGER {trigger}
+        AFTER UPDATE OR DELETE ON {tabela}
+        FOR EACH ROW EXECUTE FUNCTION fn_log_alteracoes('{pk}');
+        """))
+
+
+def downgrade() -> None:
+    """Downgrade: volta a função com linha inteira e busca de PK no catálogo."""
+    op.execute(sa.DDL("""
+    CREATE OR REPLACE FUNCTION fn_log_alteracoes() RETURNS trigger AS $$
+    DECLARE
+        usuario_atual INTEGER := COALESCE(app_usuario_id(), 0);
+        pk_col TEXT;
+        rec_id TEXT;
+    BEGIN
+        SELECT a.attname INTO pk_col
+        FROM pg_index i
+        JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey)
+        WHERE i.indrelid = TG_RELID AND i.indisprimary
+        LIMIT 1;
+
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            IF pk_col IS NOT NULL THEN
+                EXECUTE format('SELECT ($1).%%I::text', pk_col) INTO rec_id USING OLD;
+            END IF;
+            INSERT INTO logs(tabela_nome, record_id, operacao, alterado_por, antigo_dado, novo_dado)
+            VALUES (
+                TG_TABLE_NAME, rec_id, TG_OP, usuario_atual, to_jsonb(OLD),
+                CASE WHEN TG_OP = 'UPDATE' THEN to_jsonb(NEW) END
+            );
+        END IF;
+
+        IF TG_OP = 'DELETE' THEN
+            RETURN OLD;
+        END IF;
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql;
+    """))
+
+    for trigger, tabela, _ in TRIGGERS:
+        op.execute(f"DROP TRIGGER IF EXISTS {trigger} ON {tabela};")
+        eventos = "INSERT OR UPDATE OR DELETE" if tabela == "enderecos" else "UPDATE OR DELETE"
+        op.execute(sa.DDL(f"""
+        CREATE TRIGGER {trigger}
+        AFTER {eventos} ON {tabela}
+        FOR EACH ROW EXECUTE FUNCTION fn_log_alteracoes();
+        """))
@@ -0,0 +1,268 @@
+"""Particiona logs por mês, retenção por DROP e staging unlogged opcional
+
+Revision ID: f3b9d2a7c814
+Revises: e5c3a9f1b208
+Create Date: 2026-10-18 19:05:27.661903
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3b9d2a7c814'
+down_revision: Union[str, Sequence[str], None] = 'e5c3a9f1b208'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# corpo comum da fn_log_alteracoes (revisão e5c3a9f1b208); {insert} escolhe o destino
+_FN_LOG_ALTERACOES = """
+    CREATE OR REPLACE FUNCTION fn_log_alteracoes() RETURNS trigger AS $$
+    DECLARE
+        pk_col TEXT := TG_ARGV[0];
+        linha_antiga JSONB;
+        antigo JSONB;
+        novo JSONB;
+    BEGIN
+        IF TG_OP NOT IN ('UPDATE', 'DELETE') THEN
+            RETURN NEW;
+        END IF;
+
+        IF pk_col IS NULL THEN
+            SELECT a.attname INTO pk_col
+            FROM pg_index i
+            JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey)
+            WHERE i.indrelid = TG_RELID AND i.indisprimary
+            LIMIT 1;
+        END IF;
+
+        linha_antiga := to_jsonb(OLD);
+        antigo := linha_antiga;
+
+        IF TG_OP = 'UPDATE' THEN
+            SELECT jsonb_object_agg(o.key, o.value), jsonb_object_agg(o.key, n.value)
+            INTO antigo, novo
+            FROM jsonb_each(linha_antiga) o
+            JOIN jsonb_each(to_jsonb(NEW)) n ON n.key = o.key
+            WHERE o.value IS DISTINCT FROM n.value
+              AND o.key NOT IN ('atualizado_em', 'updated_at');
+
+            IF antigo IS NULL THEN
+                RETURN NEW;  -- nada mudou de fato
+            END IF;
+        END IF;
+{insert}
+        IF TG_OP = 'DELETE' THEN
+            RETURN OLD;
+        END IF;
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql;
+"""
+
+_INSERT_DIRETO = """
+        INSERT INTO logs(tabela_nome, record_id, operacao, alterado_por, antigo_dado, novo_dado)
+        VALUES (TG_TABLE_NAME, COALESCE(linha_antiga ->> pk_col, ''), TG_OP, app_usuario_id(), antigo, novo);
+"""
+
+# app.logs_assincronos = 'on' (ALTER DATABASE/ROLE ... SET) manda para a staging
+_INSERT_COM_STAGING = """
+        IF current_setting('app.logs_assincronos', true) = 'on' THEN
+            INSERT INTO logs_pendentes(tabela_nome, record_id, operacao, alterado_por, antigo_dado, novo_dado)
+            VALUES (TG_TABLE_NAME, COALESCE(linha_antiga ->> pk_col, ''), TG_OP, app_usuario_id(), antigo, novo);
+        ELSE
+            INSERT INTO logs(tabela_nome, record_id, operacao, alterado_por, antigo_dado, novo_dado)
+            VALUES (TG_TABLE_NAME, COALESCE(linha_antiga ->> pk_col, ''), TG_OP, app_usuario_id(), antigo, novo);
+        END IF;
+"""
+
+
+def upgrade() -> None:
+    """
+    Upgrade:
+    - logs vira tabela particionada por RANGE (alterado_em), uma partição por mês
+      (logs_AAAA_MM) + logs_padrao (DEFAULT) para nunca falhar um INSERT
+    - fn_logs_garantir_particoes cria as partições que faltam (e tira da DEFAULT linhas
+      que já tenham caído lá); fn_logs_aplicar_retencao apaga partições antigas com DROP
+    - logs_pendentes (UNLOGGED): com app.logs_assincronos = 'on' os triggers gravam lá e
+      fn_logs_descarregar move em lotes para logs. Unlogged = sem WAL no caminho da
+      transação, mas linhas pendentes se perdem num crash do servidor.
+    Manutenção/descarga rodam pelos comandos `flask manter-logs` e `flask descarregar-logs`.
+    """
+    op.execute(sa.DDL("ALTER TABLE logs RENAME TO logs_antigo;"))
+    op.execute(sa.DDL("ALTER TABLE logs_antigo ALTER COLUMN log_id DROP DEFAULT;"))
+    op.execute(sa.DDL("ALTER INDEX logs_pkey RENAME TO logs_antigo_pkey;"))
+
+    # PK precisa incluir a chave de partição
+    op.execute(sa.DDL("""
+    CREATE TABLE logs (
+        log_id integer NOT NULL DEFAULT nextval('logs_log_id_seq'),
+        tabela_nome varchar(100) NOT NULL,
+        record_id text NOT NULL,
+        operacao varchar(10) NOT NULL,
+        alterado_por integer REFERENCES usuarios(usuario_id),
+        alterado_em timestamptz NOT NULL DEFAULT now(),
+        antigo_dado json,
+        novo_dado json,
+        PRIMARY KEY (log_id, alterado_em)
+    ) PARTITION BY RANGE (alterado_em);
+    """))
+    op.execute(sa.DDL("ALTER SEQUENCE logs_log_id_seq OWNED BY logs.log_id;"))
+    op.execute(sa.DDL("CREATE TABLE logs_padrao PARTITION OF logs DEFAULT;"))
+
+    op.execute(sa.DDL("""
+    CREATE OR REPLACE FUNCTION fn_logs_garantir_particoes(p_inicio date, p_meses_a_frente integer DEFAULT 2)
+    RETURNS integer
+    LANGUAGE plpgsql
+    AS $$
+    DECLARE
+        mes date := date_trunc('month', p_inicio)::date;
+        fim date := (date_trunc('month', now()) + make_interval(months => p_meses_a_frente))::date;
+        prox date;
+        nome text;
+        criadas integer := 0;
+    BEGIN
+        WHILE mes <= fim LOOP
+            prox := (mes + interval '1 month')::date;
+            nome := 'logs_' || to_char(mes, 'YYYY_MM');
+            IF to_regclass(nome) IS NULL THEN
+                IF EXISTS (SELECT 1 FROM logs_padrao WHERE alterado_em >= mes AND alterado_em < prox) THEN
+                    -- linhas desse mês caíram na DEFAULT: move antes de anexar
+                    EXECUTE format('CREATE TABLE %%I (LIKE logs INCLUDING DEFAULTS)', nome);
+                    EXECUTE format('INSERT INTO %%I SELECT * FROM logs_padrao WHERE alterado_em >= %%L AND alterado_em < %%L',
+                                   nome, mes, prox);
+                    DELETE FROM logs_padrao WHERE alterado_em >= mes AND alterado_em < prox;
+                    EXECUTE format('ALTER TABLE logs ATTACH PARTITION %%I FOR VALUES FROM (%%L) TO (%%L)', nome, mes, prox);
+                ELSE
+                    EXECUTE format('CREATE TABLE %%I PARTITION OF logs FOR VALUES FROM (%%L) TO (%%L)', nome, mes, prox);
+                END IF;
+                criadas := criadas + 1;
+            END IF;
+            mes := prox;
+        END LOOP;
+        RETURN criadas;
+    END;
+    $$;
+    """))
+
+    op.execute(sa.DDL("""
+    CREATE OR REPLACE FUNCTION fn_logs_aplicar_retencao(p_meses integer)
+    RETURNS integer
+    LANGUAGE plpgsql
+    AS $$
+    DECLARE
+        limite date := (date_trunc('month', now()) - make_interval(months => p_meses))::date;
+        particao text;
+        removidas integer := 0;
+    BEGIN
+        FOR particao IN
+            SELECT c.relname
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = 'logs'::regclass
+              AND c.relname ~ '^logs_[0-9]{4}_[0-9]{2}$'
+            ORDER BY c.relname
+        LOOP
+            -- partição inteira anterior ao limite
+            IF (to_date(substr(particao, 6), 'YYYY_MM') + interval '1 month')::date <= limite THEN
+                EXECUTE format('DROP TABLE %%I', particao);
+                removidas := removidas + 1;
+            END IF;
+        END LOOP;
+        RETURN removidas;
+    END;
+    $$;
+    """))
+
+    op.execute(sa.DDL("""
+    SELECT fn_logs_garantir_particoes(COALESCE((SELECT min(alterado_em) FROM logs_antigo)::date, current_date), 3);
+    """))
+    op.execute(sa.DDL("""
+    INSERT INTO logs (log_id, tabela_nome, record_id, operacao, alterado_por, alterado_em, antigo_dado, novo_dado)
+    SELECT log_id, tabela_nome, record_id, operacao, alterado_por, alterado_em, antigo_dado, novo_dado
+    FROM logs_antigo;
+    """))
+    op.execute(sa.DDL("DROP TABLE logs_antigo;"))
+
+    op.execute(sa.DDL("""
+    CREATE UNLOGGED TABLE logs_pendentes (
+        pendente_id bigserial PRIMARY KEY,
+        tabela_nome varchar(100) NOT NULL,
+        record_id text NOT NULL,
+        operacao varchar(10) NOT NULL,
+        alterado_por integer,
+        alterado_em timestamptz NOT NULL DEFAULT now(),
+        antigo_dado json,
+        novo_dado json
+    );
+    """))
+
+    # SKIP LOCKED: dois descarregadores rodando juntos não pegam o mesmo lote
+    op.execute(sa.DDL("""
+    CREATE OR REPLACE FUNCTION fn_logs_descarregar(p_lote integer DEFAULT 5000)
+    RETURNS integer
+    LANGUAGE plpgsql
+    AS $$
+    DECLARE
+        n integer;
+    BEGIN
+        WITH lote AS (
+            SELECT pendente_id FROM logs_pendentes
+            ORDER BY pendente_id
+            LIMIT p_lote
+            FOR UPDATE SKIP LOCKED
+        ), movidos AS (
+            DELETE FROM logs_pendentes p USING lote
+            WHERE p.pendente_id = lote.pendente_id
+            RETURNING p.*
+        )
+        INSERT INTO logs (tabela_nome, record_id, operacao, alterado_por, alterado_em, antigo_dado, novo_dado)
+        SELECT m.tabela_nome, m.record_id, m.operacao,
+               -- usuário pode ter sido excluído enquanto a linha esperava
+               (SELECT u.usuario_id FROM usuarios u WHERE u.usuario_id = m.alterado_por),
+               m.alterado_em, m.antigo_dado, m.novo_dado
+        FROM movidos m
+        ORDER BY m.pendente_id;
+        GET DIAGNOSTICS n = ROW_COUNT;
+        RETURN n;
+    END;
+    $$;
+    """))
+
+    op.execute(sa.DDL(_FN_LOG_ALTERACOES.format(insert=_INSERT_COM_STAGING)))
+
+
+def downgrade() -> None:
+    """Downgrade: descarrega a staging, volta logs para tabela comum e remove as funções."""
+    op.execute(sa.DDL(_FN_LOG_ALTERACOES.format(insert=_INSERT_DIRETO)))
+    op.execute(sa.DDL("SELECT fn_logs_descarregar(2147483647);"))
+    op.execute(sa.DDL("DROP FUNCTION IF EXISTS fn_logs_descarregar(integer);"))
+    op.execute(sa.DDL("DROP TABLE IF EXISTS logs_pendentes;"))
+    op.execute(sa.DDL("DROP FUNCTION IF EXISTS fn_logs_aplicar_retencao(integer);"))
+    op.execute(sa.DDL("DROP FUNCTION IF EXISTS fn_logs_garantir_particoes(date, integer);"))
+
+    op.execute(sa.DDL("ALTER TABLE logs RENAME TO logs_particionada;"))
+    op.execute(sa.DDL("ALTER INDEX logs_pkey RENAME TO logs_particionada_pkey;"))
+    op.execute(sa.DDL("""
+    CREATE TABLE logs (
+        log_id integer NOT NULL,
+        tabela_nome varchar(100) NOT NULL,
+        record_id text NOT NULL,
+        operacao varchar(10) NOT NULL,
+        alterado_por integer REFERENCES usuarios(usuario_id),
+        alterado_em timestamptz NOT NULL DEFAULT now(),
+        antigo_dado json,
+        novo_dado json,
+        CONSTRAINT logs_pkey PRIMARY KEY (log_id)
+    );
+    """))
+    op.execute(sa.DDL("""
+    INSERT INTO logs SELECT log_id, tabela_nome, record_id, operacao, alterado_por, alterado_em, antigo_dado, novo_dado
+    FROM logs_particionada;
+    """))
+    op.execute(sa.DDL("ALTER SEQUENCE logs_log_id_seq OWNED BY logs.log_id;"))
+    op.execute(sa.DDL("ALTER TABLE logs ALTER COLUMN log_id SET DEFAULT nextval('logs_log_id_seq');"))
+    op.execute(sa.DDL("DROP TABLE logs_particionada;"))
@@ -3,7 +3,7 @@ from flask import Blueprint, request, jsonify, g, current_app, make_response
 from werkzeug.security import check_password_hash
 import jwt
 import datetime
-from app.database.database import SessionLocal
+from app.database.request_session import get_request_db
 from app.models.usuarios_model import Usuario
 from app.middleware.auth import token_required  # ajusta o path se necessário
 
@@ -19,35 +19,32 @@ def login():
     if not email or not senha:
         return jsonify({"mensagem": "email e senha obrigatórios"}), 400
 
-    db = SessionLocal()
-    try:
-        user = db.query(Usuario).filter(Usuario.email == email).first()
-        if not user:
-            return jsonify({"mensagem": "Credenciais inválidas"}), 401
+    db = get_request_db()
+    user = db.query(Usuario).filter(Usuario.email == email).first()
+    if not user:
+        return jsonify({"mensagem": "Credenciais inválidas"}), 401
 
-        # supondo que Usuario tenha atributo 'senha_hash'
-        if not check_password_hash(user.senha_hash, senha):
-            return jsonify({"mensagem": "Credenciais inválidas"}), 401
+    # supondo que Usuario tenha atributo 'senha_hash'
+    if not check_password_hash(user.senha_hash, senha):
+        return jsonify({"mensagem": "Credenciais inválidas"}), 401
 
-        now = datetime.datetime.now(datetime.timezone.utc)
-        payload = {
-            "usuario_id": user.usuario_id,
-            "exp": int((now + datetime.timedelta(hours=8)).timestamp())
-        }
-        token = jwt.encode(payload, current_app.config.get("SECRET_KEY"), algorithm="HS256")
+    now = datetime.datetime.now(datetime.timezone.utc)
+    payload = {
+        "usuario_id": user.usuario_id,
+        "exp": int((now + datetime.timedelta(hours=8)).timestamp())
+    }
+    token = jwt.encode(payload, current_app.config.get("SECRET_KEY"), algorithm="HS256")
 
-        resp = make_response(jsonify({"access_token": token})) 
-        resp.set_cookie(
-            "access_token",
-            token,
-            httponly=True,
-            samesite="Lax",  # ou "Strict"/"None" se preciso
-            secure=False,    # coloque True em produção (https)
-            max_age=8*3600
-        )
-        return resp
-    finally:
-        db.close()
+    resp = make_response(jsonify({"access_token": token})) 
+    resp.set_cookie(
+        "access_token",
+        token,
+        httponly=True,
+        samesite="Lax",  # ou "Strict"/"None" se preciso
+        secure=False,    # coloque True em produção (https)
+        max_age=8*3600
+    )
+    return resp
 
 
 # rota para retornar info do usuario atual (protegida)
@@ -60,21 +57,18 @@ def me():
     if not usuario_id:
         return jsonify({"usuario": None}), 200
 
-    db = SessionLocal()
-    try:
-        user = db.query(Usuario).get(usuario_id)
-        if not user:
-            return jsonify({"usuario": None}), 200
+    db = get_request_db()
+    user = db.query(Usuario).get(usuario_id)
+    if not user:
+        return jsonify({"usuario": None}), 200
 
-        return jsonify({
-            "usuario": {
-                "usuario_id": user.usuario_id,
-                "email": user.email,
-                "nome": getattr(user, "nome", None)
-            }
-        }), 200
-    finally:
-        db.close()
+    return jsonify({
+        "usuario": {
+            "usuario_id": user.usuario_id,
+            "email": user.email,
+            "nome": getattr(user, "nome", None)
+        }
+    }), 200
 
 
 # função utilitária para outras rotas obterem o user model
@@ -84,8 +78,5 @@ def get_current_user():
     usuario_id = payload.get("usuario_id")
     if not usuario_id:
         return None
-    db = SessionLocal()
-    try:
-        return db.query(Usuario).get(usuario_id)
-    finally:
-        db.close()
+    db = get_request_db()
+    return db.query(Usuario).get(usuario_id)
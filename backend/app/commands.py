@@ -0,0 +1,79 @@
+# app/commands.py
+"""
+Comandos de manutenção (flask --app main:create_app <comando>).
+Pensados para rodar via cron/agendador, fora do ciclo de requisições.
+"""
+import time
+
+import click
+
+from app.database.database import SessionLocal
+
+
+def registrar_comandos(flask_app):
+    flask_app.cli.add_command(reconciliar_resumos_cmd)
+    flask_app.cli.add_command(manter_logs_cmd)
+    flask_app.cli.add_command(descarregar_logs_cmd)
+
+
+@click.command("reconciliar-resumos")
+@click.option("--comercio-id", "comercio_ids", type=int, multiple=True,
+              help="Comércio a reconciliar (repetível). Sem a opção, todos.")
+def reconciliar_resumos_cmd(comercio_ids):
+    """Recalcula resumos_comercio do zero e corrige divergências dos contadores."""
+    from app.services.dashboard_service import reconciliar_resumos
+
+    db = SessionLocal()
+    try:
+        correcoes = reconciliar_resumos(db, comercio_ids or None)
+    finally:
+        db.close()
+
+    for c in correcoes:
+        click.echo(f"comercio {c['comercio_id']}: {c['antes']} -> {c['depois']}")
+    click.echo(f"{len(correcoes)} resumo(s) corrigido(s)")
+
+
+@click.command("manter-logs")
+@click.option("--meses-a-frente", type=int, default=None, help="Partições futuras a garantir (padrão LOGS_MESES_A_FRENTE).")
+@click.option("--retencao-meses", type=int, default=None, help="Meses de logs mantidos (padrão LOGS_RETENCAO_MESES).")
+def manter_logs_cmd(meses_a_frente, retencao_meses):
+    """Cria as partições mensais de logs que faltam e remove as que passaram da retenção."""
+    from app.services import logs_service
+
+    db = SessionLocal()
+    try:
+        criadas = logs_service.garantir_particoes(
+            db, meses_a_frente if meses_a_frente is not None else logs_service.LOGS_MESES_A_FRENTE)
+        removidas = logs_service.aplicar_retencao(
+            db, retencao_meses if retencao_meses is not None else logs_service.LOGS_RETENCAO_MESES)
+    finally:
+        db.close()
+    click.echo(f"{criadas} partição(ões) criada(s), {removidas} removida(s)")
+
+
+@click.command("descarregar-logs")
+@click.option("--lote", type=int, default=None, help="Linhas por transação (padrão LOGS_LOTE_DESCARGA).")
+@click.option("--intervalo", type=float, default=0,
+              help="Segundos entre rodadas quando a staging esvazia; 0 = esvazia uma vez e sai.")
+def descarregar_logs_cmd(lote, intervalo):
+    """Move os logs da staging unlogged (logs_pendentes) para a tabela particionada."""
+    from app.services import logs_service
+
+    lote = lote or logs_service.LOGS_LOTE_DESCARGA
+    db = SessionLocal()
+    try:
+        while True:
+            total = 0
+            while True:
+                movidas = logs_service.descarregar_pendentes(db, lote)
+                total += movidas
+                if movidas < lote:
+                    break
+            if total:
+                click.echo(f"{total} log(s) descarregado(s)")
+            if not intervalo:
+                break
+            time.sleep(intervalo)
+    finally:
+        db.close()
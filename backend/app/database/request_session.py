@@ -0,0 +1,86 @@
+# app/database/request_session.py
+"""
+Uma sessão SQLAlchemy por requisição.
+
+get_request_db() cria a sessão na primeira chamada e devolve a mesma até o fim da
+requisição; o teardown do app context fecha (rollback do que ficou pendente).
+Rotas, helpers e services chamados numa requisição usam essa sessão e não a fecham.
+
+Detecção de vazamento: contamos as conexões do pool presas pela requisição. Mais de
+uma ao mesmo tempo (alguém abriu outra sessão) ou conexão ainda presa depois do
+fechamento geram warning no log com o endpoint. Conexões à parte de propósito (ex.:
+reserva de bloco de códigos, que precisa commitar fora da transação da requisição)
+são abertas dentro de conexao_lateral() e não entram na conta.
+"""
+from contextlib import contextmanager
+
+from flask import current_app, g, has_app_context, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.database.database import SessionLocal, engine
+
+
+def get_request_db() -> Session:
+    """Sessão da requisição atual (criada sob demanda, fechada no teardown)."""
+    db = g.get("_db")
+    if db is None:
+        db = SessionLocal()
+        g._db = db
+    return db
+
+
+@contextmanager
+def conexao_lateral():
+    """Conexões pegas do pool dentro do bloco são intencionais e não contam como vazamento."""
+    if not has_request_context():
+        yield
+        return
+    anterior = g.get("_db_conexao_lateral", False)
+    g._db_conexao_lateral = True
+    try:
+        yield
+    finally:
+        g._db_conexao_lateral = anterior
+
+
+@event.listens_for(engine, "checkout")
+def _contar_checkout(dbapi_connection, connection_record, connection_proxy):
+    if not has_request_context() or g.get("_db_conexao_lateral", False):
+        return
+    g._db_conexoes = g.get("_db_conexoes", 0) + 1
+    g._db_conexoes_max = max(g.get("_db_conexoes_max", 0), g._db_conexoes)
+    g.setdefault("_db_endpoint", request.endpoint)
+    connection_record.info["_checkout_na_requisicao"] = True
+
+
+@event.listens_for(engine, "checkin")
+def _contar_checkin(dbapi_connection, connection_record):
+    # só desconta o que contou; o fechamento no teardown já roda sem request context
+    if not connection_record.info.pop("_checkout_na_requisicao", False):
+        return
+    if has_app_context():
+        g._db_conexoes = g.get("_db_conexoes", 1) - 1
+
+
+def _fechar_sessao_da_requisicao(exc=None):
+    db = g.pop("_db", None)
+    if db is not None:
+        try:
+            db.close()  # rollback do que não foi commitado e devolve a conexão
+        except Exception:
+            current_app.logger.exception("Erro ao fechar sessão da requisição")
+
+    maximo = g.pop("_db_conexoes_max", 0)
+    presas = g.pop("_db_conexoes", 0)
+    endpoint = g.pop("_db_endpoint", None)
+    if maximo > 1:
+        current_app.logger.warning(
+            "Requisição %s segurou %d conexões do pool ao mesmo tempo", endpoint, maximo)
+    if presas > 0:
+        current_app.logger.warning(
+            "Requisição %s terminou com %d conexão(ões) fora do pool (sessão não fechada?)", endpoint, presas)
+
+
+def registrar_sessao_por_requisicao(flask_app) -> None:
+    flask_app.teardown_appcontext(_fechar_sessao_da_requisicao)
@@ -1,39 +1,69 @@
 from flask import current_app, g, has_request_context
 from sqlalchemy import Engine, event, text
-from sqlalchemy.orm import Session
 
-@event.listens_for(Engine, "begin")
-def _apply_app_user_id(connection):
-    """
-    Sempre que uma transação começar nessa conexão, seta o parâmetro
-    local da transaction com o user_id que colocamos em `flask.g`.
-    """
+# chaves em connection.info (dura enquanto a conexão DBAPI viver no pool)
+_CHAVE_USUARIO = "app_usuario_id"
+_CHAVE_PENDENTE = "app_usuario_id_pendente"
+# valor no Postgres incerto (rollback/erro): obriga o próximo begin a setar.
+# Só conexão nova pode ficar sem entrada, e aí "sem entrada" = não definido.
+_DESCONHECIDO = object()
+
+
+def _usuario_id_da_requisicao():
+    """usuario_id de `flask.g` como str, ou None fora de requisição/sem login."""
     if not has_request_context():
-        return
-    
+        return None
+
     usuario = g.get("usuario") or None
-    
     if usuario is None:
-        usuario_id = None
-    elif isinstance(usuario, dict):
-        usuario_id = usuario.get("usuario_id") or usuario.get("id")  # adapte chaves se necessário
+        return None
+    if isinstance(usuario, dict):
+        usuario_id = usuario.get("usuario_id") or usuario.get("id")
     else:
         usuario_id = getattr(usuario, "usuario_id", None)
-    
-    if usuario_id is None:
-        current_app.logger.debug("g não tem id de usuário")
-        current_app.logger.debug("usuario = %s", usuario)
-        current_app.logger.debug("usuario_id = %s", usuario_id)
+    return str(usuario_id) if usuario_id is not None else None
+
+
+@event.listens_for(Engine, "begin")
+def _apply_app_user_id(connection):
+    """
+    No início de cada transação garante que app.usuario_id da conexão é o usuário de
+    `flask.g`. O valor é setado no nível da sessão do Postgres (não só da transação) e
+    guardado em connection.info: enquanto a conexão do pool continuar com o mesmo
+    usuário, não há round-trip nenhum. Sem usuário, limpa o valor deixado por uma
+    requisição anterior ('' -> app_usuario_id() devolve NULL).
+    """
+    usuario_id = _usuario_id_da_requisicao()
+    atual = connection.info.get(_CHAVE_USUARIO)
+    if atual is not _DESCONHECIDO and usuario_id == atual:
         return
-    
+
     try:
         connection.execute(
-            text("SELECT set_config('app.usuario_id', :uid, true)"),
-            {"uid": str(usuario_id)}
+            text("SELECT set_config('app.usuario_id', :uid, false)"),
+            {"uid": usuario_id or ""}
         )
-        current_app.logger.debug(f"session_listeners: set_config app.usuario_id={usuario_id}")
+        connection.info[_CHAVE_USUARIO] = usuario_id
+        connection.info[_CHAVE_PENDENTE] = True
     except Exception as e:
+        connection.info[_CHAVE_USUARIO] = _DESCONHECIDO
         current_app.logger.exception("Erro ao setar app.usuario_id na conexão: %s", e)
-        # Não tem raise pra não matar o frog; 
-        # caso falhe, o DB vai lidar com isso 
-        # GodBWYe
\ No newline at end of file
+        # Não tem raise pra não matar o frog;
+        # caso falhe, o DB vai lidar com isso
+        # GodBWYe
+
+
+@event.listens_for(Engine, "commit")
+def _confirmar_app_user_id(connection):
+    connection.info.pop(_CHAVE_PENDENTE, None)
+
+
+@event.listens_for(Engine, "rollback")
+def _esquecer_app_user_id(connection):
+    """
+    SET de sessão feito numa transação que sofre rollback é desfeito pelo Postgres:
+    se o set_config foi desta transação, o valor volta a ser o de antes, que não
+    sabemos qual é (pode ser de outro usuário) — marca como desconhecido.
+    """
+    if connection.info.pop(_CHAVE_PENDENTE, None):
+        connection.info[_CHAVE_USUARIO] = _DESCONHECIDO
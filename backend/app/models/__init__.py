@@ -15,4 +15,6 @@ from .contadores_locais import ContadorLocal
 from .carrinho_model import Carrinho 
 from .carrinho_item_model import CarrinhoItem
 from .movimentacao_model import Movimentacao
-
+from .versoes_colecoes import VersaoColecao
+from .resumos_comercio import ResumoComercio
+from .movimentacoes_mensais import MovimentacaoMensal
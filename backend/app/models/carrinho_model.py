@@ -10,6 +10,8 @@ class Carrinho(Base):
     carrinho_id = Column(Integer, primary_key=True, autoincrement=True)
     criado_em = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     atualizado_em = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+    # incrementada a cada item adicionado/removido; o cliente compara para saber se precisa recarregar
+    versao = Column(Integer, nullable=False, server_default="0")
 
     comercio_id = Column(Integer, ForeignKey("comercios.comercio_id", ondelete="CASCADE"), nullable=False)
 
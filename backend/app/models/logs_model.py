@@ -2,6 +2,7 @@ from sqlalchemy import Column, Integer, String, TIMESTAMP, JSON, ForeignKey, Tex
 from app.database.database import Base
 
 class Log(Base):
+    """Particionada por mês em alterado_em (logs_AAAA_MM); a PK inclui a chave de partição."""
     __tablename__ = "logs"
 
     log_id = Column(Integer, primary_key=True, autoincrement=True)
@@ -9,6 +10,7 @@ class Log(Base):
     record_id = Column(Text, nullable=False) #NÃO TRANSFORMAR EM INTEGER!!
     operacao = Column(String(10), nullable=False)
     alterado_por = Column(Integer, ForeignKey("usuarios.usuario_id"))
-    alterado_em = Column(TIMESTAMP(timezone=True), server_default=func.now(), nullable=False)
+    comercio_id = Column(Integer)  # preenchido pelo trigger; NULL para usuarios/enderecos
+    alterado_em = Column(TIMESTAMP(timezone=True), server_default=func.now(), nullable=False, primary_key=True)
     antigo_dado = Column(JSON)
     novo_dado = Column(JSON)
@@ -0,0 +1,18 @@
+from sqlalchemy import Column, ForeignKey, Integer, Numeric, SmallInteger, String
+from app.database.database import Base
+
+
+class MovimentacaoMensal(Base):
+    """
+    Totais de movimentações fechadas por comércio/tipo/mês (mês de fechado_em).
+    Atualizada por finalizar_movimentacao e pela exclusão de movimentação fechada.
+    """
+    __tablename__ = "movimentacoes_mensais"
+
+    comercio_id = Column(Integer, ForeignKey("comercios.comercio_id", ondelete="CASCADE"), primary_key=True)
+    tipo = Column(String(7), primary_key=True)
+    ano = Column(SmallInteger, primary_key=True)
+    mes = Column(SmallInteger, primary_key=True)
+    mov_count = Column(Integer, nullable=False, server_default="0")
+    total_itens = Column(Integer, nullable=False, server_default="0")
+    valor_total = Column(Numeric(18, 4), nullable=False, server_default="0")
@@ -0,0 +1,18 @@
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, Numeric, func
+from app.database.database import Base
+
+
+class ResumoComercio(Base):
+    """
+    Contadores do dashboard por comércio, mantidos por triggers em produtos,
+    movimentacoes, configuracoes_comercio e comercios (ver dashboard_service para a
+    reconciliação).
+    """
+    __tablename__ = "resumos_comercio"
+
+    comercio_id = Column(Integer, ForeignKey("comercios.comercio_id", ondelete="CASCADE"), primary_key=True)
+    zero_count = Column(Integer, nullable=False, server_default="0")
+    low_count = Column(Integer, nullable=False, server_default="0")
+    limite_global = Column(Integer, nullable=True)
+    faturamento_total = Column(Numeric(18, 4), nullable=False, server_default="0")
+    atualizado_em = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
@@ -0,0 +1,16 @@
+from sqlalchemy import BigInteger, Column, DateTime, Integer, String, func
+from app.database.database import Base
+
+
+class VersaoColecao(Base):
+    """
+    Versão de cada coleção listada por comércio (produtos, categorias, ...), incrementada
+    por triggers a cada INSERT/UPDATE/DELETE. Base dos ETags das listagens.
+    comercio_id = 0 guarda as unidades globais (sem FK de propósito).
+    """
+    __tablename__ = "versoes_colecoes"
+
+    comercio_id = Column(Integer, primary_key=True)
+    colecao = Column(String(32), primary_key=True)
+    versao = Column(BigInteger, nullable=False, server_default="0")
+    atualizado_em = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
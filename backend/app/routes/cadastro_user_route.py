@@ -1,14 +1,14 @@
 from flask import Blueprint, request, jsonify
 from sqlalchemy.orm import Session
 from ..services.cadastro_user_service import cadastrar_usuario
-from app.database.database import SessionLocal
+from app.database.request_session import get_request_db
 
 cadastro_bp = Blueprint("cadastro", __name__, url_prefix="/api/cadastro")
 
 
 @cadastro_bp.route("/", methods=["POST"])
 def cadastrar_usuario_route():
-    db: Session = SessionLocal()
+    db: Session = get_request_db()
     try:
         data = request.json
 
@@ -32,5 +32,3 @@ def cadastrar_usuario_route():
     except Exception as e:
         # Erro inesperado
         return jsonify({"erro": "Erro interno no servidor.", "detalhes": str(e)}), 500
-    finally:
-        db.close()
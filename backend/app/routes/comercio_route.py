@@ -1,30 +1,37 @@
 from decimal import Decimal
-from flask import Blueprint, current_app, request, jsonify, g
-from sqlalchemy import and_, extract, func, or_
+import csv
+import json
+from flask import Blueprint, Response, current_app, request, jsonify, g, stream_with_context
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 
 from app.middleware.auth import token_required
-from app.database.database import SessionLocal
+from app.database.request_session import get_request_db
 from app.models.categoria_model import Categoria
 from app.models.produtos_model import Produto
 from app.models.enderecos_model import Endereco
-from app.models.fornecedores_model import Fornecedor
 from app.models.unimed_model import UnidadeMedida
 from app.models.comercios_model import Comercio
 from app.models.configs_comercio import ConfiguracaoComercio
 
-from app.services.usuarios_service import get_comercios_que_usuario_tem_acesso, usuario_tem_acesso_ao_comercio
+from app.services.usuarios_service import get_comercios_que_usuario_tem_acesso, usuario_tem_acesso_ao_comercio, invalidar_acessos_comercio
 from app.api.auth import get_current_user
 from app.services.cadastro_comercio_service import criar_comercio
-from app.services.comercio_service import get_produtos_de_comercio_por_id
-from app.utils.model_utils import model_to_dict
+from app.services.comercio_service import listar_produtos_paginado
+from app.utils.model_utils import model_to_dict, models_to_dicts
+from app.utils.http_utils import _json_com_etag, _nao_modificado, _parse_datetime_arg, _parse_fields_arg, _parse_int_arg
 from app.services.produto_service import create_produto, get_produto_por_id, update_produto, delete_produto
-from app.services.fornecedor_service import create_fornecedor, get_fornecedor_por_id, update_fornecedor, delete_fornecedor
+from app.services.fornecedor_service import listar_fornecedores, create_fornecedor, get_fornecedor_por_id, update_fornecedor, delete_fornecedor
 from app.services.categoria_service import create_categoria, delete_categoria, get_categoria_por_id, update_categoria
 from app.models.movimentacao_model import Movimentacao
 from app.models.convites_model import Convite
 from decimal import ROUND_HALF_UP, InvalidOperation
-from app.services.movimentacao_service import criar_movimentacao_vazia
+from app.services.movimentacao_service import criar_movimentacao_vazia, listar_movimentacoes
+from app.services.unimed_service import listar_unidades
+from app.services.referencias_service import invalidar_referencias
+from app.services.versoes_service import etag_colecao, etag_movimentacoes, tocar_colecao
+from app.services.dashboard_service import acumular_movimentacao_mensal, ler_resumo, movimentacoes_por_mes
+from app.services.logs_service import listar_logs
+from app.services.importacao_service import importar_produtos, ler_csv, ler_ndjson
 from app.models.carrinho_model import Carrinho
 from sqlalchemy.exc import IntegrityError
 from app.services.convite_services import novo_link_convite
@@ -42,7 +49,7 @@ def rota_get_comercio_link(comercio_id: int):
     if usuario is None or usuario_id is None:
         return jsonify({"msg": "erro de autenticação"}), 401
 
-    db = SessionLocal()
+    db = get_request_db()
     try:
         if not usuario_tem_acesso_ao_comercio(db, usuario_id, comercio_id):
             return jsonify({"msg": "Usuário não tem acesso a este comércio."}), 403
@@ -57,11 +64,6 @@ def rota_get_comercio_link(comercio_id: int):
         db.rollback()
         current_app.logger.exception("Erro ao buscar link do comércio")
         return jsonify({"error": "Erro interno"}), 500
-    finally:
-        try:
-            db.close()
-        except Exception:
-            current_app.logger.exception("Erro ao fechar sessão do DB em rota_get_comercio_link")
 
 
 @bp.route('/<int:comercio_id>/link', methods=['POST'])
@@ -72,7 +74,7 @@ def rota_create_comercio_link(comercio_id: int):
     if usuario is None or usuario_id is None:
         return jsonify({"msg": "erro de autenticação"}), 401
 
-    db = SessionLocal()
+    db = get_request_db()
     try:
         if not usuario_tem_acesso_ao_comercio(db, usuario_id, comercio_id):
             return jsonify({"msg": "Usuário não tem acesso a este comércio."}), 403
@@ -98,11 +100,6 @@ def rota_create_comercio_link(comercio_id: int):
         db.rollback()
         current_app.logger.exception("Erro ao criar link do comércio")
         return jsonify({"error": "Erro interno"}), 500
-    finally:
-        try:
-            db.close()
-        except Exception:
-            current_app.logger.exception("Erro ao fechar sessão do DB em rota_create_comercio_link")
 
 @bp.route("", methods=["POST"])
 @token_required
@@ -112,7 +109,8 @@ def create_comercio():
     if not user:
         return jsonify({"msg": "Autenticação necessária."}), 401
     
-    comercios = get_comercios_que_usuario_tem_acesso(usuario_id=getattr(user, "usuario_id"), db=SessionLocal())
+    db = get_request_db()
+    comercios = get_comercios_que_usuario_tem_acesso(usuario_id=getattr(user, "usuario_id"), db=db)
     qtd_comercios = len(comercios)
     if qtd_comercios >= 5: 
         return jsonify({"msg":"Limite de Comercios atingido"}), 400
@@ -125,7 +123,7 @@ def create_comercio():
         return jsonify({"msg": "Campo 'nome' é obrigatório."}), 400
 
     try:
-        comercio = criar_comercio(user.usuario_id, nome, configs=configs)
+        comercio = criar_comercio(db, user.usuario_id, nome, configs=configs)
     except IntegrityError:
         return jsonify({"msg": "Nome de comércio já existe."}), 409
     except Exception as e:
@@ -155,45 +153,44 @@ def criar_categoria_no_comercio(comercio_id: int):
     if not nome:
         return jsonify({"msg": "Campo 'nome' é obrigatório."}), 400
 
-    # Abre UMA sessão (context manager fecha automaticamente)
-    with SessionLocal() as db:
-        # autorização (uma única vez)
-        if not usuario_tem_acesso_ao_comercio(db, usuario_id, comercio_id):
-            return jsonify({"msg": "Usuário não tem acesso a este comércio."}), 403
+    db = get_request_db()
+    # autorização (uma única vez)
+    if not usuario_tem_acesso_ao_comercio(db, usuario_id, comercio_id):
+        return jsonify({"msg": "Usuário não tem acesso a este comércio."}), 403
 
+    try:
+        # create_categoria já faz commit/rollback internamente (padrão que estamos usando)
+        categoria = create_categoria(db, comercio_id, nome)
+
+        location = f"/comercios/{comercio_id}/categorias/{categoria.categoria_id}"
+        resp = jsonify({
+            "categoria_id": categoria.categoria_id,
+            "codigo": categoria.codigo,
+            "nome": categoria.nome,
+            "comercio_id": categoria.comercio_id
+        })
+        resp.status_code = 201
+        resp.headers['Location'] = location
+        return resp
+
+    except IntegrityError as ie:
+        # opcional: log detalhado para debug
+        current_app.logger.debug("IntegrityError ao criar categoria: %s", str(ie))
+        # create_categoria provavelmente já deu rollback; garantir rollback extra é inofensivo
         try:
-            # create_categoria já faz commit/rollback internamente (padrão que estamos usando)
-            categoria = create_categoria(db, comercio_id, nome)
-
-            location = f"/comercios/{comercio_id}/categorias/{categoria.categoria_id}"
-            resp = jsonify({
-                "categoria_id": categoria.categoria_id,
-                "codigo": categoria.codigo,
-                "nome": categoria.nome,
-                "comercio_id": categoria.comercio_id
-            })
-            resp.status_code = 201
-            resp.headers['Location'] = location
-            return resp
-
-        except IntegrityError as ie:
-            # opcional: log detalhado para debug
-            current_app.logger.debug("IntegrityError ao criar categoria: %s", str(ie))
-            # create_categoria provavelmente já deu rollback; garantir rollback extra é inofensivo
-            try:
-                db.rollback()
-            except Exception:
-                pass
-            return jsonify({"msg": "Categoria com esse nome já existe."}), 409
+            db.rollback()
+        except Exception:
+            pass
+        return jsonify({"msg": "Categoria com esse nome já existe."}), 409
 
-        except Exception as e:
-            current_app.logger.exception("Erro ao criar categoria")
-            try:
-                db.rollback()
-            except Exception:
-                pass
-            # em dev você pode retornar detail=str(e)
-            return jsonify({"msg": "Erro ao criar categoria.", "detail": str(e)}), 500
+    except Exception as e:
+        current_app.logger.exception("Erro ao criar categoria")
+        try:
+            db.rollback()
+        except Exception:
+            pass
+        # em dev você pode retornar detail=str(e)
+        return jsonify({"msg": "Erro ao criar categoria.", "detail": str(e)}), 500
 
             
 @bp.route('/<int:comercio_id>/categorias', methods=['GET'])
@@ -209,19 +206,22 @@ def listar_categorias_do_comercio(comercio_id: int):
     if usuario is None or usuario_id is None:
         return jsonify({"msg": "erro de autenticação"}), 401
 
-    db = SessionLocal()
+    db = get_request_db()
     try:
         # verifica permissão do usuário sobre o comércio
         if not usuario_tem_acesso_ao_comercio(db, usuario_id, comercio_id):
             return jsonify({"msg": "Usuário não tem acesso a este comércio."}), 403
 
+        etag = etag_colecao(db, comercio_id, "categorias", request.query_string)
+        nao_modificado = _nao_modificado(etag)
+        if nao_modificado is not None:
+            return nao_modificado
+
         categorias = db.query(Categoria).filter(Categoria.comercio_id == comercio_id).all()
 
-        items = []
-        for c in categorias:
-            items.append(model_to_dict(c))
+        items = models_to_dicts(categorias)
 
-        return jsonify({"items": items, "total": len(items)}), 200
+        return _json_com_etag({"items": items, "total": len(items)}, etag)
 
     except SQLAlchemyError:
         current_app.logger.exception("Erro ao listar categorias")
@@ -229,11 +229,6 @@ def listar_categorias_do_comercio(comercio_id: int):
     except Exception:
         current_app.logger.exception("Erro inesperado ao listar categorias")
         return jsonify({"error": "Erro interno"}), 500
-    finally:
-        try:
-            db.close()
-        except Exception:
-            current_app.logger.exception("Erro ao fechar sessão do DB em listar_categorias")
 
 
 @bp.route('/<int:comercio_id>/categorias/<int:categoria_id>', methods=['DELETE'])
@@ -249,7 +244,7 @@ def deletar_categoria_cascade_setnull(comercio_id: int, categoria_id: int):
     if usuario is None or usuario_id is None:
         return jsonify({"msg": "erro de autenticação"}), 401
 
-    db = SessionLocal()
+    db = get_request_db()
     try:
         # verifica permissão do usuário
         if not usuario_tem_acesso_ao_comercio(db, usuario_id, comercio_id):
@@ -276,6 +271,7 @@ def deletar_categoria_cascade_setnull(comercio_id: int, categoria_id: int):
 
         # commit transacional
         db.commit()
+        invalidar_referencias(comercio_id)
 
         # 204 No Content
         return "", 204
@@ -288,11 +284,6 @@ def deletar_categoria_cascade_setnull(comercio_id: int, categoria_id: int):
         db.rollback()
         current_app.logger.exception("Erro inesperado ao deletar categoria em cascade (set null)")
         return jsonify({"error": "Erro interno"}), 500
-    finally:
-        try:
-            db.close()
-        except Exception:
-            current_app.logger.exception("Erro ao fechar sessão do DB em deletar_categoria")
 
 
         
@@ -301,66 +292,75 @@ def deletar_categoria_cascade_setnull(comercio_id: int, categoria_id: int):
 def listar_produtos(comercio_id):
     """
     GET /comercio/<comercio_id>/produtos
-    Retorna {"items": [...], "total": <int>}
+    Retorna {"items": [...], "total": <int>, "next_cursor": <str|null>}
     Cada item: campos do produto + categoriaNome, fornecedorNome, unidadeMedidaNome
+    Query params (todos opcionais):
+      - limit: tamanho da página (máx 500). Sem limit, retorna todos (compatibilidade).
+      - cursor: valor de next_cursor da página anterior
+      - ordenar: codigo|nome|preco|estoque|criado_em (default codigo); direcao: asc|desc
+      - categoria_id, fornecedor_id (-1 = sem), estoque=baixo|zerado, tag, nome (prefixo)
+      - total=0 pula a contagem
+      - fields: lista de campos separados por vírgula (projeção feita no SELECT)
     """
-    db = SessionLocal()
+    usuario: dict = g.get("usuario")
+    usuario_id = usuario.get("usuario_id") if usuario else None
+    if usuario is None or usuario_id is None:
+        return jsonify({"msg": "erro de autenticação"}), 401
+
     try:
-        produtos = get_produtos_de_comercio_por_id(db, comercio_id)
-
-        def rel_name(obj):
-            """Tenta extrair o melhor nome/label de uma relação (nome, name, label, sigla)."""
-            if obj is None:
-                return None
-            for attr in ("nome", "name", "label", "descricao", "sigla"):
-                v = getattr(obj, attr, None)
-                if v not in (None, ""):
-                    return v
-            return None
-
-        items = []
-        for p in produtos:
-            pd = model_to_dict(p)
-
-            # extrai nomes das relações de forma segura
-            pd["categoriaNome"] = rel_name(getattr(p, "categoria", None))
-            pd["fornecedorNome"] = rel_name(getattr(p, "fornecedor", None))
-
-            unidade = getattr(p, "unidade_medida", None)
-            u_nome = None
-            u_sigla = None
-            if unidade is not None:
-                u_nome = getattr(unidade, "nome", None)
-                u_sigla = getattr(unidade, "sigla", None)
-            
-            if u_nome and u_sigla:
-                pd["unidadeMedidaNome"] = f"{u_nome} ({u_sigla})"
-            
-            pd["unidadeMedidaSigla"] = u_sigla
+        limite = _parse_int_arg("limit")
+        filtros = {
+            "categoria_id": _parse_int_arg("categoria_id"),
+            "fornecedor_id": _parse_int_arg("fornecedor_id"),
+            "estoque": request.args.get("estoque") or None,
+            "tag": request.args.get("tag"),
+            "nome": request.args.get("nome"),
+        }
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+
+    db = get_request_db()
+    try:
+        if not usuario_tem_acesso_ao_comercio(db, usuario_id, comercio_id):
+            return jsonify({"msg": "Usuário não tem acesso a este comércio."}), 403
+
+        etag = etag_colecao(db, comercio_id, "produtos", request.query_string)
+        nao_modificado = _nao_modificado(etag)
+        if nao_modificado is not None:
+            return nao_modificado
 
-            # opcional: remover as chaves de relação serializadas caso model_to_dict já as tenha
-            for k in ("categoria", "fornecedor", "unidade_medida"):
-                if k in pd:
-                    pd.pop(k, None)
+        try:
+            pagina = listar_produtos_paginado(
+                db,
+                comercio_id,
+                filtros=filtros,
+                ordenar=(request.args.get("ordenar") or "codigo").lower(),
+                direcao=(request.args.get("direcao") or "asc").lower(),
+                cursor=request.args.get("cursor") or None,
+                limite=limite,
+                contar_total=request.args.get("total", "1") not in ("0", "false"),
+                campos=_parse_fields_arg(),
+            )
+        except ValueError as ve:
+            return jsonify({"error": str(ve)}), 400
 
-            items.append(pd)
+        items = pagina["items"]
 
-        return jsonify({"items": items, "total": len(items)}), 200
+        total = pagina["total"]
+        if total is None and limite is None:
+            total = len(items)
+
+        return _json_com_etag({"items": items, "total": total, "next_cursor": pagina["next_cursor"]}, etag)
 
     except SQLAlchemyError:
-        current_app.logger.exception("Erro ao listar produtos com joined relations")
+        current_app.logger.exception("Erro ao listar produtos")
         return jsonify({"error": "Erro interno ao listar produtos"}), 500
-    finally:
-        try:
-            db.close()
-        except Exception:
-            current_app.logger.exception("Erro ao fechar sessão do DB em listar_produtos")
 
 @bp.route('/<int:comercio_id>/produtos/<int:produto_id>', methods=['DELETE'])
 @token_required
 def rota_delete_produto(comercio_id, produto_id):
     """PENDENTE"""
-    db = SessionLocal()
+    db = get_request_db()
     try:
         try:
             deleted = delete_produto(db, produto_id, comercio_id)
@@ -373,17 +373,12 @@ def rota_delete_produto(comercio_id, produto_id):
     except SQLAlchemyError:
         current_app.logger.exception("Erro ao deletar produto")
         return jsonify({"error": "Erro interno ao deletar produto"}), 500
-    finally:
-        try:
-            db.close()
-        except Exception:
-            current_app.logger.exception("Erro ao fechar sessão do DB em rota_delete_produto")
 
 @bp.route('/<int:comercio_id>/categorias/<int:categoria_id>', methods=['DELETE'])
 @token_required
 def rota_delete_categoria(comercio_id, categoria_id):
     """PENDENTE"""
-    db = SessionLocal()
+    db = get_request_db()
     try:
         try:
             delete_categoria(db, categoria_id, comercio_id)
@@ -398,18 +393,13 @@ def rota_delete_categoria(comercio_id, categoria_id):
     except SQLAlchemyError:
         current_app.logger.exception("Erro ao deletar categoria")
         return jsonify({"error": "Erro interno ao deletar categoria"}), 500
-    finally:
-        try:
-            db.close()
-        except Exception:
-            current_app.logger.exception("Erro ao fechar sessão do DB em rota_delete_categoria")
 
 
 @bp.route('/<int:comercio_id>/fornecedores/<int:fornecedor_id>', methods=['DELETE'])
 @token_required
 def rota_delete_fornecedor(comercio_id, fornecedor_id):
     """PENDENTE"""
-    db = SessionLocal()
+    db = get_request_db()
     try:
         try:
             delete_fornecedor(db, fornecedor_id, comercio_id)
@@ -424,11 +414,6 @@ def rota_delete_fornecedor(comercio_id, fornecedor_id):
     except SQLAlchemyError:
         current_app.logger.exception("Erro ao deletar fornecedor")
         return jsonify({"error": "Erro interno ao deletar fornecedor"}), 500
-    finally:
-        try:
-            db.close()
-        except Exception:
-            current_app.logger.exception("Erro ao fechar sessão do DB em rota_delete_fornecedor")
 
 
 @bp.route('/<int:comercio_id>/fornecedores', methods=['GET'])
@@ -440,50 +425,22 @@ def listar_fornecedores_do_comercio(comercio_id: int):
     if usuario is None or usuario_id is None:
         return jsonify({"msg": "erro de autenticação"}), 401
 
-    db = SessionLocal()
+    db = get_request_db()
     try:
         if not usuario_tem_acesso_ao_comercio(db, usuario_id, comercio_id):
             return jsonify({"msg": "Usuário não tem acesso a este comércio."}), 403
 
-        fornecedores = db.query(Fornecedor).filter(Fornecedor.comercio_id == comercio_id).order_by(Fornecedor.fornecedor_id.asc()).all()
-        items = []
-        for f in fornecedores:
-            item = {
-                "fornecedor_id": getattr(f, "fornecedor_id", None),
-                "nome": getattr(f, "nome", None),
-                "cnpj": getattr(f, "cnpj", None),
-                "telefone": getattr(f, "telefone", None),
-                "email": getattr(f, "email", None),
-                "comercio_id": getattr(f, "comercio_id", None),
-                "criado_em": getattr(f, "criado_em", None).isoformat() if getattr(f, "criado_em", None) else None,
-                "codigo": getattr(f, "codigo", None),
-                "endereco": None
-            }
-            if getattr(f, "endereco", None) is not None:
-                e = f.endereco
-                item["endereco"] = {
-                    "endereco_id": getattr(e, "endereco_id", None),
-                    "cep": getattr(e, "cep", None),
-                    "numero": getattr(e, "numero", None),
-                    "logradouro": getattr(e, "logradouro", None),
-                    "complemento": getattr(e, "complemento", None),
-                    "bairro": getattr(e, "bairro", None),
-                    "cidade": getattr(e, "cidade", None),
-                    "estado": getattr(e, "estado", None),
-                    "pais": getattr(e, "pais", None),
-                }
-            items.append(item)
+        etag = etag_colecao(db, comercio_id, "fornecedores", request.query_string)
+        nao_modificado = _nao_modificado(etag)
+        if nao_modificado is not None:
+            return nao_modificado
 
-        return jsonify({"items": items, "total": len(items)}), 200
+        items = listar_fornecedores(db, comercio_id, campos=_parse_fields_arg())
+        return _json_com_etag({"items": items, "total": len(items)}, etag)
 
     except SQLAlchemyError:
         current_app.logger.exception("Erro ao listar fornecedores")
         return jsonify({"error": "Erro interno ao listar fornecedores"}), 500
-    finally:
-        try:
-            db.close()
-        except Exception:
-            current_app.logger.exception("Erro ao fechar sessão do DB em listar_fornecedores")
 
 # GET /comercios/<comercio_id>/unidades
 @bp.route("/<int:comercio_id>/unidades", methods=["GET"])
@@ -495,37 +452,24 @@ def listar_unidades_do_comercio(comercio_id: int):
     if usuario is None or usuario_id is None:
         return jsonify({"msg": "erro de autenticação"}), 401
 
-    db = SessionLocal()
+    db = get_request_db()
     try:
         if not usuario_tem_acesso_ao_comercio(db, usuario_id, comercio_id):
             return jsonify({"msg": "Usuário não tem acesso a este comércio."}), 403
 
-        # busca unidades que pertençam ao comercio OU unidades globais (comercio_id IS NULL)
-        unidades = db.query(UnidadeMedida).filter(
-            (UnidadeMedida.comercio_id == comercio_id) | (UnidadeMedida.comercio_id == None)
-        ).order_by(UnidadeMedida.unimed_id.asc()).all()
-
-        items = []
-        for u in unidades:
-            sigla_val = getattr(u, "sigla", None)       
-            items.append({
-                "unimed_id": getattr(u, "unimed_id", None) or getattr(u, "id", None),
-                "nome": getattr(u, "nome", None),
-                "sigla": sigla_val,
-                "comercio_id": getattr(u, "comercio_id", None),
-                "criado_em": getattr(u, "criado_em", None).isoformat() if getattr(u, "criado_em", None) else None
-            })
+        etag = etag_colecao(db, comercio_id, "unidades", request.query_string)
+        nao_modificado = _nao_modificado(etag)
+        if nao_modificado is not None:
+            return nao_modificado
 
-        return jsonify({"items": items, "total": len(items)}), 200
+        # unidades do comercio + globais (comercio_id IS NULL)
+        items = listar_unidades(db, comercio_id, campos=_parse_fields_arg())
+
+        return _json_com_etag({"items": items, "total": len(items)}, etag)
 
     except Exception:
         current_app.logger.exception("Erro ao listar unidades")
         return jsonify({"error": "Erro interno ao listar unidades"}), 500
-    finally:
-        try:
-            db.close()
-        except Exception:
-            current_app.logger.exception("Erro ao fechar sessão DB em listar_unidades")
 
 
 @bp.route("/unidades/globais", methods=["GET"])
@@ -537,34 +481,21 @@ def listar_unidades_globais():
     if usuario is None or usuario_id is None:
         return jsonify({"msg": "erro de autenticação"}), 401
 
-    db = SessionLocal()
+    db = get_request_db()
     try:
+        etag = etag_colecao(db, None, "unidades", request.query_string)
+        nao_modificado = _nao_modificado(etag)
+        if nao_modificado is not None:
+            return nao_modificado
+
         # Busca APENAS unidades globais (comercio_id IS NULL)
-        unidades = db.query(UnidadeMedida).filter(
-            UnidadeMedida.comercio_id == None
-        ).order_by(UnidadeMedida.unimed_id.asc()).all()
-
-        items = []
-        for u in unidades:
-            sigla_val = getattr(u, "sigla", None)       
-            items.append({
-                "unimed_id": getattr(u, "unimed_id", None) or getattr(u, "id", None),
-                "nome": getattr(u, "nome", None),
-                "sigla": sigla_val,
-                "comercio_id": getattr(u, "comercio_id", None),
-                "criado_em": getattr(u, "criado_em", None).isoformat() if getattr(u, "criado_em", None) else None
-            })
+        items = listar_unidades(db, campos=_parse_fields_arg())
 
-        return jsonify({"items": items, "total": len(items)}), 200
+        return _json_com_etag({"items": items, "total": len(items)}, etag)
 
     except Exception:
         current_app.logger.exception("Erro ao listar unidades globais")
         return jsonify({"error": "Erro interno ao listar unidades globais"}), 500
-    finally:
-        try:
-            db.close()
-        except Exception:
-            current_app.logger.exception("Erro ao fechar sessão DB em listar_unidades_globais")
 
 
 @bp.route('/<int:comercio_id>/fornecedores', methods=['POST'])
@@ -591,7 +522,7 @@ def criar_fornecedor_no_comercio(comercio_id: int):
         return jsonify({"msg": "Campo 'cnpj' é obrigatório."}), 400
     # aqui você pode adicionar validação de formato de CNPJ se quiser
 
-    db = SessionLocal()
+    db = get_request_db()
     try:
         if not usuario_tem_acesso_ao_comercio(db, usuario_id, comercio_id):
             return jsonify({"msg": "Usuário não tem acesso a este comércio."}), 403
@@ -635,8 +566,6 @@ def criar_fornecedor_no_comercio(comercio_id: int):
         db.rollback()
         current_app.logger.exception("Erro ao criar fornecedor")
         return jsonify({"msg": "Erro interno ao criar fornecedor"}), 500
-    finally:
-        db.close()
             
 @bp.route("/<int:comercio_id>/produtos", methods=["POST"])
 @token_required
@@ -688,7 +617,7 @@ def create_produto_route(comercio_id):
     # use o valor quantizado (2 casas) a partir daqui
     preco = preco_q
 
-    db = SessionLocal()
+    db = get_request_db()
     try:
         with db.begin():
             produto: Produto = create_produto(
@@ -724,16 +653,103 @@ def create_produto_route(comercio_id):
         db.rollback()
         current_app.logger.exception("Erro criando produto")
         return jsonify({"error": "Erro interno"}), 500
-    finally:
-        db.close()
 
     return jsonify(response_data), 201
 
+@bp.route("/<int:comercio_id>/produtos/importar", methods=["POST"])
+@token_required
+def rota_importar_produtos(comercio_id: int):
+    """
+    POST /comercios/<comercio_id>/produtos/importar
+    Importação em massa. Arquivo no campo multipart 'arquivo' (.csv ou .ndjson/.jsonl)
+    ou no corpo cru (Content-Type text/csv ou application/x-ndjson).
+    Colunas: nome, preco, quantidade_estoque, limite_estoque, tags, categoria (nome),
+    fornecedor (nome), unidade (sigla ou id; vazio = unidade padrão do comércio).
+    Query params:
+      - formato=csv|ndjson (se não der para deduzir)
+      - tudo_ou_nada=1: qualquer linha com erro cancela a importação inteira
+      - progresso=1: resposta em NDJSON, uma linha por lote processado e a última com o resumo
+    Retorna {"processadas", "inseridas", "total_erros", "erros": [{"linha", "erro"}], "status"}
+    """
+    usuario: dict = g.get("usuario")
+    usuario_id = usuario.get("usuario_id") if usuario else None
+    if usuario is None or usuario_id is None:
+        return jsonify({"msg": "erro de autenticação"}), 401
+
+    arquivo = request.files.get("arquivo")
+    if arquivo is not None:
+        stream = arquivo.stream
+        nome_arquivo = (arquivo.filename or "").lower()
+    else:
+        stream = request.stream
+        nome_arquivo = ""
+
+    formato = (request.args.get("formato") or "").lower()
+    if not formato:
+        if nome_arquivo.endswith((".ndjson", ".jsonl")) or "ndjson" in (request.mimetype or ""):
+            formato = "ndjson"
+        elif nome_arquivo.endswith(".csv") or request.mimetype == "text/csv":
+            formato = "csv"
+    if formato not in ("csv", "ndjson"):
+        return jsonify({"error": "Formato não reconhecido. Use formato=csv ou formato=ndjson."}), 400
+
+    tudo_ou_nada = request.args.get("tudo_ou_nada") in ("1", "true")
+    com_progresso = request.args.get("progresso") in ("1", "true")
+    linhas = ler_csv(stream) if formato == "csv" else ler_ndjson(stream)
+
+    db = get_request_db()
+    try:
+        if not usuario_tem_acesso_ao_comercio(db, usuario_id, comercio_id):
+            return jsonify({"msg": "Usuário não tem acesso a este comércio."}), 403
+    except SQLAlchemyError:
+        current_app.logger.exception("Erro ao verificar acesso na importação de produtos")
+        return jsonify({"error": "Erro interno ao importar produtos"}), 500
+
+    eventos = importar_produtos(db, comercio_id, linhas, tudo_ou_nada=tudo_ou_nada)
+
+    if com_progresso:
+        def gerar():
+            try:
+                for evento in eventos:
+                    yield json.dumps(evento, default=str) + "\n"
+            except UnicodeDecodeError:
+                db.rollback()
+                yield json.dumps({"fim": True, "status": "erro", "error": "Arquivo deve estar em UTF-8"}) + "\n"
+            except csv.Error as e:
+                db.rollback()
+                yield json.dumps({"fim": True, "status": "erro", "error": f"CSV inválido: {e}"}) + "\n"
+            except Exception:
+                db.rollback()
+                current_app.logger.exception("Erro na importação de produtos")
+                yield json.dumps({"fim": True, "status": "erro", "error": "Erro interno ao importar produtos"}) + "\n"
+        return Response(stream_with_context(gerar()), mimetype="application/x-ndjson")
+
+    try:
+        resumo = None
+        for resumo in eventos:
+            pass
+        resumo.pop("fim", None)
+        status = 400 if resumo["status"] == "cancelada" else 200
+        return jsonify(resumo), status
+    except UnicodeDecodeError:
+        db.rollback()
+        return jsonify({"error": "Arquivo deve estar em UTF-8"}), 400
+    except (csv.Error, ValueError) as e:
+        # csv.Error: byte NUL, campo acima do limite do módulo csv etc.
+        db.rollback()
+        current_app.logger.warning("Arquivo de importação inválido: %s", e)
+        return jsonify({"error": f"Arquivo inválido: {e}"}), 400
+    except SQLAlchemyError:
+        db.rollback()
+        current_app.logger.exception("Erro na importação de produtos")
+        return jsonify({"error": "Erro interno ao importar produtos"}), 500
+
+
 @bp.route('/<int:comercio_id>/produtos/<int:produto_id>', methods=['GET'])
 @token_required
 def rota_get_produto(comercio_id, produto_id):
     """PENDENTE"""
-    db = SessionLocal()
+    db = get_request_db()
     try:
         prod = get_produto_por_id(db, produto_id, comercio_id)
         if prod is None:
@@ -751,16 +767,11 @@ def rota_get_produto(comercio_id, produto_id):
     except SQLAlchemyError:
         current_app.logger.exception("Erro ao buscar produto")
         return jsonify({"error": "Erro interno"}), 500
-    finally:
-        try:
-            db.close()
-        except Exception:
-            current_app.logger.exception("Erro ao fechar sessão do DB em rota_get_produto")
 
 @bp.route('/<int:comercio_id>/produtos/<int:produto_id>', methods=['PUT', 'PATCH'])
 @token_required
 def rota_update_produto(comercio_id, produto_id):
-    db = SessionLocal()
+    db = get_request_db()
     try:
         payload = request.get_json(silent=True) or {}
         try:
@@ -801,17 +812,12 @@ def rota_update_produto(comercio_id, produto_id):
     except SQLAlchemyError:
         current_app.logger.exception("Erro ao atualizar produto")
         return jsonify({"error": "Erro interno ao atualizar produto"}), 500
-    finally:
-        try:
-            db.close()
-        except Exception:
-            current_app.logger.exception("Erro ao fechar sessão do DB em rota_update_produto")
 
 @bp.route('/<int:comercio_id>/fornecedores/<int:fornecedor_id>', methods=['GET'])
 @token_required
 def rota_get_fornecedor(comercio_id, fornecedor_id):
     """PENDENTE"""
-    db = SessionLocal()
+    db = get_request_db()
     try:
         f = get_fornecedor_por_id(db, fornecedor_id, comercio_id)
         if f is None:
@@ -845,18 +851,13 @@ def rota_get_fornecedor(comercio_id, fornecedor_id):
     except SQLAlchemyError:
         current_app.logger.exception("Erro ao buscar fornecedor")
         return jsonify({"error": "Erro interno"}), 500
-    finally:
-        try:
-            db.close()
-        except Exception:
-            current_app.logger.exception("Erro ao fechar sessão do DB em rota_get_fornecedor")
 
 
 @bp.route('/<int:comercio_id>/fornecedores/<int:fornecedor_id>', methods=['PUT', 'PATCH'])
 @token_required
 def rota_update_fornecedor(comercio_id, fornecedor_id):
     """PENDENTE"""
-    db = SessionLocal()
+    db = get_request_db()
     try:
         payload = request.get_json() or {}
         try:
@@ -893,17 +894,12 @@ def rota_update_fornecedor(comercio_id, fornecedor_id):
     except SQLAlchemyError:
         current_app.logger.exception("Erro ao atualizar fornecedor")
         return jsonify({"error": "Erro interno ao atualizar fornecedor"}), 500
-    finally:
-        try:
-            db.close()
-        except Exception:
-            current_app.logger.exception("Erro ao fechar sessão do DB em rota_update_fornecedor")
 
 @bp.route('/<int:comercio_id>/categorias/<int:categoria_id>', methods=['GET'])
 @token_required
 def rota_get_categoria(comercio_id, categoria_id):
     """PENDENTE"""
-    db = SessionLocal()
+    db = get_request_db()
     try:
         c = get_categoria_por_id(db, categoria_id, comercio_id)
         if c is None:
@@ -913,18 +909,13 @@ def rota_get_categoria(comercio_id, categoria_id):
     except SQLAlchemyError:
         current_app.logger.exception("Erro ao buscar categoria")
         return jsonify({"error": "Erro interno"}), 500
-    finally:
-        try:
-            db.close()
-        except Exception:
-            current_app.logger.exception("Erro ao fechar sessão do DB em rota_get_categoria")
 
 
 @bp.route('/<int:comercio_id>/categorias/<int:categoria_id>', methods=['PUT', 'PATCH'])
 @token_required
 def rota_update_categoria(comercio_id, categoria_id):
     """PENDENTE"""
-    db = SessionLocal()
+    db = get_request_db()
     try:
         payload = request.get_json() or {}
         try:
@@ -941,11 +932,6 @@ def rota_update_categoria(comercio_id, categoria_id):
     except SQLAlchemyError:
         current_app.logger.exception("Erro ao atualizar categoria")
         return jsonify({"error": "Erro interno ao atualizar categoria"}), 500
-    finally:
-        try:
-            db.close()
-        except Exception:
-            current_app.logger.exception("Erro ao fechar sessão do DB em rota_update_categoria")
             
 @bp.route('/<int:comercio_id>/movimentacoes', methods=['GET'])
 @token_required
@@ -961,23 +947,19 @@ def get_movimentacoes_de_comercio(comercio_id):
     if usuario is None or usuario_id is None:
         return jsonify({"msg": "erro de autenticação"}), 401
 
-    db = SessionLocal()
+    db = get_request_db()
     try:
         if not usuario_tem_acesso_ao_comercio(db, usuario_id, comercio_id):
             return jsonify({"msg": "Usuário não tem acesso a este comércio."}), 403
 
-        movimentacoes = db.query(Movimentacao).filter(
-            Movimentacao.comercio_id == comercio_id
-        ).order_by(Movimentacao.mov_id.asc()).all()
-        
-        itens = []
-        for m in movimentacoes:
-            item = model_to_dict(m)
-            item["tipo"] = m.tipo.capitalize().replace('i', 'í')
-            item["estado"] = m.estado.capitalize()
-            itens.append(item)
-        
-        return jsonify({"movs": itens}), 200
+        etag = etag_movimentacoes(db, comercio_id, request.query_string)
+        nao_modificado = _nao_modificado(etag)
+        if nao_modificado is not None:
+            return nao_modificado
+
+        itens = listar_movimentacoes(db, comercio_id, campos=_parse_fields_arg())
+
+        return _json_com_etag({"movs": itens}, etag)
 
     except SQLAlchemyError:
         current_app.logger.exception("Erro ao listar movimentacoes")
@@ -985,11 +967,6 @@ def get_movimentacoes_de_comercio(comercio_id):
     except Exception:
         current_app.logger.exception("Erro inesperado ao listar movimentacoes")
         return jsonify({"error": "Erro interno"}), 500
-    finally:
-        try:
-            db.close()
-        except Exception:
-            current_app.logger.exception("Erro ao fechar sessão do DB em get_movimentacoes_de_comercio")
     
 @bp.route('/<int:comercio_id>/movimentacoes/abertas', methods=['GET'])
 @token_required
@@ -1005,11 +982,16 @@ def get_movimentacoes_abertas_de_comercio(comercio_id):
     if usuario is None or usuario_id is None:
         return jsonify({"msg": "erro de autenticação"}), 401
 
-    db = SessionLocal()
+    db = get_request_db()
     try:
         if not usuario_tem_acesso_ao_comercio(db, usuario_id, comercio_id):
             return jsonify({"msg": "Usuário não tem acesso a este comércio."}), 403
 
+        etag = etag_movimentacoes(db, comercio_id, request.query_string, apenas_abertas=True)
+        nao_modificado = _nao_modificado(etag)
+        if nao_modificado is not None:
+            return nao_modificado
+
         movimentacoes = (
             db.query(Movimentacao)
             .filter(Movimentacao.comercio_id == comercio_id, 
@@ -1018,8 +1000,8 @@ def get_movimentacoes_abertas_de_comercio(comercio_id):
             .all()
         )
 
-        itens = [model_to_dict(m) for m in movimentacoes]
-        return jsonify({"movs": itens}), 200
+        itens = models_to_dicts(movimentacoes)
+        return _json_com_etag({"movs": itens}, etag)
 
     except SQLAlchemyError:
         current_app.logger.exception("Erro SQL ao listar movimentacoes")
@@ -1027,11 +1009,6 @@ def get_movimentacoes_abertas_de_comercio(comercio_id):
     except Exception:
         current_app.logger.exception("Erro inesperado ao listar movimentacoes")
         return jsonify({"error": "Erro interno"}), 500
-    finally:
-        try:
-            db.close()
-        except Exception:
-            current_app.logger.exception("Erro ao fechar sessão do DB em get_movimentacoes_de_comercio")
             
 @bp.route('/<int:comercio_id>/movimentacoes', methods=['POST'])
 @token_required
@@ -1054,7 +1031,7 @@ def criar_movimentacao_no_comercio(comercio_id: int):
     if tipo not in ("entrada", "saida"):
         return jsonify({"error": "Tipo inválido. Use 'entrada' ou 'saida'."}), 400
 
-    db = SessionLocal()
+    db = get_request_db()
     try:
         if not usuario_tem_acesso_ao_comercio(db, usuario_id, comercio_id):
             return jsonify({"msg": "Usuário não tem acesso a este comércio."}), 403
@@ -1085,11 +1062,6 @@ def criar_movimentacao_no_comercio(comercio_id: int):
         db.rollback()
         current_app.logger.exception("Erro ao criar movimentação")
         return jsonify({"error": "Erro interno ao criar movimentação"}), 500
-    finally:
-        try:
-            db.close()
-        except Exception:
-            current_app.logger.exception("Erro ao fechar sessão do DB em criar_movimentacao_no_comercio")
 
 @bp.route('/<int:comercio_id>/movimentacoes/link/<string:link>', methods=['GET'])
 @token_required
@@ -1100,7 +1072,7 @@ def get_movimentacao_por_link(comercio_id: int, link: str):
     if usuario is None or usuario_id is None:
         return jsonify({"msg": "erro de autenticação"}), 401
 
-    db = SessionLocal()
+    db = get_request_db()
     try:
         if not usuario_tem_acesso_ao_comercio(db, usuario_id, comercio_id):
             return jsonify({"msg": "Usuário não tem acesso a este comércio."}), 403
@@ -1119,11 +1091,6 @@ def get_movimentacao_por_link(comercio_id: int, link: str):
     except SQLAlchemyError:
         current_app.logger.exception("Erro ao buscar movimentação por link")
         return jsonify({"error": "Erro interno"}), 500
-    finally:
-        try:
-            db.close()
-        except Exception:
-            current_app.logger.exception("Erro ao fechar sessão do DB em get_movimentacao_por_link")
 
 
 @bp.route("/<int:comercio_id>/config", methods=["GET"])
@@ -1135,7 +1102,7 @@ def rota_get_configuracoes_comercio(comercio_id: int):
     if usuario is None or usuario_id is None:
         return jsonify({"msg": "erro de autenticação"}), 401
 
-    db = SessionLocal()
+    db = get_request_db()
     try:
         if not usuario_tem_acesso_ao_comercio(db, usuario_id, comercio_id):
             return jsonify({"msg": "Usuário não tem acesso a este comércio."}), 403
@@ -1175,11 +1142,6 @@ def rota_get_configuracoes_comercio(comercio_id: int):
     except Exception:
         current_app.logger.exception("Erro inesperado ao buscar configuração do comércio")
         return jsonify({"error": "Erro interno"}), 500
-    finally:
-        try:
-            db.close()
-        except Exception:
-            current_app.logger.exception("Erro ao fechar sessão do DB em rota_get_configuracoes_comercio")
 
 @bp.route("/<int:comercio_id>/config", methods=["PATCH", "PUT"])
 @token_required
@@ -1205,7 +1167,7 @@ def rota_update_configuracoes_comercio(comercio_id: int):
         or (body.get("configs") or {}).get("campo4")
     )
 
-    db = SessionLocal()
+    db = get_request_db()
     try:
         # Authorization
         if not usuario_tem_acesso_ao_comercio(db, usuario_id, comercio_id):
@@ -1250,6 +1212,9 @@ def rota_update_configuracoes_comercio(comercio_id: int):
                 config.unimed_id = unimed_id_to_set
 
         db.add(comercio)
+        if limite_to_set is not None:
+            # ?estoque=baixo da listagem de produtos depende do limite global
+            tocar_colecao(db, comercio_id, "produtos")
         db.commit()
 
         # Build response matching GET endpoint format
@@ -1268,8 +1233,6 @@ def rota_update_configuracoes_comercio(comercio_id: int):
         db.rollback()
         current_app.logger.exception("Erro inesperado ao salvar configuração")
         return jsonify({"error": "Erro interno ao salvar configuração."}), 500
-    finally:
-        db.close()
 
 
 def _resolve_unidade_id(db, unidade_raw):
@@ -1316,7 +1279,7 @@ def rota_delete_comercio(comercio_id: int):
     if usuario is None or usuario_id is None:
         return jsonify({"msg": "erro de autenticação"}), 401
 
-    db = SessionLocal()
+    db = get_request_db()
     try:
         comercio = db.query(Comercio).filter(Comercio.comercio_id == comercio_id).first()
         if not comercio:
@@ -1333,6 +1296,8 @@ def rota_delete_comercio(comercio_id: int):
         # Deleta o comércio — se as FKs estiverem com ON DELETE CASCADE, o DB cuidará
         db.delete(comercio)
         db.commit()
+        invalidar_acessos_comercio(comercio_id)
+        invalidar_referencias(comercio_id)
 
         return jsonify({"msg": "Comércio excluído com sucesso."}), 200
 
@@ -1344,8 +1309,6 @@ def rota_delete_comercio(comercio_id: int):
         db.rollback()
         current_app.logger.exception("Erro inesperado ao deletar comércio")
         return jsonify({"error": "Erro interno."}), 500
-    finally:
-        db.close()
 
 @bp.route("/<int:comercio_id>/movimentacoes/<int:mov_id>", methods=["DELETE"])
 @token_required
@@ -1356,7 +1319,7 @@ def rota_delete_movimentacao(comercio_id: int, mov_id: int):
     if usuario is None or usuario_id is None:
         return jsonify({"msg": "erro de autenticação"}), 401
 
-    db = SessionLocal()
+    db = get_request_db()
     try:
         # checar se usuário tem acesso ao comércio (mesma função que você já usa)
         if not usuario_tem_acesso_ao_comercio(db, usuario_id, comercio_id):
@@ -1374,6 +1337,10 @@ def rota_delete_movimentacao(comercio_id: int, mov_id: int):
         # if mov.estado != 'aberta':
         #     return jsonify({"msg":"Só é possível excluir movimentações abertas."}), 400
 
+        if mov.fechado_em is not None:
+            # tira dos totais mensais antes de apagar
+            acumular_movimentacao_mensal(db, comercio_id, mov.tipo, mov.fechado_em,
+                                         mov.total_itens, mov.valor_total, sinal=-1)
         db.delete(mov)
         db.commit()
         # 204 no REST indica sucesso sem corpo — 200 com msg também OK
@@ -1387,8 +1354,6 @@ def rota_delete_movimentacao(comercio_id: int, mov_id: int):
         db.rollback()
         current_app.logger.exception("Erro inesperado ao deletar movimentação")
         return jsonify({"error": "Erro interno."}), 500
-    finally:
-        db.close()
 
 @bp.route("/<int:comercio_id>/dashboard/cards", methods=["GET"])
 @token_required
@@ -1398,79 +1363,22 @@ def rota_dashboard_cards(comercio_id: int):
     if usuario is None or usuario_id is None:
         return jsonify({"msg": "erro de autenticação"}), 401
 
-    db = SessionLocal()
+    db = get_request_db()
     try:
         # autorização
         if not usuario_tem_acesso_ao_comercio(db, usuario_id, comercio_id):
             return jsonify({"msg": "Usuário não tem acesso a este comércio."}), 403
 
-        # Recupera limite global do comércio (se existir)
-        limite_num = None
-        comercio = db.query(Comercio).filter(Comercio.comercio_id == comercio_id).first()
-        if comercio and getattr(comercio, "configuracao_id", None):
-            config = db.query(ConfiguracaoComercio).filter(ConfiguracaoComercio.id == comercio.configuracao_id).first()
-            if config is not None:
-                try:
-                    lv = getattr(config, "nivel_alerta_minimo", None)
-                    limite_num = int(lv) if lv is not None else None
-                except Exception:
-                    limite_num = None
-
-        # contar produtos com estoque exatamente zero
-        zero_count = db.query(func.count(Produto.produto_id)).filter(
-            Produto.comercio_id == comercio_id,
-            Produto.quantidade_estoque == 0
-        ).scalar() or 0
-
-        # contar produtos com estoque baixo (leva em conta limite_estoque do produto ou limite_global)
-        cond_prod_limite = and_(
-            Produto.limite_estoque != None,
-            Produto.limite_estoque > 0,
-            Produto.quantidade_estoque > 0,
-            Produto.quantidade_estoque < Produto.limite_estoque
-        )
-        cond_global_limite = None
-        if limite_num is not None and limite_num > 0:
-            cond_global_limite = and_(
-                Produto.limite_estoque == None,
-                Produto.quantidade_estoque > 0,
-                Produto.quantidade_estoque < limite_num
-            )
-
-        if cond_global_limite is not None:
-            low_count = db.query(func.count(Produto.produto_id)).filter(
-                Produto.comercio_id == comercio_id,
-                or_(cond_prod_limite, cond_global_limite)
-            ).scalar() or 0
-        else:
-            low_count = db.query(func.count(Produto.produto_id)).filter(
-                Produto.comercio_id == comercio_id,
-                cond_prod_limite
-            ).scalar() or 0
-
-        # --- NOVO: faturamento ---
-        # soma valor_total das movimentações que são 'saida' e 'fechada' para o comercio
-        faturamento_total_raw = db.query(func.coalesce(func.sum(Movimentacao.valor_total), 0)).filter(
-            Movimentacao.comercio_id == comercio_id,
-            func.lower(Movimentacao.tipo) == 'saida',
-            func.lower(Movimentacao.estado) == 'fechada'
-        ).scalar() or 0
-
-        # faturamento_total_raw pode ser Decimal; convertemos para float para serializar
-        try:
-            faturamento_total = float(faturamento_total_raw)
-        except Exception:
-            # fallback: str -> float
-            try:
-                faturamento_total = float(str(faturamento_total_raw))
-            except Exception:
-                faturamento_total = 0.0
+        # uma linha de resumos_comercio, mantida por triggers (ver dashboard_service)
+        resumo = ler_resumo(db, comercio_id)
+        if resumo is None:
+            return jsonify({"msg": "Comércio não encontrado."}), 404
 
         return jsonify({
-            "zero_count": int(zero_count),
-            "low_count": int(low_count),
-            "limite_global": int(limite_num) if limite_num is not None else None,
-            "faturamento_total": faturamento_total
+            "zero_count": resumo["zero_count"],
+            "low_count": resumo["low_count"],
+            "limite_global": resumo["limite_global"],
+            "faturamento_total": float(resumo["faturamento_total"])
         }), 200
 
     except SQLAlchemyError:
@@ -1481,11 +1389,6 @@ def rota_dashboard_cards(comercio_id: int):
         db.rollback()
         current_app.logger.exception("Erro inesperado ao gerar dados do dashboard")
         return jsonify({"error": "Erro interno"}), 500
-    finally:
-        try:
-            db.close()
-        except Exception:
-            current_app.logger.exception("Erro ao fechar sessão do DB em rota_dashboard_cards")
 
 @bp.route("/<int:comercio_id>/dashboard/movimentacoes_mensais", methods=["GET"])
 @token_required
@@ -1510,55 +1413,28 @@ def rota_movimentacoes_mensais(comercio_id: int):
     except Exception:
         return jsonify({"msg": "Parâmetro 'year' inválido"}), 400
 
-    db = SessionLocal()
+    db = get_request_db()
     try:
         # autorização
         if not usuario_tem_acesso_ao_comercio(db, usuario_id, comercio_id):
             return jsonify({"msg": "Usuário não tem acesso a este comércio."}), 403
 
-        # base filter: movimentações do comércio e que estejam fechadas (fechado_em não nulo)
-        base_filters = [Movimentacao.comercio_id == comercio_id, Movimentacao.fechado_em != None]
-
-        if year_int:
-            base_filters.append(extract('year', Movimentacao.fechado_em) == year_int)
-
-        if tipo in ("entrada", "saida"):
-            base_filters.append(func.lower(Movimentacao.tipo) == tipo)
-
-        # 1) soma valor_total por mês (usando Movimentacao.fechado_em)
-        q_valor = db.query(
-            extract('month', Movimentacao.fechado_em).label('month'),
-            func.coalesce(func.sum(Movimentacao.valor_total), 0).label('valor_total'),
-            func.count(Movimentacao.mov_id).label('mov_count')
-        ).filter(*base_filters).group_by('month').order_by('month')
-
-        rows_valor = q_valor.all()
-
-        # 2) soma total_itens por mês
-        # primeiro tentamos usar Movimentacao.total_itens caso exista a coluna
-        total_itens_rows = []
-        has_total_itens = hasattr(Movimentacao, "total_itens")
-        if has_total_itens:
-            q_itens = db.query(
-                extract('month', Movimentacao.fechado_em).label('month'),
-                func.coalesce(func.sum(Movimentacao.total_itens), 0).label('total_itens')
-            ).filter(*base_filters).group_by('month').order_by('month')
-            total_itens_rows = q_itens.all()
-
-        # build dicts month -> values
-        valor_map = { int(r.month): { "valor_total": float(r.valor_total or 0), "mov_count": int(r.mov_count or 0) } for r in rows_valor }
-        itens_map = { int(r.month): int(r.total_itens or 0) for r in total_itens_rows }
+        # até 12 linhas de movimentacoes_mensais (mantida ao fechar/excluir movimentações)
+        por_mes = movimentacoes_por_mes(
+            db, comercio_id,
+            ano=year_int,
+            tipo=tipo if tipo in ("entrada", "saida") else None,
+        )
 
         # assemble final array 1..12 (labels pt-BR)
         labels = ["Jan","Fev","Mar","Abr","Mai","Jun","Jul","Ago","Set","Out","Nov","Dez"]
         data = []
         for m in range(1, 13):
-            v = valor_map.get(m, {"valor_total": 0.0, "mov_count": 0})
-            itens = itens_map.get(m, 0)
+            v = por_mes.get(m, {"valor_total": 0, "mov_count": 0, "total_itens": 0})
             data.append({
                 "month": m,
                 "label": labels[m-1],
-                "total_itens": int(itens),
+                "total_itens": int(v["total_itens"]),
                 "valor_total": float(v["valor_total"]),
                 "mov_count": int(v["mov_count"])
             })
@@ -1578,6 +1454,54 @@ def rota_movimentacoes_mensais(comercio_id: int):
         db.rollback()
         current_app.logger.exception("Erro inesperado ao agregar movimentações")
         return jsonify({"error": "Erro interno"}), 500
-    finally:
-        db.close()
 
+
+@bp.route("/<int:comercio_id>/logs", methods=["GET"])
+@token_required
+def rota_listar_logs(comercio_id: int):
+    """
+    Histórico de alterações (auditoria) do comércio, mais recente primeiro.
+    GET /comercios/<comercio_id>/logs
+    Retorna {"items": [...], "next_cursor": <str|null>}
+    Query params (todos opcionais):
+      - tabela: comercios|produtos|fornecedores|convites
+      - record_id: id do registro (exige tabela) -> histórico de um registro
+      - desde (inclusive), ate (exclusive): datas ISO 8601 em alterado_em
+      - limit: tamanho da página (default 50, máx 200); cursor: next_cursor anterior
+    """
+    usuario: dict = g.get("usuario")
+    usuario_id = usuario.get("usuario_id") if usuario else None
+    if usuario is None or usuario_id is None:
+        return jsonify({"msg": "erro de autenticação"}), 401
+
+    try:
+        limite = _parse_int_arg("limit")
+        desde = _parse_datetime_arg("desde")
+        ate = _parse_datetime_arg("ate")
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+
+    db = get_request_db()
+    try:
+        if not usuario_tem_acesso_ao_comercio(db, usuario_id, comercio_id):
+            return jsonify({"msg": "Usuário não tem acesso a este comércio."}), 403
+
+        try:
+            pagina = listar_logs(
+                db,
+                comercio_id,
+                tabela=(request.args.get("tabela") or "").lower() or None,
+                record_id=request.args.get("record_id") or None,
+                desde=desde,
+                ate=ate,
+                cursor=request.args.get("cursor") or None,
+                limite=limite,
+            )
+        except ValueError as ve:
+            return jsonify({"error": str(ve)}), 400
+
+        return jsonify(pagina), 200
+
+    except SQLAlchemyError:
+        current_app.logger.exception("Erro ao listar logs")
+        return jsonify({"error": "Erro interno ao listar logs"}), 500
@@ -2,7 +2,7 @@
 import os
 from flask import Blueprint, current_app, g, request, jsonify
 from app.middleware.auth import token_required  #
-from app.database.database import SessionLocal, get_db
+from app.database.request_session import get_request_db
 from app.utils.convites_utils import validar_convite, aceitar_convite
 from sqlalchemy.exc import SQLAlchemyError
 
@@ -27,18 +27,13 @@ def get_convite(invite_code=None):
         
     usuario: dict = g.get("usuario")
 
-    db_gen = None
     try:
-        db_gen = get_db()
-        db = next(db_gen)
+        db = get_request_db()
         result = validar_convite(invite_code, usuario, db)
         return jsonify(result), 200 if result.get("isValid") else 400
     except SQLAlchemyError as e:
         current_app.logger.exception("Erro DB em get_convite")
         return jsonify({"isValid": False, "message": "Erro interno do servidor"}), 500
-    finally:
-        if db_gen:
-            db_gen.close()
 
 
 @bp.route('/', methods=['POST'])
@@ -64,10 +59,8 @@ def post_convite():
 
     usuario_id = usuario.get("usuario_id")
 
-    db_gen = None
     try:
-        db_gen = get_db()
-        db = next(db_gen)
+        db = get_request_db()
 
         result = aceitar_convite(invite_code, usuario_id, db)
         if result.get("success"):
@@ -79,6 +72,3 @@ def post_convite():
     except Exception as e:
         current_app.logger.exception("Erro ao aceitar convite")
         return jsonify({"success": False, "message": "Erro interno do servidor"}), 500
-    finally:
-        if db_gen:
-            db_gen.close()
@@ -1,5 +1,5 @@
 from flask import Blueprint, make_response, request, jsonify, g
-from app.database.database import get_db
+from app.database.request_session import get_request_db
 from ..services.usuarios_service import get_usuario_por_email, get_usuario_por_id
 from passlib.hash import bcrypt
 import jwt
@@ -35,49 +35,45 @@ def login():
     if not email or not senha:
         return jsonify({"mensagem": "Email e senha são obrigatórios"}), 400
 
-    db_gen = get_db()
-    db = next(db_gen)
-
-    try:
-        usuario = get_usuario_por_email(db, email)
-        if not usuario:
-            return jsonify({"mensagem": "Credenciais inválidas"}), 401
-
-        if not bcrypt.verify(senha, usuario.senha_hash):
-            return jsonify({"mensagem": "Credenciais inválidas"}), 401
-
-        # access token de curta duração (recomendado: 15 minutos)
-        access = _make_jwt(
-            {"usuario_id": usuario.usuario_id, "email": usuario.email},
-            expire_minutes=15
-        )
-        # refresh token mais longo, guardado apenas como cookie HttpOnly
-        refresh = _make_jwt({"usuario_id": usuario.usuario_id, "type": "refresh"},
-                             expire_minutes=60 * 24 * 7)
-
-        resp = make_response(jsonify({
-            "usuario": {
-                "usuario_id": usuario.usuario_id,
-                "email": usuario.email,
-                "nome": usuario.nome_completo
-            },
-            "access_token": access,
-            "token_type": "Bearer",
-            "expires_in": 15 * 60 
-        }))
-
-        secure_flag = os.getenv("FLASK_ENV") == "production"
-        resp.set_cookie(
-            "refresh_token",
-            refresh,
-            httponly=True,
-            samesite='Lax',
-            secure=secure_flag,
-        )
-
-        return resp, 200
-    finally:
-        db_gen.close()
+    db = get_request_db()
+
+    usuario = get_usuario_por_email(db, email)
+    if not usuario:
+        return jsonify({"mensagem": "Credenciais inválidas"}), 401
+
+    if not bcrypt.verify(senha, usuario.senha_hash):
+        return jsonify({"mensagem": "Credenciais inválidas"}), 401
+
+    # access token de curta duração (recomendado: 15 minutos)
+    access = _make_jwt(
+        {"usuario_id": usuario.usuario_id, "email": usuario.email},
+        expire_minutes=15
+    )
+    # refresh token mais longo, guardado apenas como cookie HttpOnly
+    refresh = _make_jwt({"usuario_id": usuario.usuario_id, "type": "refresh"},
+                         expire_minutes=60 * 24 * 7)
+
+    resp = make_response(jsonify({
+        "usuario": {
+            "usuario_id": usuario.usuario_id,
+            "email": usuario.email,
+            "nome": usuario.nome_completo
+        },
+        "access_token": access,
+        "token_type": "Bearer",
+        "expires_in": 15 * 60 
+    }))
+
+    secure_flag = os.getenv("FLASK_ENV") == "production"
+    resp.set_cookie(
+        "refresh_token",
+        refresh,
+        httponly=True,
+        samesite='Lax',
+        secure=secure_flag,
+    )
+
+    return resp, 200
 
 
 # === rota para refresh ===
@@ -6,7 +6,7 @@ from app.services.cadastro_comercio_service import criar_comercio
 from app.api.auth import get_current_user
 from app.middleware.auth import token_required
 from app.services.usuarios_service import get_comercios_que_usuario_tem_acesso, get_usuario_por_id
-from app.database.database import SessionLocal, get_db
+from app.database.request_session import get_request_db
 from app.models.comercios_model import Comercio
 from app.utils.model_utils import model_to_dict 
 
@@ -24,15 +24,13 @@ def me():
     if not token:
         return jsonify({'mensagem': 'Token de acesso ausente'}), 401
 
-    db_gen = None
     try:
         dados = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
         usuario_id = dados.get('usuario_id')
         if not usuario_id:
             return jsonify({'mensagem': 'Token inválido'}), 401
 
-        db_gen = get_db()
-        db = next(db_gen)
+        db = get_request_db()
         usuario = get_usuario_por_id(db, usuario_id)
         
         comercios_puro = get_comercios_que_usuario_tem_acesso(db, usuario.usuario_id)
@@ -66,9 +64,6 @@ def me():
         return jsonify({'mensagem': 'Token expirado'}), 401
     except jwt.InvalidTokenError:
         return jsonify({'mensagem': 'Token inválido'}), 401
-    finally:
-        if db_gen:
-            db_gen.close()
 
 
 @bp.route('/comercios', methods=["GET"])
@@ -80,7 +75,7 @@ def query_comercios():
     if usuario is None or usuario_id is None:
         return jsonify({"msg":"erro de atutenticação"}), 401
     
-    comercios = get_comercios_que_usuario_tem_acesso(SessionLocal(), usuario_id)
+    comercios = get_comercios_que_usuario_tem_acesso(get_request_db(), usuario_id)
 
     comercios_serializados = []
     for c in comercios:
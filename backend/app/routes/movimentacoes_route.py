@@ -1,26 +1,33 @@
 from decimal import Decimal
 from flask import Blueprint, request, jsonify, g, current_app
 from sqlalchemy.exc import SQLAlchemyError, IntegrityError
-from app.database.database import SessionLocal
+from sqlalchemy.orm import noload
+from app.database.request_session import get_request_db
 from app.middleware.auth import token_required
 from app.services.movimentacao_service import (
     _format_cart_with_items,
     criar_movimentacao_vazia,
     adicionar_produto_em_carrinho,
+    adicionar_produtos_em_lote,
     deletar_item_de_carrinho,
     get_itens_carrinho,
     finalizar_movimentacao,
+    montar_delta_carrinho,
 )
 from app.services.usuarios_service import usuario_tem_acesso_ao_comercio
 from app.utils.model_utils import model_to_dict
 from app.models.movimentacao_model import Movimentacao
 from app.models.carrinho_model import Carrinho
 from app.models.carrinho_item_model import CarrinhoItem
-from app.models.produtos_model import Produto
 
 bp = Blueprint("movimentacoes", __name__, url_prefix="/api/movimentacoes")
 
 
+def _quer_delta() -> bool:
+    """?resposta=delta: devolve só a linha alterada + totais + versão em vez do carrinho todo."""
+    return (request.args.get("resposta") or "").lower() == "delta"
+
+
 
 
 
@@ -34,7 +41,7 @@ def get_carrinho_de_mov(link):
     if not all([usuario, usuario_id, comercio_id]):
         return jsonify({"msg": "erro de autenticação"}), 401
 
-    db = SessionLocal()
+    db = get_request_db()
     try:
         if not usuario_tem_acesso_ao_comercio(db, usuario_id, comercio_id):
             return jsonify({"msg": "autoridade insuficiente"}), 401
@@ -46,7 +53,7 @@ def get_carrinho_de_mov(link):
         if mov is None:
             return jsonify({"msg": "mov não encontrado"}), 400
 
-        cart = db.query(Carrinho).filter(Carrinho.carrinho_id == mov.carrinho_id).first()
+        cart = db.query(Carrinho).options(noload(Carrinho.itens)).filter(Carrinho.carrinho_id == mov.carrinho_id).first()
         if cart is None:
             return jsonify({"msg": "carrinho não encontrado"}), 400
 
@@ -56,8 +63,6 @@ def get_carrinho_de_mov(link):
     except SQLAlchemyError:
         current_app.logger.exception("Erro ao pegar carrinho")
         return jsonify({"error": "Erro interno ao pegar carrinho."}), 500
-    finally:
-        db.close()
 
 
 @bp.route("/<string:link>/carrinho", methods=["POST"])
@@ -71,7 +76,7 @@ def create_carrinho_for_mov(link):
     if not all([usuario, usuario_id, comercio_id]):
         return jsonify({"msg": "erro de autenticação"}), 401
 
-    db = SessionLocal()
+    db = get_request_db()
     try:
         if not usuario_tem_acesso_ao_comercio(db, usuario_id, comercio_id):
             return jsonify({"msg": "autoridade insuficiente"}), 401
@@ -86,7 +91,7 @@ def create_carrinho_for_mov(link):
             db.commit()
             db.refresh(mov)
 
-        cart = db.query(Carrinho).filter(Carrinho.carrinho_id == mov.carrinho_id).first()
+        cart = db.query(Carrinho).options(noload(Carrinho.itens)).filter(Carrinho.carrinho_id == mov.carrinho_id).first()
         if cart is None:
             return jsonify({"msg": "falha ao criar carrinho"}), 500
 
@@ -98,8 +103,6 @@ def create_carrinho_for_mov(link):
     except Exception:
         current_app.logger.exception("Erro inesperado ao criar movimentação/carrinho")
         return jsonify({"error": "Erro interno."}), 500
-    finally:
-        db.close()
 
 
 @bp.route("/<string:link>/carrinho/p/<int:produto_id>", methods=["POST"])
@@ -120,7 +123,7 @@ def add_item_a_mov(link, produto_id):
     except (TypeError, ValueError):
         return jsonify({"msg": "comercio_id e quantidade inválidos"}), 400
 
-    db = SessionLocal()
+    db = get_request_db()
     try:
         if not usuario_tem_acesso_ao_comercio(db, usuario_id, comercio_id):
             return jsonify({"msg": "autoridade insuficiente"}), 401
@@ -132,20 +135,10 @@ def add_item_a_mov(link, produto_id):
         if mov is None:
             return jsonify({"msg": "mov não encontrado"}), 400
 
-        cart = db.query(Carrinho).filter(Carrinho.carrinho_id == mov.carrinho_id).first()
-        if cart is None:
-            return jsonify({"msg": "carrinho não encontrado"}), 400
-
-        prod = db.query(Produto).filter(
-            Produto.produto_id == produto_id,
-            Produto.comercio_id == comercio_id
-        ).first()
-        if prod is None:
-            return jsonify({"msg": "produto não encontrado"}), 400
-
+        # produto inexistente/de outro comércio vira ValueError no serviço
         item = adicionar_produto_em_carrinho(
             db=db,
-            carrinho_id=cart.carrinho_id,
+            carrinho_id=mov.carrinho_id,
             produto_id=produto_id,
             quantidade=quantidade,
             comercio_id=comercio_id,
@@ -155,7 +148,12 @@ def add_item_a_mov(link, produto_id):
             return jsonify({"msg": "falha ao adicionar item"}), 400
 
         db.commit()
-        # refresh do cart não é estritamente necessário aqui, porque formatamos lendo itens do DB
+        if _quer_delta():
+            return jsonify({"delta": montar_delta_carrinho(db, mov.carrinho_id, [item["item_id"]])}), 200
+
+        cart = db.query(Carrinho).options(noload(Carrinho.itens)).filter(Carrinho.carrinho_id == mov.carrinho_id).first()
+        if cart is None:
+            return jsonify({"msg": "carrinho não encontrado"}), 400
         cart_dict = _format_cart_with_items(db, cart)
         return jsonify({"carrinho": cart_dict}), 200
     except ValueError as ve:
@@ -165,8 +163,60 @@ def add_item_a_mov(link, produto_id):
         db.rollback()
         current_app.logger.exception("Erro ao adicionar item ao carrinho")
         return jsonify({"error": "Erro interno ao adicionar item."}), 500
-    finally:
-        db.close()
+
+
+@bp.route("/<string:link>/carrinho/itens", methods=["POST"])
+@token_required
+def add_itens_em_lote(link):
+    """
+    Adiciona vários produtos de uma vez (leituras em sequência do leitor de código).
+    Body: {"comercio_id": int, "itens": [{"produto_id", "quantidade", "desconto_percentual"?}]}
+    Tudo numa transação: se um item for inválido, nada é gravado.
+    """
+    usuario = g.get("usuario")
+    usuario_id = usuario.get("usuario_id") if usuario else None
+    data = request.get_json() or {}
+    try:
+        comercio_id = int(data.get("comercio_id")) or None
+    except (TypeError, ValueError):
+        comercio_id = None
+
+    if not all([usuario, usuario_id, comercio_id]):
+        return jsonify({"msg": "erro de autenticação"}), 401
+
+    db = get_request_db()
+    try:
+        if not usuario_tem_acesso_ao_comercio(db, usuario_id, comercio_id):
+            return jsonify({"msg": "autoridade insuficiente"}), 401
+
+        mov = db.query(Movimentacao).filter(
+            Movimentacao.link == link,
+            Movimentacao.comercio_id == comercio_id
+        ).first()
+        if mov is None:
+            return jsonify({"msg": "mov não encontrado"}), 400
+
+        item_ids = adicionar_produtos_em_lote(
+            db=db,
+            carrinho_id=mov.carrinho_id,
+            comercio_id=comercio_id,
+            itens=data.get("itens"),
+        )
+        db.commit()
+
+        if _quer_delta():
+            return jsonify({"delta": montar_delta_carrinho(db, mov.carrinho_id, item_ids)}), 200
+
+        cart = db.query(Carrinho).options(noload(Carrinho.itens)).filter(Carrinho.carrinho_id == mov.carrinho_id).first()
+        cart_dict = _format_cart_with_items(db, cart)
+        return jsonify({"carrinho": cart_dict}), 200
+    except ValueError as ve:
+        db.rollback()
+        return jsonify({"msg": str(ve)}), 400
+    except SQLAlchemyError:
+        db.rollback()
+        current_app.logger.exception("Erro ao adicionar itens em lote ao carrinho")
+        return jsonify({"error": "Erro interno ao adicionar itens."}), 500
 
 
 @bp.route("/<string:link>/carrinho/item/<int:item_id>", methods=["DELETE"])
@@ -179,15 +229,18 @@ def delete_item_from_cart(link, item_id):
     if not all([usuario, usuario_id, comercio_id]):
         return jsonify({"msg": "erro de autenticação"}), 401
 
-    db = SessionLocal()
+    db = get_request_db()
     try:
         if not usuario_tem_acesso_ao_comercio(db, usuario_id, comercio_id):
             return jsonify({"msg": "autoridade insuficiente"}), 401
 
-        cart = deletar_item_de_carrinho(db, item_id)
+        cart = deletar_item_de_carrinho(db, item_id, comercio_id=comercio_id)
         
         if not cart:
             return jsonify({"msg":"Erro ao deletar item"}), 400
+
+        if _quer_delta():
+            return jsonify({"delta": montar_delta_carrinho(db, cart.carrinho_id, [item_id])}), 200
         
         cart_dict = _format_cart_with_items(db, cart)
         return jsonify({"carrinho": cart_dict}), 200
@@ -195,8 +248,6 @@ def delete_item_from_cart(link, item_id):
         db.rollback()
         current_app.logger.exception("Erro ao deletar item do carrinho")
         return jsonify({"error": "Erro interno ao deletar item."}), 500
-    finally:
-        db.close()
 
 
 @bp.route("", methods=["POST"])
@@ -213,10 +264,9 @@ def salvar_movimentacao():
     if not all([usuario, usuario_id, comercio_id, carrinho_id, tipo]):
         return jsonify({"msg": "dados incompletos"}), 400
 
-    db = SessionLocal()
+    db = get_request_db()
     try:
         if not usuario_tem_acesso_ao_comercio(db, usuario_id, comercio_id):
-            db.close()
             return jsonify({"msg": "autoridade insuficiente"}), 401
 
         mov = db.query(Movimentacao).filter(
@@ -226,7 +276,6 @@ def salvar_movimentacao():
         ).first()
 
         if mov is None:
-            db.close()
             return jsonify({"msg": "movimentação não encontrada ou já fechada"}), 400
 
         mov = finalizar_movimentacao(db=db, mov_id=mov.mov_id, comercio_id=comercio_id, tipo=tipo)
@@ -242,5 +291,3 @@ def salvar_movimentacao():
         db.rollback()
         current_app.logger.exception("Erro ao salvar movimentação")
         return jsonify({"error": "Erro interno."}), 500
-    finally:
-        db.close()
@@ -0,0 +1,22 @@
+import os
+from flask import Blueprint, jsonify
+from app.middleware.auth import token_required
+from app.services.usuarios_service import estatisticas_cache_acessos
+from app.services.referencias_service import estatisticas_cache_referencias
+
+bp = Blueprint("status", __name__, url_prefix="/api/status")
+
+
+@bp.route("/caches", methods=["GET"])
+@token_required
+def rota_estatisticas_caches():
+    """
+    GET /api/status/caches
+    Contadores dos caches locais deste worker (cada worker gunicorn tem os seus;
+    o `pid` identifica qual worker respondeu).
+    """
+    return jsonify({
+        "pid": os.getpid(),
+        "acessos": estatisticas_cache_acessos(),
+        "referencias": estatisticas_cache_referencias(),
+    }), 200
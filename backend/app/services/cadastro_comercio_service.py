@@ -1,18 +1,17 @@
 # app/services/cadastro_comercio_service.py
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from app.database.database import SessionLocal
 from app.models.comercios_model import Comercio
 from app.models.comercios_usuarios import ComercioUsuario
 from app.models.configs_comercio import ConfiguracaoComercio
+from app.services.usuarios_service import invalidar_acessos_usuario
 
-def criar_comercio(proprietario_id: int, nome: str, configs: dict | None = None) -> Comercio:
+def criar_comercio(session: Session, proprietario_id: int, nome: str, configs: dict | None = None) -> Comercio:
     """
     Cria um comercio, a configuracao (opcional) e associa o usuario como membro/proprietario.
     Lança IntegrityError se o nome for duplicado.
     Retorna a instância Comercio (persistida).
     """
-    session: Session = SessionLocal()
     try:
         # 1) cria configuracao (se veio)
         configuracao_obj = None
@@ -49,6 +48,7 @@ def criar_comercio(proprietario_id: int, nome: str, configs: dict | None = None)
 
         # 4) commit final
         session.commit()
+        invalidar_acessos_usuario(proprietario_id)
         session.refresh(comercio)
         return comercio
     except IntegrityError:
@@ -57,5 +57,3 @@ def criar_comercio(proprietario_id: int, nome: str, configs: dict | None = None)
     except Exception:
         session.rollback()
         raise
-    finally:
-        session.close()
@@ -3,7 +3,8 @@ from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from sqlalchemy import or_
 from app.models.categoria_model import Categoria
-from app.utils.contador_utils import next_codigo
+from app.utils.contador_utils import alocar_codigo
+from app.services.referencias_service import invalidar_referencias
 
 def create_categoria(db: Session, comercio_id: int, nome: str) -> Categoria:
     nome = (nome or "").strip()
@@ -11,7 +12,7 @@ def create_categoria(db: Session, comercio_id: int, nome: str) -> Categoria:
         raise ValueError("Campo 'nome' é obrigatório")
 
     try:
-        codigo_local = next_codigo(db, comercio_id, "categorias")
+        codigo_local = alocar_codigo(db, comercio_id, "categorias")
 
         categoria = Categoria(
             comercio_id=comercio_id,
@@ -21,6 +22,7 @@ def create_categoria(db: Session, comercio_id: int, nome: str) -> Categoria:
         db.add(categoria)
         db.flush()
         db.commit()
+        invalidar_referencias(comercio_id)
         db.refresh(categoria)
         return categoria
 
@@ -55,6 +57,7 @@ def delete_categoria(db, categoria_id: int, comercio_id: int) -> bool:
 
         db.delete(cat)
         db.commit()
+        invalidar_referencias(comercio_id)
         return True
 
     except IntegrityError:
@@ -101,6 +104,7 @@ def update_categoria(db, categoria_id: int, comercio_id: int, data: dict):
     try:
         db.add(cat)
         db.commit()
+        invalidar_referencias(comercio_id)
         db.refresh(cat)
         return cat
     except SQLAlchemyError:
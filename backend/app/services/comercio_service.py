@@ -1,10 +1,35 @@
-from app.models.produtos_model import Produto
+import base64
+import json
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from sqlalchemy import Integer, Numeric, DateTime, and_, case, cast, func, or_, select, tuple_
 from sqlalchemy.orm import joinedload
 
+from app.models.produtos_model import Produto
+from app.models.categoria_model import Categoria
+from app.models.fornecedores_model import Fornecedor
+from app.models.unimed_model import UnidadeMedida
+from app.models.comercios_model import Comercio
+from app.models.configs_comercio import ConfiguracaoComercio
+from app.utils.model_utils import colunas_do_modelo, linhas_para_dicts, selecionar_campos
+
+LIMITE_MAXIMO_PAGINA = 500
+
+# chave aceita em ?ordenar= -> coluna de Produto (todas NOT NULL, o que o keyset exige)
+ORDENACOES_PRODUTOS = {
+    "codigo": Produto.codigo,
+    "nome": Produto.nome,
+    "preco": Produto.preco,
+    "estoque": Produto.quantidade_estoque,
+    "criado_em": Produto.criado_em,
+}
+
+
 def get_produtos_de_comercio_por_id(db, comercio_id):
     """
     retorna lista de instância Produtos ( pertencentes a `comercio_id`)
-    - db: sessão do SQLAlchemy 
+    - db: sessão do SQLAlchemy
     - comercio_id: int
     """
     q = (
@@ -19,4 +44,193 @@ def get_produtos_de_comercio_por_id(db, comercio_id):
         .all()
     )
 
-    return q
\ No newline at end of file
+    return q
+
+
+def limite_global_estoque_expr(comercio_id):
+    """Subquery escalar com o nivel_alerta_minimo (truncado) configurado para o comércio."""
+    return (
+        select(cast(func.trunc(ConfiguracaoComercio.nivel_alerta_minimo), Integer))
+        .join(Comercio, Comercio.configuracao_id == ConfiguracaoComercio.id)
+        .where(Comercio.comercio_id == comercio_id)
+        .scalar_subquery()
+    )
+
+
+def cond_estoque_baixo(comercio_id):
+    """
+    Mesmo critério do card de estoque baixo do dashboard: usa limite_estoque do
+    produto quando existe; senão o limite global do comércio.
+    """
+    limite_global = func.coalesce(limite_global_estoque_expr(comercio_id), 0)
+    return or_(
+        and_(
+            Produto.limite_estoque != None,
+            Produto.limite_estoque > 0,
+            Produto.quantidade_estoque > 0,
+            Produto.quantidade_estoque < Produto.limite_estoque,
+        ),
+        and_(
+            Produto.limite_estoque == None,
+            Produto.quantidade_estoque > 0,
+            Produto.quantidade_estoque < limite_global,
+        ),
+    )
+
+
+def _escape_like(valor: str) -> str:
+    return valor.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _filtros_produtos(comercio_id, filtros: dict) -> list:
+    conds = [Produto.comercio_id == comercio_id]
+
+    for chave, coluna in (("categoria_id", Produto.categoria_id), ("fornecedor_id", Produto.fornecedor_id)):
+        valor = filtros.get(chave)
+        if valor is None:
+            continue
+        # -1 é o "sem categoria/fornecedor" que o front já usa no cadastro
+        conds.append(coluna == None if valor == -1 else coluna == valor)
+
+    estoque = filtros.get("estoque")
+    if estoque == "zerado":
+        conds.append(Produto.quantidade_estoque == 0)
+    elif estoque == "baixo":
+        conds.append(cond_estoque_baixo(comercio_id))
+    elif estoque is not None:
+        raise ValueError("Filtro 'estoque' inválido. Use 'baixo' ou 'zerado'.")
+
+    tag = (filtros.get("tag") or "").strip()
+    if tag:
+        conds.append(Produto.tags.ilike(f"%{_escape_like(tag)}%", escape="\\"))
+
+    prefixo = (filtros.get("nome") or "").strip()
+    if prefixo:
+        conds.append(func.lower(Produto.nome).like(f"{_escape_like(prefixo.lower())}%", escape="\\"))
+
+    return conds
+
+
+def _codificar_cursor(ordenar: str, direcao: str, valor, produto_id: int) -> str:
+    if isinstance(valor, datetime):
+        valor = valor.isoformat()
+    elif isinstance(valor, Decimal):
+        valor = str(valor)
+    payload = json.dumps({"o": ordenar, "d": direcao, "v": valor, "id": produto_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def _decodificar_cursor(cursor: str, ordenar: str, direcao: str):
+    try:
+        bruto = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(bruto)
+        if payload["o"] != ordenar or payload["d"] != direcao:
+            raise ValueError
+        valor, produto_id = payload["v"], payload["id"]
+        if type(produto_id) is not int:
+            raise ValueError
+        # o valor vai direto para a comparação no SQL: tipo errado viraria erro do banco (500)
+        tipo = ORDENACOES_PRODUTOS[ordenar].type
+        if isinstance(tipo, DateTime):
+            if not isinstance(valor, str):
+                raise ValueError
+            valor = datetime.fromisoformat(valor)
+        elif isinstance(tipo, Numeric):
+            if not isinstance(valor, str):
+                raise ValueError
+            valor = Decimal(valor)
+            if not valor.is_finite():
+                raise ValueError
+        elif isinstance(tipo, Integer):
+            if type(valor) is not int:
+                raise ValueError
+        elif not isinstance(valor, str):
+            raise ValueError
+        return valor, produto_id
+    except (ValueError, TypeError, KeyError, InvalidOperation, json.JSONDecodeError):
+        raise ValueError("Cursor inválido para esta ordenação")
+
+
+def _colunas_produto() -> dict:
+    """Campos que a listagem de produtos expõe: colunas de Produto + nomes relacionados."""
+    colunas = colunas_do_modelo(Produto)
+    colunas["categoriaNome"] = Categoria.nome
+    colunas["fornecedorNome"] = Fornecedor.nome
+    colunas["unidadeMedidaNome"] = case(
+        (and_(UnidadeMedida.nome != "", UnidadeMedida.sigla != ""),
+         UnidadeMedida.nome + " (" + UnidadeMedida.sigla + ")"),
+        else_=None,
+    )
+    colunas["unidadeMedidaSigla"] = UnidadeMedida.sigla
+    return colunas
+
+
+def listar_produtos_paginado(db, comercio_id: int, filtros: dict | None = None,
+                             ordenar: str = "codigo", direcao: str = "asc",
+                             cursor: str | None = None, limite: int | None = None,
+                             contar_total: bool = True, campos: list | None = None) -> dict:
+    """
+    Lista produtos do comércio com paginação keyset em (coluna de ordenação, produto_id).
+    - filtros: categoria_id, fornecedor_id, estoque ('baixo'|'zerado'), tag, nome (prefixo)
+    - limite None mantém o comportamento antigo (tudo de uma vez)
+    - campos: projeção (?fields=); só as colunas pedidas vão para o SELECT e só os
+      joins necessários são feitos
+    Retorna {"items": [dict], "next_cursor": str|None, "total": int|None}
+    Lança ValueError para ordenação/cursor/filtro inválidos.
+    """
+    if ordenar not in ORDENACOES_PRODUTOS:
+        raise ValueError(f"Ordenação inválida. Use uma de: {', '.join(ORDENACOES_PRODUTOS)}")
+    if direcao not in ("asc", "desc"):
+        raise ValueError("Direção inválida. Use 'asc' ou 'desc'.")
+    if limite is not None:
+        limite = max(1, min(int(limite), LIMITE_MAXIMO_PAGINA))
+
+    conds = _filtros_produtos(comercio_id, filtros or {})
+    coluna = ORDENACOES_PRODUTOS[ordenar]
+
+    total = None
+    if contar_total:
+        total = db.execute(select(func.count()).select_from(Produto).where(*conds)).scalar_one()
+
+    # as chaves do cursor entram no SELECT mesmo se não foram pedidas, e saem do item depois
+    chaves_cursor = (coluna.key, "produto_id")
+    selecionadas = selecionar_campos(_colunas_produto(), campos, obrigatorios=chaves_cursor)
+    omitir = () if campos is None else tuple(k for k in chaves_cursor if k not in campos)
+    nomes = {c.name for c in selecionadas}
+
+    stmt = select(*selecionadas).select_from(Produto)
+    if "categoriaNome" in nomes:
+        stmt = stmt.outerjoin(Categoria, Categoria.categoria_id == Produto.categoria_id)
+    if "fornecedorNome" in nomes:
+        stmt = stmt.outerjoin(Fornecedor, Fornecedor.fornecedor_id == Produto.fornecedor_id)
+    if nomes & {"unidadeMedidaNome", "unidadeMedidaSigla"}:
+        stmt = stmt.outerjoin(UnidadeMedida, UnidadeMedida.unimed_id == Produto.unimed_id)
+    stmt = stmt.where(*conds)
+
+    if cursor:
+        valor, ultimo_id = _decodificar_cursor(cursor, ordenar, direcao)
+        chave = tuple_(coluna, Produto.produto_id)
+        stmt = stmt.where(chave > tuple_(valor, ultimo_id) if direcao == "asc" else chave < tuple_(valor, ultimo_id))
+
+    if direcao == "asc":
+        stmt = stmt.order_by(coluna.asc(), Produto.produto_id.asc())
+    else:
+        stmt = stmt.order_by(coluna.desc(), Produto.produto_id.desc())
+
+    if limite is not None:
+        # um a mais para saber se existe próxima página sem outra query
+        stmt = stmt.limit(limite + 1)
+
+    linhas = db.execute(stmt).all()
+
+    next_cursor = None
+    if limite is not None and len(linhas) > limite:
+        linhas = linhas[:limite]
+        ultimo = linhas[-1]._mapping
+        next_cursor = _codificar_cursor(ordenar, direcao, ultimo[coluna.key], ultimo["produto_id"])
+
+    return {
+        "items": linhas_para_dicts(linhas, omitir),
+        "next_cursor": next_cursor,
+        "total": total,
+    }
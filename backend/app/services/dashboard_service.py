@@ -0,0 +1,201 @@
+# app/services/dashboard_service.py
+"""
+Leitura e reconciliação de resumos_comercio (cards do dashboard).
+
+Os contadores são mantidos por triggers (migração 9b3e7f2a4c61); aqui fica a leitura
+de uma linha só e a reconciliação que recalcula do zero e corrige divergências.
+Também mantém e lê movimentacoes_mensais (gráfico mensal).
+"""
+from datetime import datetime
+from decimal import Decimal
+from typing import Iterable, Optional
+
+from sqlalchemy import DateTime, Integer, SmallInteger, cast, extract, func, literal, select, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.models.comercios_model import Comercio
+from app.models.configs_comercio import ConfiguracaoComercio
+from app.models.movimentacao_model import Movimentacao
+from app.models.movimentacoes_mensais import MovimentacaoMensal
+from app.models.produtos_model import Produto
+from app.models.resumos_comercio import ResumoComercio
+
+
+def _resumo_calculado(comercio_id: int):
+    """SELECT (comercio_id, zero_count, low_count, limite_global, faturamento_total) calculado do zero."""
+    limite = (
+        select(cast(func.trunc(ConfiguracaoComercio.nivel_alerta_minimo), Integer))
+        .join(Comercio, Comercio.configuracao_id == ConfiguracaoComercio.id)
+        .where(Comercio.comercio_id == comercio_id)
+        .scalar_subquery()
+    )
+    produtos = (
+        select(
+            func.count().filter(Produto.quantidade_estoque == 0).label("zero_count"),
+            func.count().filter(
+                func.fn_produto_estoque_baixo(Produto.quantidade_estoque, Produto.limite_estoque, limite)
+            ).label("low_count"),
+        )
+        .where(Produto.comercio_id == comercio_id)
+        .subquery()
+    )
+    faturamento = (
+        select(func.coalesce(func.sum(Movimentacao.valor_total), 0))
+        .where(
+            Movimentacao.comercio_id == comercio_id,
+            func.lower(Movimentacao.tipo) == "saida",
+            func.lower(Movimentacao.estado) == "fechada",
+        )
+        .scalar_subquery()
+    )
+    return select(
+        Comercio.comercio_id,
+        produtos.c.zero_count,
+        produtos.c.low_count,
+        limite.label("limite_global"),
+        faturamento.label("faturamento_total"),
+    ).where(Comercio.comercio_id == comercio_id)
+
+
+def reconciliar_resumo(db: Session, comercio_id: int) -> Optional[dict]:
+    """
+    Recalcula o resumo do comércio e grava se divergir, SEM commit.
+    Trava a linha antes de calcular: triggers concorrentes esperam, e o cálculo (nova
+    snapshot no READ COMMITTED) já enxerga tudo que foi commitado antes deles.
+    Retorna {"comercio_id", "antes", "depois"} quando corrigiu; None se estava certo.
+    """
+    antes = db.execute(
+        select(ResumoComercio.zero_count, ResumoComercio.low_count,
+               ResumoComercio.limite_global, ResumoComercio.faturamento_total)
+        .where(ResumoComercio.comercio_id == comercio_id)
+        .with_for_update()
+    ).first()
+
+    tbl = ResumoComercio.__table__
+    ins = pg_insert(tbl).from_select(
+        ["comercio_id", "zero_count", "low_count", "limite_global", "faturamento_total"],
+        _resumo_calculado(comercio_id),
+    )
+    colunas = ("zero_count", "low_count", "limite_global", "faturamento_total")
+    depois = db.execute(
+        ins.on_conflict_do_update(
+            index_elements=[tbl.c.comercio_id],
+            set_={**{c: ins.excluded[c] for c in colunas}, "atualizado_em": func.now()},
+            # só escreve quando algo mudou
+            where=tuple_(*(tbl.c[c] for c in colunas)).is_distinct_from(
+                tuple_(*(ins.excluded[c] for c in colunas))),
+        ).returning(*(tbl.c[c] for c in colunas))
+    ).first()
+
+    if depois is None:
+        return None
+    return {
+        "comercio_id": comercio_id,
+        "antes": dict(antes._mapping) if antes is not None else None,
+        "depois": dict(depois._mapping),
+    }
+
+
+def reconciliar_resumos(db: Session, comercio_ids: Optional[Iterable[int]] = None) -> list[dict]:
+    """
+    Reconcilia os comércios informados (None = todos), com commit por comércio para não
+    segurar as travas de todos ao mesmo tempo. Retorna as correções feitas.
+    """
+    if comercio_ids is None:
+        comercio_ids = db.execute(select(Comercio.comercio_id).order_by(Comercio.comercio_id)).scalars().all()
+
+    correcoes = []
+    for comercio_id in comercio_ids:
+        try:
+            correcao = reconciliar_resumo(db, comercio_id)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        if correcao is not None:
+            correcoes.append(correcao)
+    return correcoes
+
+
+def ler_resumo(db: Session, comercio_id: int) -> Optional[dict]:
+    """Linha de resumos_comercio como dict (cria na hora, via reconciliação, se faltar)."""
+    stmt = select(
+        ResumoComercio.zero_count,
+        ResumoComercio.low_count,
+        ResumoComercio.limite_global,
+        ResumoComercio.faturamento_total,
+    ).where(ResumoComercio.comercio_id == comercio_id)
+
+    row = db.execute(stmt).first()
+    if row is None:
+        reconciliar_resumo(db, comercio_id)
+        db.commit()
+        row = db.execute(stmt).first()
+        if row is None:
+            return None
+    return {
+        "zero_count": int(row.zero_count),
+        "low_count": int(row.low_count),
+        "limite_global": row.limite_global,
+        "faturamento_total": Decimal(row.faturamento_total),
+    }
+
+
+# ---------- movimentacoes_mensais ----------
+def acumular_movimentacao_mensal(db: Session, comercio_id: int, tipo: str, fechado_em: datetime,
+                                 total_itens: int, valor_total, sinal: int = 1) -> None:
+    """
+    Soma (sinal=1, ao fechar) ou subtrai (sinal=-1, ao excluir fechada) uma movimentação
+    no mês de fechado_em, SEM commit. Ano/mês saem do banco (extract no fuso da sessão),
+    como a consulta antiga fazia sobre movimentacoes.
+    """
+    momento = literal(fechado_em, DateTime(timezone=True))
+    tbl = MovimentacaoMensal.__table__
+    ins = pg_insert(tbl).from_select(
+        ["comercio_id", "tipo", "ano", "mes", "mov_count", "total_itens", "valor_total"],
+        select(
+            literal(comercio_id),
+            literal((tipo or "").lower()),
+            cast(extract("year", momento), SmallInteger),
+            cast(extract("month", momento), SmallInteger),
+            literal(sinal),
+            literal(sinal * int(total_itens or 0)),
+            literal(sinal * Decimal(valor_total or 0)),
+        ),
+    )
+    db.execute(ins.on_conflict_do_update(
+        index_elements=[tbl.c.comercio_id, tbl.c.tipo, tbl.c.ano, tbl.c.mes],
+        set_={
+            "mov_count": tbl.c.mov_count + ins.excluded.mov_count,
+            "total_itens": tbl.c.total_itens + ins.excluded.total_itens,
+            "valor_total": tbl.c.valor_total + ins.excluded.valor_total,
+        },
+    ))
+
+
+def movimentacoes_por_mes(db: Session, comercio_id: int, ano: Optional[int] = None,
+                          tipo: Optional[str] = None) -> dict[int, dict]:
+    """{mes: {"mov_count", "total_itens", "valor_total"}}; ano None soma todos os anos."""
+    stmt = (
+        select(
+            MovimentacaoMensal.mes,
+            func.sum(MovimentacaoMensal.mov_count).label("mov_count"),
+            func.sum(MovimentacaoMensal.total_itens).label("total_itens"),
+            func.sum(MovimentacaoMensal.valor_total).label("valor_total"),
+        )
+        .where(MovimentacaoMensal.comercio_id == comercio_id)
+        .group_by(MovimentacaoMensal.mes)
+    )
+    if ano:
+        stmt = stmt.where(MovimentacaoMensal.ano == ano)
+    if tipo:
+        stmt = stmt.where(MovimentacaoMensal.tipo == tipo)
+    return {
+        int(r.mes): {
+            "mov_count": int(r.mov_count or 0),
+            "total_itens": int(r.total_itens or 0),
+            "valor_total": Decimal(r.valor_total or 0),
+        }
+        for r in db.execute(stmt)
+    }
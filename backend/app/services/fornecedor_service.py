@@ -1,10 +1,16 @@
 # app/services/fornecedor_service.py
 from sqlalchemy.orm import Session, joinedload
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
-from sqlalchemy import or_
+from sqlalchemy import or_, select
 from app.models.fornecedores_model import Fornecedor
 from app.models.enderecos_model import Endereco
-from app.utils.contador_utils import next_codigo
+from app.utils.contador_utils import alocar_codigo
+from app.services.referencias_service import invalidar_referencias
+from app.services.versoes_service import tocar_colecao
+from app.utils.model_utils import linhas_para_dicts, selecionar_campos
+
+CAMPOS_LISTAGEM_FORNECEDOR = ("fornecedor_id", "nome", "cnpj", "telefone", "email", "comercio_id", "criado_em", "codigo")
+CAMPOS_LISTAGEM_ENDERECO = ("endereco_id", "cep", "numero", "logradouro", "complemento", "bairro", "cidade", "estado", "pais")
 
 def create_fornecedor(db: Session,
                       comercio_id: int,
@@ -41,7 +47,7 @@ def create_fornecedor(db: Session,
             db.flush()  # endereco_obj.endereco_id disponível
 
         # pega código atômico para fornecedores
-        codigo_local = next_codigo(db, comercio_id, "fornecedores")
+        codigo_local = alocar_codigo(db, comercio_id, "fornecedores")
 
         fornecedor = Fornecedor(
             comercio_id=comercio_id,
@@ -55,6 +61,7 @@ def create_fornecedor(db: Session,
         db.add(fornecedor)
         db.flush()
         db.commit()
+        invalidar_referencias(comercio_id)
         db.refresh(fornecedor)
         if endereco_obj is not None:
             db.refresh(endereco_obj)
@@ -89,6 +96,7 @@ def delete_fornecedor(db, fornecedor_id: int, comercio_id: int) -> bool:
 
         db.delete(f)
         db.commit()
+        invalidar_referencias(comercio_id)
         return True
 
     except IntegrityError:
@@ -110,6 +118,35 @@ def get_fornecedor_por_id(db, fornecedor_id: int, comercio_id: int):
     return q.one_or_none()
 
 
+def listar_fornecedores(db, comercio_id: int, campos: list | None = None) -> list[dict]:
+    """
+    Lista fornecedores do comércio como dicts, direto de um SELECT das colunas necessárias
+    (sem carregar entidades). 'endereco' vem aninhado e só faz o LEFT JOIN se for pedido.
+    - campos: projeção (?fields=); None = todos
+    """
+    disponiveis = {n: Fornecedor.__table__.c[n] for n in CAMPOS_LISTAGEM_FORNECEDOR}
+    # fornecedor_id sempre vai no SELECT (?fields= só com nomes desconhecidos deixaria o select vazio)
+    colunas = selecionar_campos(disponiveis, campos, obrigatorios=("fornecedor_id",))
+    omitir = () if campos is None or "fornecedor_id" in campos else ("fornecedor_id",)
+    com_endereco = campos is None or "endereco" in campos
+    if com_endereco:
+        colunas += [Endereco.__table__.c[n].label(f"endereco.{n}") for n in CAMPOS_LISTAGEM_ENDERECO]
+
+    stmt = select(*colunas).select_from(Fornecedor)
+    if com_endereco:
+        stmt = stmt.outerjoin(Endereco, Endereco.endereco_id == Fornecedor.endereco_id)
+    stmt = stmt.where(Fornecedor.comercio_id == comercio_id).order_by(Fornecedor.fornecedor_id.asc())
+
+    items = []
+    for linha in linhas_para_dicts(db.execute(stmt), omitir=omitir):
+        item = {k: v for k, v in linha.items() if not k.startswith("endereco.")}
+        if com_endereco:
+            endereco = {n: linha[f"endereco.{n}"] for n in CAMPOS_LISTAGEM_ENDERECO}
+            item["endereco"] = endereco if endereco["endereco_id"] is not None else None
+        items.append(item)
+    return items
+
+
 def _upsert_endereco(db, fornecedor, endereco_payload: dict):
     """
     Se fornecedor.endereco existir -> atualiza os campos passados.
@@ -189,9 +226,12 @@ def update_fornecedor(db, fornecedor_id: int, comercio_id: int, data: dict):
         # tratar endereco (criar/atualizar)
         if endereco_payload:
             _upsert_endereco(db, f, endereco_payload)
+            # endereços não têm trigger de versão; a listagem de fornecedores mostra o endereço
+            tocar_colecao(db, comercio_id, "fornecedores")
 
         db.add(f)
         db.commit()
+        invalidar_referencias(comercio_id)
         db.refresh(f)
         return f
     except SQLAlchemyError:
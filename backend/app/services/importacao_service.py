@@ -0,0 +1,235 @@
+# app/services/importacao_service.py
+"""
+Importação em massa de produtos (CSV ou NDJSON).
+
+O arquivo é lido em streaming e processado em lotes: cada lote resolve categorias,
+fornecedores e unidades com poucas queries (IN + INSERT de várias linhas para os que
+faltam), pega os códigos de uma vez e insere os produtos num INSERT de várias linhas.
+Tudo roda numa transação só; cada lote fica num savepoint, então um erro de banco
+num lote não derruba os anteriores.
+"""
+import csv
+import io
+import json
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from typing import Iterable, Iterator
+
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models.produtos_model import Produto
+from app.models.comercios_model import Comercio
+from app.models.configs_comercio import ConfiguracaoComercio
+from app.utils.contador_utils import alocar_codigos
+from app.services.resolvedor_service import resolver_categorias, resolver_fornecedores, resolver_unidades
+
+TAMANHO_LOTE = 1000
+LIMITE_ERROS_RELATORIO = 1000
+PRECO_MAXIMO = Decimal("100000000")  # Numeric(10,2)
+
+# nomes aceitos no cabeçalho/chaves -> campo interno
+ALIASES = {
+    "nome": "nome",
+    "preco": "preco",
+    "quantidade_estoque": "quantidade_estoque",
+    "quantidade": "quantidade_estoque",
+    "estoque": "quantidade_estoque",
+    "limite_estoque": "limite_estoque",
+    "limiteestoque": "limite_estoque",
+    "tags": "tags",
+    "categoria": "categoria",
+    "fornecedor": "fornecedor",
+    "unidade": "unidade",
+    "unimed": "unidade",
+    "unimed_id": "unidade",
+    "sigla": "unidade",
+}
+
+
+# ---------- leitura em streaming ----------
+def ler_csv(stream) -> Iterator[tuple[int, dict]]:
+    """Gera (número da linha, dict) a partir de um stream binário CSV (',' ou ';')."""
+    texto = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    cabecalho = texto.readline()
+    if not cabecalho.strip():
+        return
+    delimitador = ";" if cabecalho.count(";") > cabecalho.count(",") else ","
+    campos = next(csv.reader([cabecalho], delimiter=delimitador))
+    leitor = csv.DictReader(texto, fieldnames=campos, delimiter=delimitador)
+    for numero, linha in enumerate(leitor, start=2):
+        yield numero, linha
+
+
+def ler_ndjson(stream) -> Iterator[tuple[int, object]]:
+    """Gera (número da linha, dict) de um stream NDJSON; linha inválida vira ValueError."""
+    for numero, bruta in enumerate(io.TextIOWrapper(stream, encoding="utf-8-sig"), start=1):
+        if not bruta.strip():
+            continue
+        try:
+            yield numero, json.loads(bruta)
+        except json.JSONDecodeError as e:
+            yield numero, ValueError(f"JSON inválido: {e.msg}")
+
+
+# ---------- validação de linha ----------
+def _texto(valor, campo: str, maximo: int) -> str | None:
+    if valor is None:
+        return None
+    valor = str(valor).strip()
+    if not valor:
+        return None
+    if len(valor) > maximo:
+        raise ValueError(f"'{campo}' excede {maximo} caracteres")
+    return valor
+
+
+def _inteiro(valor, campo: str, padrao):
+    if valor is None or str(valor).strip() == "":
+        return padrao
+    try:
+        n = int(str(valor).strip())
+    except ValueError:
+        raise ValueError(f"'{campo}' deve ser inteiro")
+    if n < 0:
+        raise ValueError(f"'{campo}' não pode ser negativo")
+    return n
+
+
+def _validar_linha(bruto) -> dict:
+    if isinstance(bruto, Exception):
+        raise bruto
+    if not isinstance(bruto, dict):
+        raise ValueError("linha deve ser um objeto")
+
+    dados = {}
+    for chave, valor in bruto.items():
+        campo = ALIASES.get(str(chave or "").strip().lower())
+        if campo:
+            dados[campo] = valor
+
+    nome = _texto(dados.get("nome"), "nome", 150)
+    if not nome:
+        raise ValueError("'nome' é obrigatório")
+
+    preco_bruto = dados.get("preco")
+    try:
+        preco = Decimal(str(preco_bruto).strip().replace(",", ".")).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+    except (InvalidOperation, TypeError, ValueError):
+        raise ValueError("'preco' inválido")
+    if preco < 0 or preco >= PRECO_MAXIMO:
+        raise ValueError("'preco' fora do intervalo permitido")
+
+    unidade = dados.get("unidade")
+    unidade = str(unidade).strip() if unidade is not None and str(unidade).strip() else None
+
+    return {
+        "nome": nome,
+        "preco": preco,
+        "quantidade_estoque": _inteiro(dados.get("quantidade_estoque"), "quantidade_estoque", 0),
+        "limite_estoque": _inteiro(dados.get("limite_estoque"), "limite_estoque", None),
+        "tags": _texto(dados.get("tags"), "tags", 100),
+        "categoria": _texto(dados.get("categoria"), "categoria", 100),
+        "fornecedor": _texto(dados.get("fornecedor"), "fornecedor", 150),
+        "unidade": unidade,
+    }
+
+
+# ---------- importação ----------
+def _unidade_padrao(db: Session, comercio_id: int) -> int | None:
+    return db.execute(
+        select(ConfiguracaoComercio.unimed_id)
+        .join(Comercio, Comercio.configuracao_id == ConfiguracaoComercio.id)
+        .where(Comercio.comercio_id == comercio_id)
+    ).scalar()
+
+
+def _registrar_erro(resumo: dict, numero: int, mensagem: str) -> None:
+    resumo["total_erros"] += 1
+    if len(resumo["erros"]) < LIMITE_ERROS_RELATORIO:
+        resumo["erros"].append({"linha": numero, "erro": mensagem})
+
+
+def _gravar_lote(db: Session, comercio_id: int, lote: list[tuple[int, dict]],
+                 unidade_padrao: int | None, resumo: dict) -> None:
+    sem_unidade = []
+    try:
+        with db.begin_nested():
+            categorias = resolver_categorias(db, comercio_id, {d["categoria"] for _, d in lote if d["categoria"]})
+            fornecedores = resolver_fornecedores(db, comercio_id, {d["fornecedor"] for _, d in lote if d["fornecedor"]})
+            unidades = resolver_unidades(db, comercio_id, {d["unidade"] for _, d in lote if d["unidade"]})
+
+            validas = []
+            for numero, d in lote:
+                unimed_id = unidades.get(d["unidade"]) if d["unidade"] else unidade_padrao
+                if unimed_id is None:
+                    sem_unidade.append((numero, f"unidade '{d['unidade'] or ''}' não encontrada"))
+                    continue
+                validas.append({
+                    "nome": d["nome"],
+                    "preco": d["preco"],
+                    "quantidade_estoque": d["quantidade_estoque"],
+                    "limite_estoque": d["limite_estoque"],
+                    "tags": d["tags"],
+                    "comercio_id": comercio_id,
+                    "unimed_id": unimed_id,
+                    "categoria_id": categorias.get(d["categoria"].lower()) if d["categoria"] else None,
+                    "fornecedor_id": fornecedores.get(d["fornecedor"].lower()) if d["fornecedor"] else None,
+                })
+
+            if validas:
+                for linha, codigo in zip(validas, alocar_codigos(db, comercio_id, "produtos", len(validas))):
+                    linha["codigo"] = codigo
+                # executemany: o SQLAlchemy agrupa em INSERTs de várias linhas (insertmanyvalues)
+                db.execute(insert(Produto.__table__), validas)
+    except IntegrityError as e:
+        motivo = "lote rejeitado pelo banco: " + str(getattr(e, "orig", e)).splitlines()[0]
+        for numero, _ in lote:
+            _registrar_erro(resumo, numero, motivo)
+        return
+
+    resumo["inseridas"] += len(validas)
+    for numero, mensagem in sem_unidade:
+        _registrar_erro(resumo, numero, mensagem)
+
+def importar_produtos(db: Session, comercio_id: int, linhas: Iterable[tuple[int, object]],
+                      tudo_ou_nada: bool = False, tamanho_lote: int = TAMANHO_LOTE) -> Iterator[dict]:
+    """
+    Importa produtos e gera eventos de progresso (um por lote gravado) e um final com "fim": True.
+    Faz commit no fim (ou rollback, se tudo_ou_nada e houve erro) — a sessão é do chamador.
+    Linhas inválidas são puladas e relatadas em "erros" ({"linha", "erro"}, até LIMITE_ERROS_RELATORIO).
+    """
+    resumo = {"processadas": 0, "inseridas": 0, "total_erros": 0, "erros": []}
+    unidade_padrao = _unidade_padrao(db, comercio_id)
+    lote: list[tuple[int, dict]] = []
+
+    def progresso():
+        return {"processadas": resumo["processadas"], "inseridas": resumo["inseridas"],
+                "total_erros": resumo["total_erros"]}
+
+    for numero, bruto in linhas:
+        resumo["processadas"] += 1
+        try:
+            lote.append((numero, _validar_linha(bruto)))
+        except ValueError as ve:
+            _registrar_erro(resumo, numero, str(ve))
+
+        if len(lote) >= tamanho_lote:
+            # em tudo_ou_nada, depois do primeiro erro só continua validando (para o relatório)
+            if not (tudo_ou_nada and resumo["total_erros"]):
+                _gravar_lote(db, comercio_id, lote, unidade_padrao, resumo)
+            lote = []
+            yield progresso()
+
+    if lote and not (tudo_ou_nada and resumo["total_erros"]):
+        _gravar_lote(db, comercio_id, lote, unidade_padrao, resumo)
+
+    if tudo_ou_nada and resumo["total_erros"]:
+        db.rollback()
+        resumo["inseridas"] = 0
+        resumo["status"] = "cancelada"
+    else:
+        db.commit()
+        resumo["status"] = "concluida"
+
+    yield {"fim": True, **resumo}
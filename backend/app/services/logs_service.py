@@ -0,0 +1,135 @@
+# app/services/logs_service.py
+"""
+Manutenção da tabela de auditoria `logs` (particionada por mês, migração f3b9d2a7c814).
+
+- garantir_particoes: cria as partições mensais que faltam (do mês atual até N à frente)
+- aplicar_retencao: DROP das partições mais antigas que a retenção
+- descarregar_pendentes: move logs_pendentes (staging unlogged, usada quando
+  app.logs_assincronos = 'on') para logs em lotes
+Tudo roda pelas funções SQL; aqui só chamamos e fazemos commit.
+
+Leitura: listar_logs pagina o histórico de um comércio por keyset em
+(alterado_em, log_id), usando logs.comercio_id (preenchido pelo trigger).
+"""
+import base64
+import json
+import os
+from datetime import date, datetime
+from typing import Optional
+
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.orm import Session
+
+from app.models.logs_model import Log
+
+LOGS_RETENCAO_MESES = int(os.getenv("LOGS_RETENCAO_MESES", "12"))
+LOGS_MESES_A_FRENTE = int(os.getenv("LOGS_MESES_A_FRENTE", "2"))
+LOGS_LOTE_DESCARGA = int(os.getenv("LOGS_LOTE_DESCARGA", "5000"))
+
+# tabelas auditadas cujos registros pertencem a um comércio
+TABELAS_DO_COMERCIO = ("comercios", "produtos", "fornecedores", "convites")
+LOGS_LIMITE_PADRAO = 50
+LOGS_LIMITE_MAXIMO = 200
+
+
+def garantir_particoes(db: Session, meses_a_frente: int = LOGS_MESES_A_FRENTE) -> int:
+    """Cria partições do mês atual até `meses_a_frente`; retorna quantas criou."""
+    criadas = db.execute(select(func.fn_logs_garantir_particoes(date.today(), meses_a_frente))).scalar()
+    db.commit()
+    return int(criadas or 0)
+
+
+def aplicar_retencao(db: Session, meses: int = LOGS_RETENCAO_MESES) -> int:
+    """Remove (DROP) partições inteiramente anteriores a `meses` meses atrás; retorna quantas."""
+    if meses <= 0:
+        raise ValueError("Retenção deve ser de pelo menos 1 mês")
+    removidas = db.execute(select(func.fn_logs_aplicar_retencao(meses))).scalar()
+    db.commit()
+    return int(removidas or 0)
+
+
+def descarregar_pendentes(db: Session, lote: int = LOGS_LOTE_DESCARGA) -> int:
+    """Move até `lote` linhas da staging para logs (uma transação); retorna quantas moveu."""
+    movidas = db.execute(select(func.fn_logs_descarregar(lote))).scalar()
+    db.commit()
+    return int(movidas or 0)
+
+
+# ---------- leitura ----------
+def _codificar_cursor(alterado_em: datetime, log_id: int) -> str:
+    payload = json.dumps({"t": alterado_em.isoformat(), "id": log_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def _decodificar_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        bruto = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(bruto)
+        return datetime.fromisoformat(payload["t"]), int(payload["id"])
+    except (ValueError, TypeError, KeyError, json.JSONDecodeError):
+        raise ValueError("Cursor inválido")
+
+
+def listar_logs(db: Session, comercio_id: int, tabela: Optional[str] = None,
+                record_id: Optional[str] = None, desde: Optional[datetime] = None,
+                ate: Optional[datetime] = None, cursor: Optional[str] = None,
+                limite: Optional[int] = None) -> dict:
+    """
+    Histórico de alterações do comércio, mais recente primeiro.
+    Retorna {"items": [...], "next_cursor": <str|None>}.
+    - tabela/record_id: histórico de um registro (record_id exige tabela);
+      usa ix_logs_registro, o resto usa ix_logs_comercio_alterado_em
+    - desde (inclusive) / ate (exclusive) em alterado_em: o planner também
+      descarta as partições mensais fora do intervalo
+    Lança ValueError para parâmetros inválidos.
+    """
+    if tabela is not None and tabela not in TABELAS_DO_COMERCIO:
+        raise ValueError(f"Tabela inválida. Use uma de: {', '.join(TABELAS_DO_COMERCIO)}")
+    if record_id is not None and tabela is None:
+        raise ValueError("Parâmetro 'record_id' exige 'tabela'")
+    if desde is not None and ate is not None and desde >= ate:
+        raise ValueError("'desde' deve ser anterior a 'ate'")
+
+    limite = LOGS_LIMITE_PADRAO if limite is None else limite
+    if limite < 1 or limite > LOGS_LIMITE_MAXIMO:
+        raise ValueError(f"Parâmetro 'limit' deve estar entre 1 e {LOGS_LIMITE_MAXIMO}")
+
+    stmt = select(
+        Log.log_id,
+        Log.tabela_nome,
+        Log.record_id,
+        Log.operacao,
+        Log.alterado_por,
+        Log.alterado_em,
+        Log.antigo_dado,
+        Log.novo_dado,
+    ).where(Log.comercio_id == comercio_id)
+
+    if tabela is not None:
+        stmt = stmt.where(Log.tabela_nome == tabela)
+    if record_id is not None:
+        stmt = stmt.where(Log.record_id == str(record_id))
+    if desde is not None:
+        stmt = stmt.where(Log.alterado_em >= desde)
+    if ate is not None:
+        stmt = stmt.where(Log.alterado_em < ate)
+    if cursor:
+        alterado_em, log_id = _decodificar_cursor(cursor)
+        stmt = stmt.where(tuple_(Log.alterado_em, Log.log_id) < tuple_(alterado_em, log_id))
+
+    # um a mais para saber se existe próxima página sem outra query
+    linhas = db.execute(
+        stmt.order_by(Log.alterado_em.desc(), Log.log_id.desc()).limit(limite + 1)
+    ).all()
+
+    next_cursor = None
+    if len(linhas) > limite:
+        linhas = linhas[:limite]
+        next_cursor = _codificar_cursor(linhas[-1].alterado_em, linhas[-1].log_id)
+
+    items = []
+    for r in linhas:
+        item = dict(r._mapping)
+        item["alterado_em"] = r.alterado_em.isoformat()
+        items.append(item)
+    return {"items": items, "next_cursor": next_cursor}
@@ -2,9 +2,10 @@ from decimal import Decimal
 from typing import Literal, Optional
 from datetime import datetime, timezone
 
-from sqlalchemy import case, func
+from sqlalchemy import case, func, literal, select, true, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import Session, load_only, noload
+from sqlalchemy.orm import Session, noload
 
 from app.models.carrinho_model import Carrinho
 from app.models.movimentacao_model import Movimentacao
@@ -13,8 +14,9 @@ from app.models.produtos_model import Produto
 
 from app.utils.link_utils import criar_link
 from app.utils.contador_utils import next_codigo
-from app.utils.model_utils import model_to_dict
+from app.utils.model_utils import colunas_do_modelo, linhas_para_dicts, model_to_dict, selecionar_campos
 from app.models.unimed_model import UnidadeMedida
+from app.services.dashboard_service import acumular_movimentacao_mensal
 
 
 def criar_carrinho_vazio(db: Session, comercio_id: int) -> Carrinho:
@@ -24,43 +26,65 @@ def criar_carrinho_vazio(db: Session, comercio_id: int) -> Carrinho:
     return car
 
 
+def listar_movimentacoes(db: Session, comercio_id: int, campos: Optional[list] = None) -> list[dict]:
+    """
+    Lista as movimentações do comércio como dicts, com SELECT só das colunas pedidas.
+    tipo/estado já vêm formatados para exibição ("Entrada", "Saída", "Aberta"...).
+    """
+    # mov_id sempre vai no SELECT (?fields= só com nomes desconhecidos deixaria o select vazio)
+    stmt = (
+        select(*selecionar_campos(colunas_do_modelo(Movimentacao), campos, obrigatorios=("mov_id",)))
+        .where(Movimentacao.comercio_id == comercio_id)
+        .order_by(Movimentacao.mov_id.asc())
+    )
+    omitir = () if campos is None or "mov_id" in campos else ("mov_id",)
+    itens = linhas_para_dicts(db.execute(stmt), omitir=omitir)
+    for item in itens:
+        if item.get("tipo"):
+            item["tipo"] = item["tipo"].capitalize().replace('i', 'í')
+        if item.get("estado"):
+            item["estado"] = item["estado"].capitalize()
+    return itens
+
+
 def criar_movimentacao_vazia(db: Session,
                              tipo: Literal["entrada", "saida"],
                              comercio_id: int,
                              tentativas: Optional[int] = None,
                              link_param: Optional[str] = None) -> Movimentacao:
-    MAX_TRIES = tentativas or 6
+    """
+    Cria carrinho + movimentação aberta, SEM commit.
+    O código vem do contador do comércio (scope mov_entrada/mov_saida), atômico,
+    então não há colisão no uq_movimentacoes_comercio_tipo_codigo. Só o link aleatório
+    pode colidir: cada tentativa roda num savepoint e só ela é desfeita.
+    """
+    if tipo not in ("entrada", "saida"):
+        raise ValueError("Tipo de movimentação inválido.")
+
+    MAX_TRIES = 1 if link_param else (tentativas or 6)
+    carrinho = criar_carrinho_vazio(db, comercio_id)
+    codigo = next_codigo(db, comercio_id, f"mov_{tipo}")
+
     for attempt in range(1, MAX_TRIES + 1):
+        link = link_param or criar_link()
         try:
-            carrinho = criar_carrinho_vazio(db, comercio_id)
-            link = link_param or criar_link()
-            
-            ultimo_codigo = db.query(func.max(Movimentacao.codigo)).filter(
-                Movimentacao.comercio_id == comercio_id
-            ).scalar() or 0
-            
-            codigo = ultimo_codigo + 1
-            
-            mov = Movimentacao(
-                codigo=codigo,
-                tipo=tipo,
-                carrinho_id=carrinho.carrinho_id,
-                comercio_id=comercio_id,
-                valor_total=0,
-                total_itens=0,
-                forma_pagamento="",
-                link=link,
-                estado="aberta"
-            )
-            db.add(mov)
-            db.flush()
+            with db.begin_nested():
+                mov = Movimentacao(
+                    codigo=codigo,
+                    tipo=tipo,
+                    carrinho_id=carrinho.carrinho_id,
+                    comercio_id=comercio_id,
+                    valor_total=0,
+                    total_itens=0,
+                    forma_pagamento="",
+                    link=link,
+                    estado="aberta"
+                )
+                db.add(mov)
+                db.flush()
             db.refresh(mov)
             return mov
         except IntegrityError as e:
-            try:
-                db.rollback()
-            except Exception:
-                pass
             if attempt == MAX_TRIES:
                 raise RuntimeError("Não foi possível gerar um link único após várias tentativas") from e
     raise RuntimeError("Erro inesperado ao criar movimentação")
@@ -71,87 +95,217 @@ def adicionar_produto_em_carrinho(db: Session,
                                   produto_id: int,
                                   quantidade: int,
                                   comercio_id: int,
-                                  desconto_percentual: Optional[Decimal] = None) -> CarrinhoItem:
+                                  desconto_percentual: Optional[Decimal] = None) -> dict:
+    """
+    Adiciona (ou soma) um produto no carrinho, SEM commit (fica com quem chama).
+    Depois do lock da movimentação, tudo é um statement só: INSERT ... SELECT do preço
+    do produto com ON CONFLICT (carrinho_id, produto_id) DO UPDATE, ajuste do cabeçalho
+    da movimentação pela diferença de subtotal e incremento da versão do carrinho.
+    Retorna dict com item_id, quantidade, subtotal, total_itens, valor_total e versao.
+    """
     if quantidade <= 0:
         raise ValueError("Quantidade deve ser maior que zero.")
     if desconto_percentual is not None and not (Decimal('0.00') <= desconto_percentual < Decimal('100.00')):
         raise ValueError("Desconto deve ser entre 0 e 99.9999%.")
 
-    mov = db.query(Movimentacao).filter(
-        Movimentacao.carrinho_id == carrinho_id
-    ).with_for_update().first()
-
-    if not mov:
+    mov_id = db.execute(
+        select(Movimentacao.mov_id)
+        .where(Movimentacao.carrinho_id == carrinho_id)
+        .with_for_update()
+    ).scalar()
+    if mov_id is None:
         raise ValueError("Carrinho/Movimentação não encontrada.")
 
-    produto = (
-        db.query(Produto)
-        .options(load_only(Produto.produto_id, Produto.preco, Produto.comercio_id))
-        .filter_by(produto_id=produto_id)
-        .first()
+    tbl = CarrinhoItem.__table__
+    mov_tbl = Movimentacao.__table__
+    car_tbl = Carrinho.__table__
+
+    desconto = literal(desconto_percentual, type_=tbl.c.desconto_percentual.type)
+    prod = (
+        select(Produto.produto_id, Produto.preco)
+        .where(Produto.produto_id == produto_id, Produto.comercio_id == comercio_id)
+        .cte("p")
+    )
+    # subtotal anterior da linha; todos os CTEs enxergam o mesmo snapshot (antes do upsert)
+    subtotal_antigo = (
+        select(tbl.c.subtotal)
+        .where(tbl.c.carrinho_id == carrinho_id, tbl.c.produto_id == produto_id)
+        .scalar_subquery()
     )
 
-    if not produto or int(produto.comercio_id) != int(comercio_id):
-        raise ValueError("Produto inválido.")
-    
-    preco_unitario = Decimal(produto.preco)
-    desconto = desconto_percentual if desconto_percentual is not None else Decimal(0)
-    
-    item_existente = db.query(CarrinhoItem).filter_by(
-        carrinho_id=carrinho_id, 
-        produto_id=produto_id
+    ins = pg_insert(tbl).from_select(
+        ["carrinho_id", "produto_id", "quantidade", "comercio_id",
+         "desconto_percentual", "preco_unitario", "subtotal"],
+        select(
+            literal(carrinho_id),
+            prod.c.produto_id,
+            literal(quantidade),
+            literal(comercio_id),
+            desconto,
+            prod.c.preco,
+            prod.c.preco * quantidade * (1 - func.coalesce(desconto, 0) / 100),
+        ),
+    )
+    nova_qtd = tbl.c.quantidade + ins.excluded.quantidade
+    novo_desc = func.coalesce(ins.excluded.desconto_percentual, tbl.c.desconto_percentual)
+    up = ins.on_conflict_do_update(
+        constraint="uq_carrinho_produto",
+        set_={
+            "quantidade": nova_qtd,
+            "preco_unitario": ins.excluded.preco_unitario,
+            "desconto_percentual": novo_desc,
+            "subtotal": ins.excluded.preco_unitario * nova_qtd * (1 - func.coalesce(novo_desc, 0) / 100),
+        },
+    ).returning(tbl.c.item_id, tbl.c.quantidade, tbl.c.subtotal).cte("up")
+
+    # "up.c.item_id != None" traz o CTE para o FROM do UPDATE (e não atualiza nada se o produto não existir)
+    cab = (
+        update(mov_tbl)
+        .where(mov_tbl.c.mov_id == mov_id, up.c.item_id != None)
+        .values(
+            total_itens=mov_tbl.c.total_itens + quantidade,
+            valor_total=func.greatest(
+                mov_tbl.c.valor_total - func.coalesce(subtotal_antigo, 0) + up.c.subtotal, 0
+            ),
+        )
+        .returning(mov_tbl.c.total_itens, mov_tbl.c.valor_total)
+        .cte("cab")
+    )
+    ver = (
+        update(car_tbl)
+        .where(car_tbl.c.carrinho_id == carrinho_id, up.c.item_id != None)
+        .values(versao=car_tbl.c.versao + 1)
+        .returning(car_tbl.c.versao)
+        .cte("ver")
+    )
+
+    linha = db.execute(
+        select(up.c.item_id, up.c.quantidade, up.c.subtotal,
+               cab.c.total_itens, cab.c.valor_total, ver.c.versao)
+        .select_from(up)
+        .join(cab, true())
+        .join(ver, true())
     ).first()
+    if linha is None:
+        raise ValueError("Produto inválido.")
+    return dict(linha._mapping)
 
-    item_final = None
 
-    if item_existente:
-        mov.valor_total -= item_existente.subtotal
-        
+LIMITE_ITENS_LOTE = 1000
 
-        item_existente.quantidade += quantidade
-        item_existente.preco_unitario = preco_unitario 
-        if desconto_percentual is not None:
-            item_existente.desconto_percentual = desconto
-            
-        novo_subtotal = (
-            item_existente.preco_unitario * item_existente.quantidade * (Decimal(1) - (item_existente.desconto_percentual or Decimal(0)) / 100)
-        )
-        item_existente.subtotal = novo_subtotal
-        
-        mov.total_itens += quantidade 
-        mov.valor_total += novo_subtotal
-        
-        item_final = item_existente
 
-    else:
-        subtotal = (
-            preco_unitario * Decimal(quantidade) * (Decimal(1) - (desconto / 100))
+def _normalizar_itens_lote(itens: list) -> dict[int, dict]:
+    """
+    Valida a lista [{produto_id, quantidade, desconto_percentual?}] e junta produtos repetidos
+    (quantidades somadas; vale o último desconto informado). Lança ValueError.
+    """
+    if not isinstance(itens, list) or not itens:
+        raise ValueError("Lista de itens vazia.")
+    if len(itens) > LIMITE_ITENS_LOTE:
+        raise ValueError(f"Máximo de {LIMITE_ITENS_LOTE} itens por lote.")
+
+    agregados: dict[int, dict] = {}
+    for pos, bruto in enumerate(itens):
+        try:
+            produto_id = int(bruto["produto_id"])
+            quantidade = int(bruto["quantidade"])
+            desconto = bruto.get("desconto_percentual")
+            desconto = Decimal(str(desconto)) if desconto is not None else None
+        except (TypeError, KeyError, ValueError, ArithmeticError):
+            raise ValueError(f"Item {pos}: produto_id e quantidade inteiros são obrigatórios.")
+        if quantidade <= 0:
+            raise ValueError(f"Item {pos}: quantidade deve ser maior que zero.")
+        if desconto is not None and not (Decimal('0.00') <= desconto < Decimal('100.00')):
+            raise ValueError(f"Item {pos}: desconto deve ser entre 0 e 99.9999%.")
+
+        atual = agregados.setdefault(produto_id, {"quantidade": 0, "desconto": None})
+        atual["quantidade"] += quantidade
+        if desconto is not None:
+            atual["desconto"] = desconto
+    return agregados
+
+
+def adicionar_produtos_em_lote(db: Session,
+                               carrinho_id: int,
+                               comercio_id: int,
+                               itens: list) -> list[int]:
+    """
+    Adiciona vários produtos ao carrinho numa transação, SEM commit (fica com quem chama).
+    Mesma regra do adicionar_produto_em_carrinho (soma quantidade, preço atual do produto,
+    desconto só substitui se informado), mas com um lock na movimentação, um SELECT ... IN
+    dos produtos e um INSERT ... ON CONFLICT de várias linhas.
+    Retorna os item_id afetados.
+    """
+    agregados = _normalizar_itens_lote(itens)
+
+    mov = db.query(Movimentacao).filter(
+        Movimentacao.carrinho_id == carrinho_id
+    ).with_for_update().first()
+    if not mov:
+        raise ValueError("Carrinho/Movimentação não encontrada.")
+
+    precos = dict(db.execute(
+        select(Produto.produto_id, Produto.preco)
+        .where(Produto.produto_id.in_(list(agregados)), Produto.comercio_id == comercio_id)
+    ).all())
+    faltando = sorted(set(agregados) - set(precos))
+    if faltando:
+        raise ValueError(f"Produtos inválidos: {', '.join(map(str, faltando))}")
+
+    valores = []
+    for produto_id, a in agregados.items():
+        preco = Decimal(precos[produto_id])
+        valores.append({
+            "carrinho_id": carrinho_id,
+            "produto_id": produto_id,
+            "comercio_id": comercio_id,
+            "quantidade": a["quantidade"],
+            "desconto_percentual": a["desconto"],
+            "preco_unitario": preco,
+            "subtotal": preco * a["quantidade"] * (Decimal(1) - (a["desconto"] or Decimal(0)) / 100),
+        })
+
+    tbl = CarrinhoItem.__table__
+    ins = pg_insert(tbl).values(valores)
+    exc = ins.excluded
+    nova_qtd = tbl.c.quantidade + exc.quantidade
+    novo_desc = func.coalesce(exc.desconto_percentual, tbl.c.desconto_percentual)
+    ins = ins.on_conflict_do_update(
+        constraint="uq_carrinho_produto",
+        set_={
+            "quantidade": nova_qtd,
+            "preco_unitario": exc.preco_unitario,
+            "desconto_percentual": novo_desc,
+            "subtotal": exc.preco_unitario * nova_qtd * (1 - func.coalesce(novo_desc, 0) / 100),
+        },
+    ).returning(tbl.c.item_id)
+    item_ids = [r.item_id for r in db.execute(ins)]
+
+    # cabeçalho recalculado a partir das linhas, ainda sob o lock da movimentação
+    _recalcular_totais_mov(db, mov.mov_id, carrinho_id)
+    _incrementar_versao(db, carrinho_id)
+    db.flush()
+    return item_ids
+
+
+def _recalcular_totais_mov(db: Session, mov_id: int, carrinho_id: int) -> None:
+    soma = (
+        select(
+            func.coalesce(func.sum(CarrinhoItem.quantidade), 0).label("qtd"),
+            func.coalesce(func.sum(CarrinhoItem.subtotal), 0).label("valor"),
         )
-        
-        novo_item = CarrinhoItem(
-            carrinho_id=carrinho_id,
-            produto_id=produto_id,
-            quantidade=quantidade,
-            comercio_id=comercio_id,
-            desconto_percentual=desconto_percentual,
-            preco_unitario=preco_unitario,
-            subtotal=subtotal
+        .where(CarrinhoItem.carrinho_id == carrinho_id)
+        .subquery()
+    )
+    db.execute(
+        update(Movimentacao)
+        .where(Movimentacao.mov_id == mov_id)
+        .values(
+            total_itens=select(soma.c.qtd).scalar_subquery(),
+            valor_total=select(soma.c.valor).scalar_subquery(),
         )
-        db.add(novo_item)
-        
-        mov.total_itens += quantidade
-        mov.valor_total += subtotal
-        
-        item_final = novo_item
-
-    # Só por garantia, né? Vai que
-    if mov.valor_total < 0: mov.valor_total = 0
-
-    db.flush() 
-    db.commit() 
-    
-    db.refresh(item_final) 
-    return item_final
+        .execution_options(synchronize_session=False)
+    )
 
 
 def get_itens_carrinho(db: Session, carrinho_id: int) -> list[CarrinhoItem]:
@@ -160,7 +314,7 @@ def get_itens_carrinho(db: Session, carrinho_id: int) -> list[CarrinhoItem]:
 
 def finalizar_movimentacao(db: Session, mov_id: int, comercio_id: int, tipo: Literal["entrada", "saida"]) -> Movimentacao:
     """
-    Finaliza a movimentação SEM gerenciar transação
+    Finaliza a movimentação SEM gerenciar transação (em ValueError, quem chama deve dar rollback)
     """
 
     # Busca movimentação com lock
@@ -177,67 +331,112 @@ def finalizar_movimentacao(db: Session, mov_id: int, comercio_id: int, tipo: Lit
     if not mov:
         raise ValueError("Movimentação não encontrada ou já fechada.")
 
-    # Busca itens do carrinho
-    itens = db.query(CarrinhoItem).filter(CarrinhoItem.carrinho_id == mov.carrinho_id).all()
+    # Linhas do carrinho (uma por produto, pelo uq_carrinho_produto)
+    itens = db.execute(
+        select(CarrinhoItem.produto_id, CarrinhoItem.quantidade, CarrinhoItem.subtotal, CarrinhoItem.preco_unitario)
+        .where(CarrinhoItem.carrinho_id == mov.carrinho_id)
+    ).all()
     if not itens:
         raise ValueError("Carrinho vazio")
 
-    produto_ids = [item.produto_id for item in itens]
+    produto_ids = sorted({item.produto_id for item in itens})
 
-    produtos = (
-        db.query(Produto)
-          .filter(Produto.produto_id.in_(produto_ids), Produto.comercio_id == comercio_id)
-          .with_for_update()
-          .all()
-    )
-    produtos_map = {p.produto_id: p for p in produtos}
+    # Trava os produtos sempre em ordem de produto_id: dois fechamentos concorrentes
+    # com produtos em comum esperam um pelo outro em vez de dar deadlock
+    precos = dict(db.execute(
+        select(Produto.produto_id, Produto.preco)
+        .where(Produto.produto_id.in_(produto_ids), Produto.comercio_id == comercio_id)
+        .order_by(Produto.produto_id)
+        .with_for_update()
+    ).all())
+    for pid in produto_ids:
+        if pid not in precos:
+            raise ValueError(f"Produto {pid} não encontrado.")
 
     total = Decimal("0.00")
     quantidade_total = 0
-
     for item in itens:
-        prod = produtos_map.get(item.produto_id)
-        if not prod:
-            raise ValueError(f"Produto {item.produto_id} não encontrado.")
-
-        quantidade = item.quantidade
-        quantidade_total += quantidade
-
-        if tipo == "saida":
-            if prod.quantidade_estoque < quantidade:
-                raise ValueError(f"Estoque insuficiente para {prod.nome}")
-            prod.quantidade_estoque -= quantidade
-        else:
-            #entrada
-            prod.quantidade_estoque += quantidade
-
+        quantidade_total += item.quantidade
         if item.subtotal is not None:
             total += item.subtotal
         else:
-            total += (item.preco_unitario or prod.preco) * quantidade
+            total += (item.preco_unitario or precos[item.produto_id]) * item.quantidade
+
+    # Baixa/entrada de estoque em um UPDATE só; na saída, a checagem de estoque fica no WHERE
+    # e quem não voltar no RETURNING não tinha saldo
+    agg = (
+        select(CarrinhoItem.produto_id, func.sum(CarrinhoItem.quantidade).label("qtd"))
+        .where(CarrinhoItem.carrinho_id == mov.carrinho_id)
+        .group_by(CarrinhoItem.produto_id)
+        .subquery("agg")
+    )
+    prod_tbl = Produto.__table__
+    conds = [prod_tbl.c.produto_id == agg.c.produto_id, prod_tbl.c.comercio_id == comercio_id]
+    if tipo == "saida":
+        novo_estoque = prod_tbl.c.quantidade_estoque - agg.c.qtd
+        conds.append(prod_tbl.c.quantidade_estoque >= agg.c.qtd)
+    else:
+        #entrada
+        novo_estoque = prod_tbl.c.quantidade_estoque + agg.c.qtd
+    atualizados = set(db.execute(
+        update(prod_tbl)
+        .where(*conds)
+        .values(quantidade_estoque=novo_estoque)
+        .returning(prod_tbl.c.produto_id)
+    ).scalars())
+
+    sem_estoque = [pid for pid in produto_ids if pid not in atualizados]
+    if sem_estoque:
+        # quem chama faz rollback (o UPDATE acima já mexeu nos outros produtos)
+        nomes = db.execute(
+            select(Produto.nome).where(Produto.produto_id.in_(sem_estoque)).order_by(Produto.produto_id)
+        ).scalars().all()
+        raise ValueError(f"Estoque insuficiente para {', '.join(nomes)}")
 
     mov.valor_total = total
     mov.total_itens = quantidade_total
     mov.estado = "fechada"
     mov.fechado_em = datetime.now(timezone.utc)
+    acumular_movimentacao_mensal(db, comercio_id, mov.tipo, mov.fechado_em, quantidade_total, total)
 
     return mov
 
-def deletar_item_de_carrinho(db: Session, item_id: int) -> Carrinho:
+def deletar_item_de_carrinho(db: Session, item_id: int, comercio_id: Optional[int] = None) -> Carrinho:
     """
     Remove item e atualiza totais.
-    Retorna True se sucesso, lança exceção se falhar.
+    Retorna o Carrinho se sucesso, None se item/movimentação não existir.
     """
-    item: CarrinhoItem = db.query(CarrinhoItem).get(item_id)
-    if not item:
+    dono = db.execute(
+        select(CarrinhoItem.carrinho_id, CarrinhoItem.comercio_id).where(CarrinhoItem.item_id == item_id)
+    ).first()
+    if not dono or (comercio_id is not None and int(dono.comercio_id) != int(comercio_id)):
         return None
 
-    mov: Movimentacao = db.query(Movimentacao).get(item.carrinho_id)
+    # a movimentação é achada pelo carrinho (mov_id != carrinho_id) e travada como no adicionar
+    mov: Movimentacao = (
+        db.query(Movimentacao)
+        .filter(Movimentacao.carrinho_id == dono.carrinho_id)
+        .with_for_update()
+        .first()
+    )
     if not mov:
         return None
 
+    # a linha só é lida depois do lock: um adicionar concorrente pode ter mudado
+    # quantidade/subtotal enquanto esperávamos (populate_existing ignora o identity map)
+    item: CarrinhoItem = (
+        db.query(CarrinhoItem)
+        .filter(CarrinhoItem.item_id == item_id)
+        .populate_existing()
+        .with_for_update()
+        .first()
+    )
+    if not item:
+        return None
+
+    valor_item = item.subtotal if item.subtotal is not None else (item.quantidade * (item.preco_unitario or 0))
     novo_total_itens = Movimentacao.total_itens - item.quantidade
-    novo_valor_total = Movimentacao.valor_total - (item.quantidade * item.preco_unitario)
+    novo_valor_total = Movimentacao.valor_total - valor_item
 
     # Lógica sql demoníaca
     mov.total_itens = case(
@@ -250,54 +449,113 @@ def deletar_item_de_carrinho(db: Session, item_id: int) -> Carrinho:
         else_=novo_valor_total
     )
     
-    cart = db.query(Carrinho).get(item.carrinho_id)
+    cart = db.query(Carrinho).options(noload(Carrinho.itens)).filter(Carrinho.carrinho_id == item.carrinho_id).first()
 
     db.delete(item)
+    _incrementar_versao(db, item.carrinho_id)
     db.commit()
     db.refresh(cart)
     return cart
 
-    
-    
-    
-    
 
-def _format_cart_with_items(db: Session, cart: Carrinho):
-    itens_objs = get_itens_carrinho(db=db, carrinho_id=cart.carrinho_id)
-    itens_formatados = []
-    total_carrinho = Decimal("0.00")
+def _incrementar_versao(db: Session, carrinho_id: int) -> int:
+    """Incrementa Carrinho.versao (chamar com a movimentação travada) e retorna a nova versão."""
+    return db.execute(
+        update(Carrinho)
+        .where(Carrinho.carrinho_id == carrinho_id)
+        .values(versao=Carrinho.versao + 1)
+        .returning(Carrinho.versao)
+    ).scalar_one()
 
-    for item in itens_objs:
-        produto: Produto = item.produto
-        if not produto:
-            continue
 
-        unidade: UnidadeMedida = db.query(UnidadeMedida).get(produto.unimed_id)
+def montar_delta_carrinho(db: Session, carrinho_id: int, item_ids: list[int]) -> dict:
+    """
+    Resposta incremental de uma alteração: só as linhas alteradas ("removidos" lista as
+    que não existem mais) e o cabeçalho (total_itens = soma das quantidades, valor_total,
+    versao), lido numa query só para ficar consistente.
+    """
+    cab = db.execute(
+        select(Movimentacao.total_itens, Movimentacao.valor_total, Carrinho.versao)
+        .join(Carrinho, Carrinho.carrinho_id == Movimentacao.carrinho_id)
+        .where(Movimentacao.carrinho_id == carrinho_id)
+    ).first()
+    itens = [_formatar_linha_carrinho(l)[0] for l in _linhas_itens_carrinho(db, carrinho_id, item_ids=item_ids)]
+    presentes = {i["item_id"] for i in itens}
+    return {
+        "carrinho_id": carrinho_id,
+        "itens": itens,
+        "removidos": [i for i in item_ids if i not in presentes],
+        "total_itens": int(cab.total_itens) if cab else 0,
+        "valor_total": str(Decimal(cab.valor_total).quantize(Decimal("0.01"))) if cab else "0.00",
+        "versao": int(cab.versao) if cab else 0,
+    }
+
+
+def _linhas_itens_carrinho(db: Session, carrinho_id: int, item_ids: Optional[list[int]] = None):
+    """
+    Itens do carrinho já com nome do produto e nome da unidade, numa query só
+    (antes era item.produto lazy + get de UnidadeMedida por item). Preço e subtotal são
+    os gravados na linha (os mesmos que somam Movimentacao.valor_total); o preço atual
+    do produto só cobre linhas antigas sem preco_unitario.
+    """
+    stmt = (
+        select(
+            CarrinhoItem.item_id,
+            CarrinhoItem.carrinho_id,
+            CarrinhoItem.quantidade,
+            CarrinhoItem.desconto_percentual,
+            CarrinhoItem.preco_unitario,
+            CarrinhoItem.subtotal,
+            Produto.produto_id,
+            Produto.nome.label("nome_produto"),
+            Produto.preco.label("preco_produto"),
+            UnidadeMedida.nome.label("unidade"),
+        )
+        .join(Produto, Produto.produto_id == CarrinhoItem.produto_id)
+        .outerjoin(UnidadeMedida, UnidadeMedida.unimed_id == Produto.unimed_id)
+        .where(CarrinhoItem.carrinho_id == carrinho_id)
+        .order_by(CarrinhoItem.item_id.asc())
+    )
+    if item_ids is not None:
+        stmt = stmt.where(CarrinhoItem.item_id.in_(item_ids))
+    return db.execute(stmt).all()
 
-        preco = Decimal(produto.preco) if produto.preco is not None else Decimal("0.00")
-        quantidade = Decimal(item.quantidade)
-        subtotal = preco * quantidade
 
+def _formatar_linha_carrinho(item) -> tuple[dict, Decimal]:
+    """Formata uma linha de _linhas_itens_carrinho; retorna (dict, subtotal gravado na linha)."""
+    preco = item.preco_unitario if item.preco_unitario is not None else item.preco_produto
+    preco = Decimal(preco) if preco is not None else Decimal("0.00")
+    if item.subtotal is not None:
+        subtotal = Decimal(item.subtotal)
+    else:
+        subtotal = preco * Decimal(item.quantidade)
         if item.desconto_percentual:
-            fator = Decimal(item.desconto_percentual) / Decimal("100")
-            subtotal = subtotal * (Decimal("1") - fator)
+            subtotal = subtotal * (Decimal("1") - Decimal(item.desconto_percentual) / Decimal("100"))
+
+    return {
+        "item_id": item.item_id,
+        "carrinho_id": item.carrinho_id,
+        "produto_id": item.produto_id,
+        "unidade": item.unidade,
+        "nome_produto": item.nome_produto,
+        "preco_unitario": str(preco.quantize(Decimal("0.01"))),
+        "quantidade": int(item.quantidade),
+        "desconto_percentual": (str(item.desconto_percentual)
+                                if item.desconto_percentual is not None else None),
+        "subtotal": str(subtotal.quantize(Decimal("0.01")))
+    }, subtotal
 
-        total_carrinho += subtotal
 
-        itens_formatados.append({
-            "item_id": item.item_id,
-            "carrinho_id": item.carrinho_id,
-            "produto_id": produto.produto_id,
-            "unidade": unidade.nome,
-            "nome_produto": produto.nome,
-            "preco_unitario": str(preco.quantize(Decimal("0.01"))),
-            "quantidade": int(item.quantidade),
-            "desconto_percentual": (str(item.desconto_percentual)
-                                    if item.desconto_percentual is not None else None),
-            "subtotal": str(subtotal.quantize(Decimal("0.01")))
-        })
+def _format_cart_with_items(db: Session, cart: Carrinho):
+    itens_formatados = []
+    total_carrinho = Decimal("0.00")
+
+    for item in _linhas_itens_carrinho(db, cart.carrinho_id):
+        linha, subtotal = _formatar_linha_carrinho(item)
+        total_carrinho += subtotal
+        itens_formatados.append(linha)
 
     cart_dict = model_to_dict(cart)
     cart_dict["itens"] = itens_formatados
     cart_dict["valor_total"] = str(total_carrinho.quantize(Decimal("0.01")))
-    return cart_dict
\ No newline at end of file
+    return cart_dict
@@ -5,124 +5,8 @@ from sqlalchemy.orm import Session, joinedload
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from decimal import Decimal, InvalidOperation
 from app.models.produtos_model import Produto
-import secrets
-from app.models import Produto, Categoria, Fornecedor, UnidadeMedida
-from app.utils.contador_utils import next_codigo  # ajuste conforme seus módulos
-
-MAX_CODE_TRIES = 5
-
-def _generate_codigo() -> str:
-    return f"PRD-{secrets.token_hex(4)}"
-
-# ---------- helpers para categorias/fornecedores (mantidos) ----------
-def _find_category_by_name(db: Session, comercio_id: int, nome: str) -> Optional[Categoria]:
-    if not nome:
-        return None
-    return db.query(Categoria).filter(
-        Categoria.comercio_id == comercio_id,
-        Categoria.nome.ilike(nome.strip())
-    ).first()
-
-def _create_category(db: Session, comercio_id: int, nome: str) -> Categoria:
-    cat = Categoria(nome=nome.strip(), comercio_id=comercio_id)
-    db.add(cat)
-    db.flush()
-    return cat
-
-def _get_or_create_category(db: Session, comercio_id: int, nome: Optional[str]) -> Categoria:
-    if nome:
-        found = _find_category_by_name(db, comercio_id, nome)
-        if found:
-            return found
-        return _create_category(db, comercio_id, nome)
-    placeholder_name = "Sem categoria"
-    found = _find_category_by_name(db, comercio_id, placeholder_name)
-    if found:
-        return found
-    return _create_category(db, comercio_id, placeholder_name)
-
-def _find_fornecedor_by_name(db: Session, comercio_id: int, nome: str) -> Optional[Fornecedor]:
-    if not nome:
-        return None
-    return db.query(Fornecedor).filter(
-        Fornecedor.comercio_id == comercio_id,
-        Fornecedor.nome.ilike(nome.strip())
-    ).first()
-
-def _create_fornecedor(db: Session, comercio_id: int, nome: str) -> Fornecedor:
-    f = Fornecedor(nome=nome.strip(), comercio_id=comercio_id)
-    db.add(f)
-    db.flush()
-    return f
-
-def _get_or_create_fornecedor(db: Session, comercio_id: int, nome: Optional[str]) -> Fornecedor:
-    if nome:
-        found = _find_fornecedor_by_name(db, comercio_id, nome)
-        if found:
-            return found
-        return _create_fornecedor(db, comercio_id, nome)
-    placeholder_name = "Sem fornecedor"
-    found = _find_fornecedor_by_name(db, comercio_id, placeholder_name)
-    if found:
-        return found
-    return _create_fornecedor(db, comercio_id, placeholder_name)
-
-# ---------- helpers para unidade de medida (robustos) ----------
-def _find_unimed_by_id(db: Session, comercio_id: int, unimed_id: int) -> Optional[UnidadeMedida]:
-    """
-    Busca por PK usando Session.get para evitar depender de nomes de coluna.
-    Retorna a unidade se existir E for global (comercio_id IS NULL) ou pertencer ao comercio.
-    """
-    try:
-        # usa Session.get (disponível no SQLAlchemy 1.4+) — busca por PK real do model
-        uni = db.get(UnidadeMedida, int(unimed_id))
-    except Exception:
-        return None
-
-    if uni is None:
-        return None
-    
-    uni_comercio = getattr(uni, "comercio_id", None)
-    if uni_comercio is None or uni_comercio == comercio_id:
-        return uni
-
- 
-    return None
-
-
-def _create_unimed(db: Session, comercio_id: int, nome: str, sigla: str) -> UnidadeMedida:
-    u = UnidadeMedida(nome=nome.strip(), sigla=sigla.strip(), comercio_id=comercio_id)
-    db.add(u)
-    db.flush()
-    return u
-
-def _get_or_create_unimed(db: Session, comercio_id: int, sigla_or_none: Optional[str]) -> UnidadeMedida:
-    if sigla_or_none:
-        found = _find_unimed_by_id(db, comercio_id, sigla_or_none)
-        if found:
-            return found
-        return _create_unimed(db, comercio_id, nome=sigla_or_none, sigla=sigla_or_none)
-    placeholder_sigla = "un"
-    found = _find_unimed_by_id(db, comercio_id, placeholder_sigla)
-    if found:
-        return found
-    return _create_unimed(db, comercio_id, nome="Unidade (padrão)", sigla=placeholder_sigla)
-
-# utilitário para extrair o id real de um model (tenta vários nomes de atributo comuns)
-def _get_model_id(instance: Any) -> Optional[int]:
-    for attr in ("unidade_medida_id", "unimed_id", "id", "pk"):
-        if hasattr(instance, attr):
-            val = getattr(instance, attr)
-            try:
-                return int(val) if val is not None else None
-            except (TypeError, ValueError):
-                return None
-    # fallback: tenta atributo genérico 'id' via __dict__
-    val = getattr(instance, "id", None)
-    try:
-        return int(val) if val is not None else None
-    except Exception:
-        return None
+from app.utils.contador_utils import alocar_codigo  # ajuste conforme seus módulos
+from app.services.resolvedor_service import resolver_referencias
 
 # ---------- create_produto (principal) ----------
 def create_produto(db: Session,
@@ -165,50 +49,15 @@ def create_produto(db: Session,
     if limite_int < 0:
         raise ValueError("limiteEstoque não pode ser negativo")
 
-    # coerção/validação de ids (categoria, fornecedor)
-    categoria_id = None
-    fornecedor_id = None
-    unimed_id = None
-
-    if categoria is not None:
-        try:
-            categoria_id = int(categoria)
-        except (TypeError, ValueError):
-            raise ValueError("categoria deve ser um id inteiro")
-        cat = db.query(Categoria).filter(Categoria.categoria_id == categoria_id, Categoria.comercio_id == comercio_id).first()
-        if cat is None:
-            raise ValueError(f"Categoria {categoria_id} não encontrada para o comércio {comercio_id}")
-
-    if fornecedor is not None:
-        try:
-            fornecedor_id = int(fornecedor)
-        except (TypeError, ValueError):
-            raise ValueError("fornecedor deve ser um id inteiro")
-        forn = db.query(Fornecedor).filter(Fornecedor.fornecedor_id == fornecedor_id, Fornecedor.comercio_id == comercio_id).first()
-        if forn is None:
-            raise ValueError(f"Fornecedor {fornecedor_id} não encontrado para o comércio {comercio_id}")
-
-    # ---- tratamento robusto para unimed: aceita id (int) ou sigla/name (str) ----
-    if unimed is not None:
-        # se for inteiro ou string numérica -> trata como id
-        if isinstance(unimed, (int,)) or (isinstance(unimed, str) and str(unimed).strip().isdigit()):
-            try:
-                candidate_id = int(unimed)
-            except (TypeError, ValueError):
-                raise ValueError("unimed deve ser um id inteiro ou uma sigla válida")
-            uni = _find_unimed_by_id(db, comercio_id, candidate_id)
-            if uni is None:
-                raise ValueError(f"Unidade de medida {candidate_id} não encontrada para o comércio {comercio_id}")
-            unimed_id = _get_model_id(uni)
-        else:
-            # se for string não numérica, tenta tratar como sigla -> get_or_create
-            sigla = str(unimed).strip()
-            uni = _get_or_create_unimed(db, comercio_id, sigla)
-            unimed_id = _get_model_id(uni)
+    # categoria/fornecedor: id positivo do comércio; unimed: id ou sigla (get-or-create)
+    refs = resolver_referencias(db, comercio_id, categoria=categoria, fornecedor=fornecedor, unimed=unimed)
+    categoria_id = refs.get("categoria_id")
+    fornecedor_id = refs.get("fornecedor_id")
+    unimed_id = refs.get("unimed_id")
 
     # operação dentro de transação
     try:
-        codigo_resultado = next_codigo(db, comercio_id, 'produtos')
+        codigo_resultado = alocar_codigo(db, comercio_id, 'produtos')
 
         produto = Produto(
             codigo=codigo_resultado,
@@ -315,23 +164,21 @@ def update_produto(db, produto_id: int, comercio_id: int, data: dict):
         except (InvalidOperation, TypeError, ValueError):
             raise ValueError(f"preço inválido: {v}")
 
-    def parse_unimed(v):
+    def parse_ref(v):
+        # id (ou sigla, no caso de unimed) ou vazio; a validação fica para o resolvedor
         if v is None or (isinstance(v, str) and v.strip() == ""):
             return None
-        # se numérico -> id
-        if isinstance(v, int) or (isinstance(v, str) and v.strip().isdigit()):
-            return int(v)
-        return str(v).strip()  # sigla/nome
+        return v
 
     # mapeamento payload_key -> (attr_no_model, parser)
     field_map = {
         "nome": ("nome", lambda x: str(x).strip() if x is not None else None),
         "preco": ("preco", parse_preco),
         "quantidade_estoque": ("quantidade_estoque", parse_int_required),
-        "categoria_id": ("categoria_id", parse_int_or_none),
-        "fornecedor_id": ("fornecedor_id", parse_int_or_none),
-        "unimed_id": ("unimed_id", parse_unimed),
-        "unimed": ("unimed_id", parse_unimed),  # aceitar 'unimed' também
+        "categoria_id": ("categoria_id", parse_ref),
+        "fornecedor_id": ("fornecedor_id", parse_ref),
+        "unimed_id": ("unimed_id", parse_ref),
+        "unimed": ("unimed_id", parse_ref),  # aceitar 'unimed' também
         "tags": ("tags", lambda x: (str(x).strip() if x is not None and x != "" else None)),
         # aceitar camelCase e snake_case, e mapear para atributo do model (limite_estoque)
         "limiteEstoque": ("limite_estoque", parse_int_or_none),
@@ -339,6 +186,7 @@ def update_produto(db, produto_id: int, comercio_id: int, data: dict):
     }
 
     # percorre os campos permitidos e atualiza
+    refs = {}
     for key, (attr, parser) in field_map.items():
         if key in data:
             raw_val = data[key]
@@ -347,9 +195,31 @@ def update_produto(db, produto_id: int, comercio_id: int, data: dict):
             except ValueError as ve:
                 # propaga mensagem clara para o caller (rota tratará como 400)
                 raise ValueError(f"Campo '{key}' inválido: {ve}")
+            if parser is parse_ref:
+                refs[attr] = parsed
+                continue
             # atribuição segura
             setattr(prod, attr, parsed)
 
+    # referências: -1/None limpam categoria/fornecedor; o resto passa pelo resolvedor
+    if refs:
+        if "unimed_id" in refs and refs["unimed_id"] is None:
+            raise ValueError("Campo 'unimed_id' é obrigatório")
+        a_resolver = {}
+        for attr, valor in refs.items():
+            if attr != "unimed_id" and (valor is None or str(valor).strip() == "-1"):
+                setattr(prod, attr, None)
+            else:
+                a_resolver[attr] = valor
+        resolvidos = resolver_referencias(
+            db, comercio_id,
+            categoria=a_resolver.get("categoria_id"),
+            fornecedor=a_resolver.get("fornecedor_id"),
+            unimed=a_resolver.get("unimed_id"),
+        )
+        for attr, valor in resolvidos.items():
+            setattr(prod, attr, valor)
+
     try:
         db.add(prod)
         db.commit()
@@ -0,0 +1,183 @@
+# app/services/referencias_service.py
+"""
+Cache local (por worker) dos dados de referência de cada comércio: categorias,
+fornecedores e unidades próprias, mais as unidades globais (chave GLOBAL).
+
+Cada comércio tem uma versão em memória; os serviços que criam/alteram/apagam essas
+tabelas chamam invalidar_referencias() depois do commit, que sobe a versão e descarta a
+entrada. Uma carga que começou antes da invalidação não é guardada. Entre workers vale o TTL.
+Quem consulta trata ausência no cache como "não sei" e confirma no banco.
+
+Código que insere referências no meio de uma transação (resolvers) chama
+marcar_alteradas(): até o commit/rollback dessa sessão o cache do comércio não é usado
+por ela (tudo cai no banco) e, no fim, a entrada é invalidada.
+"""
+import os
+import threading
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from app.models.categoria_model import Categoria
+from app.models.fornecedores_model import Fornecedor
+from app.models.unimed_model import UnidadeMedida
+from app.utils.cache_utils import CacheTTL
+
+GLOBAL = 0  # chave das unidades globais (comercio_id IS NULL)
+
+_cache_referencias = CacheTTL(
+    maxsize=int(os.getenv("REFERENCIAS_CACHE_TAMANHO", "1024")),
+    ttl=float(os.getenv("REFERENCIAS_CACHE_TTL", "30")),
+)
+_versoes: dict[int, int] = {}
+_versoes_lock = threading.Lock()
+
+
+def _versao(chave: int) -> int:
+    with _versoes_lock:
+        return _versoes.get(chave, 0)
+
+
+def invalidar_referencias(comercio_id: int | None) -> None:
+    """Descarta o cache do comércio (None = unidades globais). Chamar depois do commit."""
+    chave = GLOBAL if comercio_id is None else int(comercio_id)
+    with _versoes_lock:
+        _versoes[chave] = _versoes.get(chave, 0) + 1
+    _cache_referencias.invalidar(chave)
+
+
+def marcar_alteradas(db: Session, comercio_id: int) -> None:
+    """A sessão inseriu referências do comércio ainda não commitadas."""
+    db.info.setdefault("referencias_alteradas", set()).add(int(comercio_id))
+
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_rollback")
+def _fim_da_transacao(session):
+    for comercio_id in session.info.pop("referencias_alteradas", ()):
+        invalidar_referencias(comercio_id)
+
+
+_VAZIO = {
+    "categorias": {},
+    "fornecedores": {},
+    "unidades": {},
+    "categorias_por_nome": {},
+    "fornecedores_por_nome": {},
+    "unidades_por_sigla": {},
+}
+
+
+def _unidade_dict(row) -> dict:
+    return {"unimed_id": row.unimed_id, "nome": row.nome, "sigla": row.sigla, "comercio_id": row.comercio_id}
+
+
+def _por_lower(pares) -> dict[str, int]:
+    """{lower(texto): id}; com nomes repetidos fica o menor id (mesma regra dos resolvers)."""
+    out: dict[str, int] = {}
+    for i, texto in sorted(pares):
+        out.setdefault(texto.lower(), i)
+    return out
+
+
+def _carregar(db: Session, chave: int) -> dict:
+    if chave == GLOBAL:
+        unidades = db.execute(
+            select(UnidadeMedida.unimed_id, UnidadeMedida.nome, UnidadeMedida.sigla, UnidadeMedida.comercio_id)
+            .where(UnidadeMedida.comercio_id.is_(None))
+        ).all()
+        return {
+            "unidades": {u.unimed_id: _unidade_dict(u) for u in unidades},
+            "unidades_por_sigla": _por_lower((u.unimed_id, u.sigla) for u in unidades),
+        }
+
+    categorias = db.execute(
+        select(Categoria.categoria_id, Categoria.nome).where(Categoria.comercio_id == chave)
+    ).all()
+    fornecedores = db.execute(
+        select(Fornecedor.fornecedor_id, Fornecedor.nome).where(Fornecedor.comercio_id == chave)
+    ).all()
+    unidades = db.execute(
+        select(UnidadeMedida.unimed_id, UnidadeMedida.nome, UnidadeMedida.sigla, UnidadeMedida.comercio_id)
+        .where(UnidadeMedida.comercio_id == chave)
+    ).all()
+    return {
+        "categorias": dict(categorias),
+        "fornecedores": dict(fornecedores),
+        "unidades": {u.unimed_id: _unidade_dict(u) for u in unidades},
+        "categorias_por_nome": _por_lower(categorias),
+        "fornecedores_por_nome": _por_lower(fornecedores),
+        "unidades_por_sigla": _por_lower((u.unimed_id, u.sigla) for u in unidades),
+    }
+
+
+def _obter(db: Session, chave: int) -> dict:
+    if chave in db.info.get("referencias_alteradas", ()):
+        # a sessão vê linhas não commitadas: nem usa nem preenche o cache
+        return _VAZIO
+    dados = _cache_referencias.get(chave)
+    if dados is not None:
+        return dados
+    versao = _versao(chave)
+    dados = _carregar(db, chave)
+    # só guarda se ninguém invalidou enquanto a carga rodava
+    if _versao(chave) == versao:
+        _cache_referencias.set(chave, dados)
+    return dados
+
+
+def referencias_do_comercio(db: Session, comercio_id: int) -> dict:
+    """
+    {"categorias": {id: nome}, "fornecedores": {id: nome}, "unidades": {id: dict}} do comércio,
+    mais os índices {lower(nome): id} (categorias_por_nome, fornecedores_por_nome) e
+    {lower(sigla): id} (unidades_por_sigla). Não alterar o dict devolvido.
+    """
+    return _obter(db, int(comercio_id))
+
+
+def unidades_globais(db: Session) -> dict[int, dict]:
+    return _obter(db, GLOBAL)["unidades"]
+
+
+def unidades_por_sigla(db: Session, comercio_id: int) -> dict[str, int]:
+    """{lower(sigla): unimed_id} das unidades visíveis ao comércio (globais + próprias)."""
+    return {**unidades_globais_por_sigla(db), **referencias_do_comercio(db, comercio_id)["unidades_por_sigla"]}
+
+
+def unidades_globais_por_sigla(db: Session) -> dict[str, int]:
+    return _obter(db, GLOBAL)["unidades_por_sigla"]
+
+
+def unidade_por_id(db: Session, comercio_id: int, unimed_id: int) -> dict | None:
+    """Unidade global ou do comércio pelo id; sem DB quando está no cache."""
+    u = unidades_globais(db).get(unimed_id) or referencias_do_comercio(db, comercio_id)["unidades"].get(unimed_id)
+    if u is not None:
+        return u
+    # pode ter sido criada em outro worker depois da carga
+    row = db.execute(
+        select(UnidadeMedida.unimed_id, UnidadeMedida.nome, UnidadeMedida.sigla, UnidadeMedida.comercio_id)
+        .where(UnidadeMedida.unimed_id == unimed_id)
+    ).first()
+    if row is None or row.comercio_id not in (None, comercio_id):
+        return None
+    return _unidade_dict(row)
+
+
+def categoria_existe(db: Session, comercio_id: int, categoria_id: int) -> bool:
+    if categoria_id in referencias_do_comercio(db, comercio_id)["categorias"]:
+        return True
+    return db.execute(
+        select(Categoria.categoria_id).where(Categoria.categoria_id == categoria_id, Categoria.comercio_id == comercio_id)
+    ).first() is not None
+
+
+def fornecedor_existe(db: Session, comercio_id: int, fornecedor_id: int) -> bool:
+    if fornecedor_id in referencias_do_comercio(db, comercio_id)["fornecedores"]:
+        return True
+    return db.execute(
+        select(Fornecedor.fornecedor_id).where(Fornecedor.fornecedor_id == fornecedor_id, Fornecedor.comercio_id == comercio_id)
+    ).first() is not None
+
+
+def estatisticas_cache_referencias() -> dict:
+    return _cache_referencias.estatisticas()
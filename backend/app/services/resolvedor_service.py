@@ -0,0 +1,202 @@
+# app/services/resolvedor_service.py
+"""
+Get-or-create em lote de categorias, fornecedores e unidades de medida.
+
+Cada resolver recebe um conjunto de nomes (ou siglas), procura primeiro no cache de
+referências, resolve o resto numa query só (comparando por lower(), coberto pelos índices
+*_comercio_lower_nome) e cria os que faltam num único INSERT de várias linhas, com ON
+CONFLICT no índice único para importações simultâneas não duplicarem nomes.
+Usado pela importação em massa; no cadastro/edição de produto só a unidade de medida
+aceita sigla — categoria e fornecedor são ids.
+"""
+from typing import Any, Iterable, Optional
+
+from sqlalchemy import func, or_, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.models.categoria_model import Categoria
+from app.models.fornecedores_model import Fornecedor
+from app.models.unimed_model import UnidadeMedida
+from app.utils.contador_utils import alocar_codigos
+from app.services.referencias_service import (
+    categoria_existe,
+    fornecedor_existe,
+    marcar_alteradas,
+    referencias_do_comercio,
+    unidade_por_id,
+    unidades_por_sigla,
+)
+
+
+def _limpar(nomes: Iterable[Optional[str]]) -> dict[str, str]:
+    """{lower(nome): nome} sem vazios; a primeira grafia de cada nome é a que vai ser criada."""
+    out: dict[str, str] = {}
+    for n in nomes:
+        n = (n or "").strip()
+        if n:
+            out.setdefault(n.lower(), n)
+    return out
+
+
+def resolver_categorias(db: Session, comercio_id: int, nomes: Iterable[str]) -> dict[str, int]:
+    """{lower(nome): categoria_id}, criando as categorias que faltam."""
+    por_lower = _limpar(nomes)
+    if not por_lower:
+        return {}
+    cache = referencias_do_comercio(db, comercio_id)["categorias_por_nome"]
+    mapa = {k: cache[k] for k in por_lower if k in cache}
+    restantes = [k for k in por_lower if k not in mapa]
+    if restantes:
+        mapa.update(db.execute(
+            select(func.lower(Categoria.nome), Categoria.categoria_id)
+            .where(Categoria.comercio_id == comercio_id, func.lower(Categoria.nome).in_(restantes))
+        ).all())
+
+    faltando = [n for k, n in por_lower.items() if k not in mapa]
+    if faltando:
+        tbl = Categoria.__table__
+        ins = pg_insert(tbl).values([
+            {"comercio_id": comercio_id, "codigo": c, "nome": n}
+            for c, n in zip(alocar_codigos(db, comercio_id, "categorias", len(faltando)), faltando)
+        ])
+        # DO UPDATE "vazio" para o RETURNING trazer também a linha criada por outra transação
+        novas = db.execute(
+            ins.on_conflict_do_update(constraint="uq_categoria_comercio_nome", set_={"nome": tbl.c.nome})
+            .returning(tbl.c.nome, tbl.c.categoria_id)
+        ).all()
+        mapa.update({n.lower(): i for n, i in novas})
+        marcar_alteradas(db, comercio_id)
+    return mapa
+
+
+def resolver_fornecedores(db: Session, comercio_id: int, nomes: Iterable[str]) -> dict[str, int]:
+    """{lower(nome): fornecedor_id}, criando (sem CNPJ) os fornecedores que faltam."""
+    por_lower = _limpar(nomes)
+    if not por_lower:
+        return {}
+    cache = referencias_do_comercio(db, comercio_id)["fornecedores_por_nome"]
+    mapa = {k: cache[k] for k in por_lower if k in cache}
+    restantes = [k for k in por_lower if k not in mapa]
+    if restantes:
+        for lower, fid in db.execute(
+            select(func.lower(Fornecedor.nome), Fornecedor.fornecedor_id)
+            .where(Fornecedor.comercio_id == comercio_id, func.lower(Fornecedor.nome).in_(restantes))
+            .order_by(Fornecedor.fornecedor_id)
+        ):
+            mapa.setdefault(lower, fid)
+
+    faltando = [n for k, n in por_lower.items() if k not in mapa]
+    if faltando:
+        tbl = Fornecedor.__table__
+        ins = pg_insert(tbl).values([
+            {"comercio_id": comercio_id, "codigo": c, "nome": n}
+            for c, n in zip(alocar_codigos(db, comercio_id, "fornecedores", len(faltando)), faltando)
+        ])
+        # ux_fornecedores_comercio_lower_nome; mesmo truque do DO UPDATE das categorias
+        novos = db.execute(
+            ins.on_conflict_do_update(
+                index_elements=[tbl.c.comercio_id, func.lower(tbl.c.nome)],
+                set_={"nome": tbl.c.nome},
+            ).returning(tbl.c.nome, tbl.c.fornecedor_id)
+        ).all()
+        mapa.update({n.lower(): i for n, i in novos})
+        marcar_alteradas(db, comercio_id)
+    return mapa
+
+
+def resolver_unidades(db: Session, comercio_id: int, valores: Iterable[str]) -> dict[str, int]:
+    """
+    {valor: unimed_id} para ids numéricos ou siglas (globais ou do comércio).
+    Siglas desconhecidas são criadas para o comércio; ids desconhecidos e siglas que já
+    pertencem a outro comércio ficam fora do mapa.
+    """
+    valores = {str(v).strip() for v in valores if v is not None and str(v).strip()}
+    if not valores:
+        return {}
+    visivel = or_(UnidadeMedida.comercio_id.is_(None), UnidadeMedida.comercio_id == comercio_id)
+    ids = {v: int(v) for v in valores if v.isdigit()}
+    siglas = _limpar(v for v in valores if not v.isdigit())
+    mapa: dict[str, int] = {}
+
+    for v, i in ids.items():
+        if unidade_por_id(db, comercio_id, i) is not None:
+            mapa[v] = i
+
+    if siglas:
+        cache = unidades_por_sigla(db, comercio_id)
+        por_lower = {k: cache[k] for k in siglas if k in cache}
+        restantes = [k for k in siglas if k not in por_lower]
+        if restantes:
+            por_lower.update(db.execute(
+                select(func.lower(UnidadeMedida.sigla), UnidadeMedida.unimed_id)
+                .where(func.lower(UnidadeMedida.sigla).in_(restantes), visivel)
+            ).all())
+        faltando = [s for k, s in siglas.items() if k not in por_lower]
+        if faltando:
+            tbl = UnidadeMedida.__table__
+            novas = db.execute(
+                pg_insert(tbl)
+                .values([{"nome": s, "sigla": s, "comercio_id": comercio_id} for s in faltando])
+                .on_conflict_do_nothing(index_elements=["sigla"])
+                .returning(tbl.c.sigla, tbl.c.unimed_id)
+            ).all()
+            por_lower.update({s.lower(): i for s, i in novas})
+            if novas:
+                marcar_alteradas(db, comercio_id)
+        mapa.update({v: por_lower[v.lower()] for v in valores if not v.isdigit() and v.lower() in por_lower})
+    return mapa
+
+
+def _parse_id(valor: Any, campo: str) -> int:
+    """Id positivo (int ou string numérica); qualquer outra coisa -> ValueError."""
+    if isinstance(valor, bool):
+        raise ValueError(f"{campo} deve ser um id inteiro")
+    try:
+        i = int(str(valor).strip()) if isinstance(valor, str) else int(valor)
+    except (TypeError, ValueError):
+        raise ValueError(f"{campo} deve ser um id inteiro")
+    if isinstance(valor, float) and valor != i:
+        raise ValueError(f"{campo} deve ser um id inteiro")
+    if i <= 0:
+        raise ValueError(f"{campo} deve ser um id positivo")
+    return i
+
+
+def _parece_numero(valor: Any) -> bool:
+    if isinstance(valor, (int, float)):
+        return True
+    v = str(valor).strip()
+    return v.lstrip("+-").replace(".", "", 1).isdigit()
+
+
+def resolver_referencias(db: Session, comercio_id: int,
+                         categoria: Any = None, fornecedor: Any = None, unimed: Any = None) -> dict:
+    """
+    Resolve as referências de um produto. categoria/fornecedor são campos de id: precisam
+    ser inteiros positivos do comércio. unimed aceita id ou sigla (get-or-create); valor
+    numérico que não é id válido não vira sigla. Só as chaves informadas (não None) voltam
+    no dict: {"categoria_id", "fornecedor_id", "unimed_id"}. Erros -> ValueError.
+    """
+    out: dict[str, int] = {}
+
+    # ids vêm do cache; só vai ao banco se o id não estiver lá
+    if categoria is not None:
+        cat_id = _parse_id(categoria, "categoria")
+        if not categoria_existe(db, comercio_id, cat_id):
+            raise ValueError(f"Categoria {cat_id} não encontrada para o comércio {comercio_id}")
+        out["categoria_id"] = cat_id
+    if fornecedor is not None:
+        forn_id = _parse_id(fornecedor, "fornecedor")
+        if not fornecedor_existe(db, comercio_id, forn_id):
+            raise ValueError(f"Fornecedor {forn_id} não encontrado para o comércio {comercio_id}")
+        out["fornecedor_id"] = forn_id
+
+    if unimed is not None:
+        valor = str(_parse_id(unimed, "unimed")) if _parece_numero(unimed) else str(unimed).strip()
+        unimed_id = resolver_unidades(db, comercio_id, [valor]).get(valor)
+        if unimed_id is None:
+            raise ValueError(f"Unidade de medida {valor} não encontrada para o comércio {comercio_id}")
+        out["unimed_id"] = unimed_id
+
+    return out
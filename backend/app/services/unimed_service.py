@@ -0,0 +1,25 @@
+from sqlalchemy import or_, select
+from app.models.unimed_model import UnidadeMedida
+from app.utils.model_utils import colunas_do_modelo, linhas_para_dicts, selecionar_campos
+
+
+def listar_unidades(db, comercio_id: int | None = None, campos: list | None = None) -> list[dict]:
+    """
+    Lista unidades de medida como dicts (SELECT só das colunas pedidas).
+    - comercio_id informado: unidades do comércio + globais (comercio_id IS NULL)
+    - comercio_id None: apenas as globais
+    - campos: projeção (?fields=); None = todos
+    """
+    cond = UnidadeMedida.comercio_id.is_(None)
+    if comercio_id is not None:
+        cond = or_(UnidadeMedida.comercio_id == comercio_id, cond)
+
+    # unimed_id sempre vai no SELECT: ?fields= sem nenhum campo conhecido deixaria o
+    # select() sem colunas; sai do item se não foi pedido
+    stmt = (
+        select(*selecionar_campos(colunas_do_modelo(UnidadeMedida), campos, obrigatorios=("unimed_id",)))
+        .where(cond)
+        .order_by(UnidadeMedida.unimed_id.asc())
+    )
+    omitir = () if campos is None or "unimed_id" in campos else ("unimed_id",)
+    return linhas_para_dicts(db.execute(stmt), omitir=omitir)
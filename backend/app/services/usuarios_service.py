@@ -1,11 +1,29 @@
+import os
+import threading
+import time
 from typing import List
-from flask import current_app
-from sqlalchemy import func
+from flask import current_app, g, has_request_context
+from sqlalchemy import exists, func, select
 from sqlalchemy.orm import Session
 from app.models.comercios_model import Comercio
 from app.models.comercios_usuarios import ComercioUsuario
 from app.models.usuarios_model import Usuario
 from app.services.errors import ComercioServiceError
+from app.services.versoes_service import GLOBAL, versoes_de
+from app.utils.cache_utils import CacheTTL
+
+# (usuario_id, comercio_id) -> geração em que o positivo foi lido; só positivos (local a cada worker). Vínculo removido
+# em outro worker chega pela versão (0, 'acessos') de versoes_colecoes, que o trigger de
+# comercios_usuarios sobe em todo DELETE/UPDATE; cada worker confere a versão no máximo
+# uma vez a cada ACESSOS_VERSAO_INTERVALO segundos (0 = toda checagem).
+_cache_acessos = CacheTTL(
+    maxsize=int(os.getenv("ACESSOS_CACHE_TAMANHO", "4096")),
+    ttl=float(os.getenv("ACESSOS_CACHE_TTL", "30")),
+)
+ACESSOS_VERSAO_INTERVALO = float(os.getenv("ACESSOS_VERSAO_INTERVALO", "1"))
+_CHAVE_VERSAO = (GLOBAL, "acessos")
+_versao_acessos = {"versao": None, "conferida_em": float("-inf"), "limpezas": 0}
+_versao_lock = threading.Lock()
 
 def get_comercios_que_usuario_tem_acesso(db: Session, usuario_id: int) -> List[Comercio]:
     comercio_pk = getattr(Comercio, "comercio_id", None) or getattr(Comercio, "comercio_id", None)
@@ -42,6 +60,87 @@ def get_usuario_por_id(db: Session, usuario_id: int) -> Usuario | None:
     """Busca usuário pelo ID"""
     return db.query(Usuario).filter(Usuario.usuario_id == usuario_id).first()
 
+def existe_vinculo_usuario_comercio(db: Session, usuario_id: int, comercio_id: int) -> bool:
+    """
+    Um único EXISTS em comercios_usuarios(usuario_id, comercio_id),
+    coberto pelo índice da constraint uq_comercio_usuario.
+    """
+    stmt = select(
+        exists().where(
+            ComercioUsuario.usuario_id == usuario_id,
+            ComercioUsuario.comercio_id == comercio_id,
+        )
+    )
+    return bool(db.execute(stmt).scalar())
+
+def invalidar_acessos_usuario(usuario_id: int) -> None:
+    """
+    Deve ser chamado depois do commit de qualquer vínculo novo/removido do usuário.
+    Vale na hora para este worker; os outros veem a remoção pela versão de acessos.
+    """
+    usuario_id = int(usuario_id)
+    _cache_acessos.invalidar_se(lambda chave, _v: chave[0] == usuario_id)
+    _limpar_memo_request(lambda uid, cid: uid == usuario_id)
+
+def invalidar_acessos_comercio(comercio_id: int) -> None:
+    """Remove do cache todo acesso ao comércio (ex.: comércio excluído)."""
+    comercio_id = int(comercio_id)
+    _cache_acessos.invalidar_se(lambda chave, _v: chave[1] == comercio_id)
+    _limpar_memo_request(lambda uid, cid: cid == comercio_id)
+
+def _conferir_versao_acessos(db: Session) -> None:
+    """Limpa o cache local se a versão de acessos mudou desde a última conferência."""
+    agora = time.monotonic()
+    if agora - _versao_acessos["conferida_em"] < ACESSOS_VERSAO_INTERVALO:
+        return
+    versao = versoes_de(db, [_CHAVE_VERSAO])[_CHAVE_VERSAO]
+    with _versao_lock:
+        if _versao_acessos["versao"] is not None and versao != _versao_acessos["versao"]:
+            _cache_acessos.limpar()
+            _versao_acessos["limpezas"] += 1
+        _versao_acessos["versao"] = versao
+        _versao_acessos["conferida_em"] = agora
+
+def estatisticas_cache_acessos() -> dict:
+    with _versao_lock:
+        versao = {"versao": _versao_acessos["versao"], "limpezas_por_versao": _versao_acessos["limpezas"],
+                  "intervalo_versao": ACESSOS_VERSAO_INTERVALO}
+    return {**_cache_acessos.estatisticas(), **versao}
+
+def _limpar_memo_request(predicado) -> None:
+    if not has_request_context():
+        return
+    memo = g.get("_acessos_comercio")
+    if memo:
+        for chave in [k for k in memo if predicado(*k)]:
+            del memo[chave]
+
 def usuario_tem_acesso_ao_comercio(db, usuario_id: int, comercio_id: int) -> bool:
-    comercios = get_comercios_que_usuario_tem_acesso(db, usuario_id)
-    return any(getattr(c, "comercio_id") == comercio_id for c in comercios)
+    """
+    Verifica se o usuário tem vínculo com o comércio.
+    Dentro de uma request o resultado fica memorizado em `g`. Entre requests, positivos
+    vêm do cache de acessos (depois de conferir a versão de acessos, ver _cache_acessos);
+    negativos não são guardados: um EXISTS, porque outro worker pode ter criado o vínculo.
+    """
+    if usuario_id is None or comercio_id is None:
+        return False
+
+    chave = (int(usuario_id), int(comercio_id))
+    memo = g.setdefault("_acessos_comercio", {}) if has_request_context() else {}
+    if chave in memo:
+        return memo[chave]
+
+    if _cache_acessos.ativo:
+        _conferir_versao_acessos(db)
+    # geração lida antes do EXISTS: se a versão mudar enquanto ele roda, o positivo
+    # gravado já nasce velho e o get seguinte o ignora
+    geracao = _versao_acessos["limpezas"]
+    if _cache_acessos.get(chave) == geracao:
+        tem_acesso = True
+    else:
+        tem_acesso = existe_vinculo_usuario_comercio(db, *chave)
+        if tem_acesso:
+            _cache_acessos.set(chave, geracao)
+
+    memo[chave] = tem_acesso
+    return tem_acesso
@@ -0,0 +1,104 @@
+# app/services/versoes_service.py
+"""
+Versões por comércio/coleção (tabela versoes_colecoes) e os ETags das listagens.
+
+As versões sobem por triggers de statement nas tabelas listadas; o ETag de uma
+listagem é o hash das versões de tudo que aparece nela (ex.: produtos mostram nomes
+de categoria/fornecedor/unidade) + a query string. Ler as versões é uma query só,
+sem tocar nas tabelas de dados.
+
+Movimentações são a exceção: cada leitura de item no caixa atualiza o cabeçalho da
+movimentação aberta, e subir uma versão por comércio a cada uma viraria uma linha quente
+travada até o commit por todos os caixas. A versão delas só sobe em criação, exclusão,
+troca de estado e alteração de movimentação fechada; as abertas entram no ETag por hash
+(etag_movimentacoes). Essa coleção, portanto, ainda lê a tabela de dados para o 304.
+"""
+import hashlib
+
+from sqlalchemy import Text, cast, func, literal, literal_column, select, tuple_
+from sqlalchemy.dialects.postgresql import aggregate_order_by, insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.models.movimentacao_model import Movimentacao
+from app.models.versoes_colecoes import VersaoColecao
+
+GLOBAL = 0  # unidades globais
+
+# coleção listada -> coleções cujo conteúdo aparece na resposta
+DEPENDENCIAS = {
+    "produtos": ("produtos", "categorias", "fornecedores", "unidades"),
+    "categorias": ("categorias",),
+    "fornecedores": ("fornecedores",),
+    "unidades": ("unidades",),
+}
+
+
+def _chaves(comercio_id: int | None, colecao: str) -> list[tuple[int, str]]:
+    if comercio_id is None:
+        return [(GLOBAL, colecao)]
+    chaves = [(comercio_id, c) for c in DEPENDENCIAS[colecao]]
+    if "unidades" in DEPENDENCIAS[colecao]:
+        chaves.append((GLOBAL, "unidades"))
+    return chaves
+
+
+def versoes_de(db: Session, chaves: list[tuple[int, str]]) -> dict[tuple[int, str], int]:
+    """{(comercio_id, colecao): versao}; chave sem linha = versão 0."""
+    achadas = dict(
+        ((c, col), v) for c, col, v in db.execute(
+            select(VersaoColecao.comercio_id, VersaoColecao.colecao, VersaoColecao.versao)
+            .where(tuple_(VersaoColecao.comercio_id, VersaoColecao.colecao).in_(chaves))
+        )
+    )
+    return {k: achadas.get(k, 0) for k in chaves}
+
+
+def etag_colecao(db: Session, comercio_id: int | None, colecao: str, variante: bytes | str = b"") -> str:
+    """
+    ETag (sem aspas) da listagem `colecao` do comércio (None = unidades globais).
+    `variante` diferencia respostas da mesma coleção (query string: filtros, cursor, fields).
+    """
+    versoes = versoes_de(db, _chaves(comercio_id, colecao))
+    if isinstance(variante, str):
+        variante = variante.encode()
+    base = "|".join(f"{c}:{col}:{v}" for (c, col), v in sorted(versoes.items())).encode()
+    return f"{colecao}-{hashlib.blake2b(base + b'?' + variante, digest_size=12).hexdigest()}"
+
+
+def etag_movimentacoes(db: Session, comercio_id: int, variante: bytes | str = b"",
+                       apenas_abertas: bool = False) -> str:
+    """
+    ETag (sem aspas) das listagens de movimentações = versão (comercio_id, 'movimentacoes')
+    + md5 das linhas abertas inteiras, em ordem de mov_id. As fechadas só mudam junto com
+    a versão (trigger da 7d2f5a9c3e18), então o histórico não é lido; as abertas são
+    poucas e vêm pelo índice parcial ix_movimentacoes_comercio_abertas.
+    Não atende o "sem ler tabela de dados" das outras coleções: o 304 ainda lê as abertas.
+    Só lê, não trava.
+    """
+    chave = (comercio_id, "movimentacoes")
+    versao = versoes_de(db, [chave])[chave]
+    # movimentacoes::text = a linha inteira, qualquer coluna que mude entra no hash
+    linha = cast(literal_column(Movimentacao.__tablename__), Text)
+    total, resumo = db.execute(
+        select(
+            func.count(),
+            func.md5(func.coalesce(func.string_agg(linha, aggregate_order_by(literal(","), Movimentacao.mov_id)), "")),
+        ).where(Movimentacao.comercio_id == comercio_id, Movimentacao.estado == "aberta")
+    ).one()
+    if isinstance(variante, str):
+        variante = variante.encode()
+    base = f"{comercio_id}:{int(apenas_abertas)}:{versao}:{total}:{resumo}".encode()
+    return f"movimentacoes-{hashlib.blake2b(base + b'?' + variante, digest_size=12).hexdigest()}"
+
+
+def tocar_colecao(db: Session, comercio_id: int, colecao: str) -> None:
+    """
+    Sobe a versão na mão, SEM commit. Para mudanças que aparecem numa listagem mas não
+    passam pelas tabelas com trigger (endereço do fornecedor, limite de estoque do comércio).
+    """
+    tbl = VersaoColecao.__table__
+    ins = pg_insert(tbl).values(comercio_id=comercio_id, colecao=colecao, versao=1)
+    db.execute(ins.on_conflict_do_update(
+        index_elements=[tbl.c.comercio_id, tbl.c.colecao],
+        set_={"versao": tbl.c.versao + 1, "atualizado_em": func.now()},
+    ))
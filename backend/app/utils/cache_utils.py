@@ -0,0 +1,86 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class CacheTTL:
+    """
+    Cache LRU limitado com expiração por TTL, local ao processo (um por worker).
+    Thread-safe e com contadores de hit/miss/expiração para dimensionamento.
+    maxsize <= 0 desliga o cache (todo get vira miss e set é ignorado).
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = int(maxsize)
+        self.ttl = float(ttl)
+        self._dados: "OrderedDict[object, tuple[float, object]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expirados = 0
+        self.despejados = 0
+        self.invalidados = 0
+
+    @property
+    def ativo(self) -> bool:
+        return self.maxsize > 0
+
+    def get(self, chave, default=None):
+        agora = time.monotonic()
+        with self._lock:
+            entrada = self._dados.get(chave)
+            if entrada is None:
+                self.misses += 1
+                return default
+            expira_em, valor = entrada
+            if expira_em <= agora:
+                del self._dados[chave]
+                self.expirados += 1
+                self.misses += 1
+                return default
+            self._dados.move_to_end(chave)
+            self.hits += 1
+            return valor
+
+    def set(self, chave, valor) -> None:
+        if not self.ativo:
+            return
+        with self._lock:
+            self._dados[chave] = (time.monotonic() + self.ttl, valor)
+            self._dados.move_to_end(chave)
+            while len(self._dados) > self.maxsize:
+                self._dados.popitem(last=False)
+                self.despejados += 1
+
+    def invalidar(self, chave) -> None:
+        with self._lock:
+            if self._dados.pop(chave, None) is not None:
+                self.invalidados += 1
+
+    def invalidar_se(self, predicado) -> None:
+        """Remove toda entrada em que predicado(chave, valor) for verdadeiro."""
+        with self._lock:
+            alvos = [k for k, (_, v) in self._dados.items() if predicado(k, v)]
+            for k in alvos:
+                del self._dados[k]
+            self.invalidados += len(alvos)
+
+    def limpar(self) -> None:
+        with self._lock:
+            self.invalidados += len(self._dados)
+            self._dados.clear()
+
+    def estatisticas(self) -> dict:
+        with self._lock:
+            consultas = self.hits + self.misses
+            return {
+                "tamanho": len(self._dados),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": (self.hits / consultas) if consultas else None,
+                "expirados": self.expirados,
+                "despejados": self.despejados,
+                "invalidados": self.invalidados,
+            }
@@ -1,8 +1,8 @@
 from sqlalchemy.orm import Session
 
-from app.models import ComercioUsuario
 from app.models import Usuario
 from app.models import Comercio
+from app.services.usuarios_service import usuario_tem_acesso_ao_comercio
 
 
 def usuario_tem_acesso_comercio(user: Usuario, commerce: Comercio, db: Session) -> bool:
@@ -17,13 +17,4 @@ def usuario_tem_acesso_comercio(user: Usuario, commerce: Comercio, db: Session)
     if user_id is None or commerce_id is None:
         return False
 
-    registro = (
-        db.query(ComercioUsuario)
-        .filter(
-            ComercioUsuario.usuario_id == user_id,
-            ComercioUsuario.comercio_id == commerce_id,
-        )
-        .first()
-    )
-
-    return bool(registro)
+    return usuario_tem_acesso_ao_comercio(db, user_id, commerce_id)
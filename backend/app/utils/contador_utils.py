@@ -1,6 +1,10 @@
+import os
+import threading
+
 from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.exc import IntegrityError
 
+from app.database.request_session import conexao_lateral
 from app.models import ContadorLocal
 
 def next_codigo(session, comercio_id: int, scope: str, step: int = 1) -> int:
@@ -34,3 +38,82 @@ def next_codigo(session, comercio_id: int, scope: str, step: int = 1) -> int:
         # opcional: re-raise ou tratar caso queira retry/backoff
         raise
     return int(novo)
+
+
+# --- alocação em blocos ---------------------------------------------------
+# Em vez de um upsert em contadores_locais por código, reserva um bloco de N códigos
+# numa transação própria (já commitada) e entrega do bloco em memória do processo.
+# Consequências: códigos podem ficar com lacunas (bloco não usado até o restart, rollback
+# de quem pegou o código) e, com vários workers, não saem em ordem de criação.
+# Por isso escopos que precisam ser sem lacunas continuam no next_codigo estrito.
+CODIGOS_BLOCO_TAMANHO = int(os.getenv("CODIGOS_BLOCO_TAMANHO", "1"))
+ESCOPOS_SEM_LACUNA = frozenset(
+    s.strip() for s in os.getenv("CODIGOS_ESCOPOS_SEM_LACUNA", "mov_entrada,mov_saida").split(",") if s.strip()
+)
+
+_faixas: dict[tuple[int, str], list[int]] = {}  # (comercio_id, scope) -> [proximo, ultimo]
+_faixas_lock = threading.Lock()
+
+
+def _usa_bloco(scope: str) -> bool:
+    return CODIGOS_BLOCO_TAMANHO > 1 and scope not in ESCOPOS_SEM_LACUNA
+
+
+def _reservar_bloco(session, comercio_id: int, scope: str, tamanho: int) -> tuple[int, int]:
+    """
+    Reserva `tamanho` códigos numa conexão à parte, commitada na hora: a reserva não pode
+    ser desfeita pelo rollback de quem pediu, senão outro processo receberia os mesmos códigos.
+    A conexão extra é intencional (conexao_lateral), não vazamento da requisição.
+    """
+    with conexao_lateral(), session.get_bind().engine.begin() as conn:
+        ultimo = next_codigo(conn, comercio_id, scope, step=tamanho)
+    return ultimo - tamanho + 1, ultimo
+
+
+def alocar_codigos(session, comercio_id: int, scope: str, quantidade: int = 1) -> list[int]:
+    """
+    Retorna `quantidade` códigos novos para (comercio_id, scope).
+    - escopo sem lacuna ou CODIGOS_BLOCO_TAMANHO <= 1: next_codigo na transação de `session`
+      (um upsert só, mesmo para vários códigos)
+    - senão: usa a faixa reservada em memória, reservando outro bloco quando acaba
+    """
+    if quantidade <= 0:
+        raise ValueError("quantidade must be > 0")
+
+    if not _usa_bloco(scope):
+        ultimo = next_codigo(session, comercio_id, scope, step=quantidade)
+        return list(range(ultimo - quantidade + 1, ultimo + 1))
+
+    chave = (comercio_id, scope)
+    codigos: list[int] = []
+    with _faixas_lock:
+        faixa = _faixas.get(chave)
+        if faixa is not None:
+            fim = min(faixa[1], faixa[0] + quantidade - 1)
+            codigos.extend(range(faixa[0], fim + 1))
+            faixa[0] = fim + 1
+            if faixa[0] > faixa[1]:
+                del _faixas[chave]
+
+    faltam = quantidade - len(codigos)
+    if faltam:
+        # fora do lock: a reserva é uma ida ao banco. Se duas threads reservarem juntas,
+        # a sobra de uma delas é descartada (só gera lacuna, nunca código repetido)
+        inicio, fim = _reservar_bloco(session, comercio_id, scope, max(faltam, CODIGOS_BLOCO_TAMANHO))
+        codigos.extend(range(inicio, inicio + faltam))
+        if inicio + faltam <= fim:
+            with _faixas_lock:
+                _faixas[chave] = [inicio + faltam, fim]
+    return codigos
+
+
+def alocar_codigo(session, comercio_id: int, scope: str) -> int:
+    """Um código novo para (comercio_id, scope); ver alocar_codigos."""
+    return alocar_codigos(session, comercio_id, scope, 1)[0]
+
+
+def descartar_faixas(comercio_id: int | None = None) -> None:
+    """Esquece as faixas em memória (todas, ou só as do comércio)."""
+    with _faixas_lock:
+        for chave in [k for k in _faixas if comercio_id is None or k[0] == comercio_id]:
+            del _faixas[chave]
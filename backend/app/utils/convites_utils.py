@@ -4,6 +4,7 @@ from flask import g
 from sqlalchemy.exc import IntegrityError
 
 from app.models import *
+from app.services.usuarios_service import invalidar_acessos_usuario
 
 def validar_convite(invite_code: str, usuario: dict, db):
     """
@@ -89,6 +90,7 @@ def aceitar_convite(invite_code: str, usuario_id: int, db):
         )
         db.add(acesso)
         db.commit()
+        invalidar_acessos_usuario(usuario_id)
         
         return {"success": True, "message": "Convite aceito com sucesso"}
     except IntegrityError as e:
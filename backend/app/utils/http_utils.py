@@ -1,4 +1,6 @@
-from flask import request
+from datetime import datetime, timezone
+
+from flask import Response, jsonify, request
 
 
 def _parse_fields_arg():
@@ -17,4 +19,53 @@ def _filter_fields(obj_dict: dict, fields: list | None) -> dict:
     """Filtra obj_dict mantendo apenas keys em fields. Se fields for None, retorna obj_dict."""
     if fields is None:
         return obj_dict
-    return {k: v for k, v in obj_dict.items() if k in fields}
\ No newline at end of file
+    return {k: v for k, v in obj_dict.items() if k in fields}
+
+def _parse_int_arg(nome: str, default: int | None = None) -> int | None:
+    """
+    Lê um query param inteiro. Ausente/vazio -> default.
+    Lança ValueError com mensagem pronta para 400 se não for inteiro.
+    """
+    valor = request.args.get(nome)
+    if valor is None or valor.strip() == "":
+        return default
+    try:
+        return int(valor)
+    except ValueError:
+        raise ValueError(f"Parâmetro '{nome}' deve ser inteiro")
+
+
+def _parse_datetime_arg(nome: str) -> datetime | None:
+    """
+    Lê um query param ISO 8601 (data ou data/hora). Sem fuso -> UTC.
+    Lança ValueError com mensagem pronta para 400 se não for válido.
+    """
+    valor = request.args.get(nome)
+    if valor is None or valor.strip() == "":
+        return None
+    try:
+        momento = datetime.fromisoformat(valor.strip().replace("Z", "+00:00"))
+    except ValueError:
+        raise ValueError(f"Parâmetro '{nome}' deve ser data ISO 8601")
+    if momento.tzinfo is None:
+        momento = momento.replace(tzinfo=timezone.utc)
+    return momento
+
+
+def _nao_modificado(etag: str) -> Response | None:
+    """Resposta 304 se o If-None-Match do cliente bate com o ETag (fraco); senão None."""
+    if request.if_none_match and request.if_none_match.contains_weak(etag):
+        resp = Response(status=304)
+        resp.set_etag(etag, weak=True)
+        resp.headers["Cache-Control"] = "private, no-cache"
+        return resp
+    return None
+
+
+def _json_com_etag(payload, etag: str, status: int = 200) -> Response:
+    """jsonify + ETag fraco; no-cache obriga o navegador a revalidar (e receber 304)."""
+    resp = jsonify(payload)
+    resp.status_code = status
+    resp.set_etag(etag, weak=True)
+    resp.headers["Cache-Control"] = "private, no-cache"
+    return resp
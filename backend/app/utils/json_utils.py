@@ -0,0 +1,52 @@
+from decimal import Decimal
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # orjson é opcional; sem ele fica o provider padrão do Flask
+    orjson = None
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    JSON provider do Flask usando orjson quando instalado.
+    Mantém a saída do provider padrão: datetime/date em formato HTTP (via default do Flask),
+    Decimal -> str, chaves ordenadas conforme sort_keys.
+    """
+
+    def _opcoes(self, indent) -> int:
+        opcoes = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            opcoes |= orjson.OPT_SORT_KEYS
+        if indent:
+            opcoes |= orjson.OPT_INDENT_2
+        return opcoes
+
+    @staticmethod
+    def _default(o):
+        if isinstance(o, Decimal):
+            return str(o)
+        return DefaultJSONProvider.default(o)
+
+    def dumps(self, obj, **kwargs) -> str:
+        return orjson.dumps(obj, default=self._default, option=self._opcoes(kwargs.get("indent"))).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = self._app.debug if self.compact is None else not self.compact
+        return self._app.response_class(
+            orjson.dumps(obj, default=self._default, option=self._opcoes(indent)) + b"\n",
+            mimetype=self.mimetype,
+        )
+
+
+def configurar_json(flask_app) -> None:
+    """Troca o JSON provider do app pelo OrjsonProvider se o orjson estiver disponível."""
+    if orjson is None:
+        return
+    flask_app.json_provider_class = OrjsonProvider
+    flask_app.json = OrjsonProvider(flask_app)
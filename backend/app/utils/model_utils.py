@@ -1,32 +1,151 @@
-from datetime import date, datetime
+from datetime import date, datetime, time
 from decimal import Decimal
+import threading
 import uuid
 
+from sqlalchemy import inspect
+from sqlalchemy.types import Date, DateTime, Numeric, Time, Uuid
+
+
+def _iso(val):
+    return val.isoformat()
+
+
+# conversão por tipo Python, usada para linhas Core (onde só temos os valores)
+_CONVERSORES_POR_TIPO = {
+    datetime: _iso,
+    date: _iso,
+    time: _iso,
+    Decimal: str,
+    uuid.UUID: str,
+}
+
+_conversores_modelo: dict = {}
+_lock_conversores = threading.Lock()
+
+
+def _conversor_da_coluna(coluna):
+    """Escolhe a conversão pelo tipo declarado da coluna (uma vez por modelo)."""
+    tipo = coluna.type
+    if isinstance(tipo, (DateTime, Date, Time)):
+        return _iso
+    if isinstance(tipo, Numeric) and getattr(tipo, "asdecimal", False):
+        return str
+    if isinstance(tipo, Uuid):
+        return str
+    return None
+
+
+def _compilar_conversor(model):
+    mapper = inspect(model)
+    campos = []
+    for coluna in model.__table__.columns:
+        prop = mapper.get_property_by_column(coluna)
+        campos.append((coluna.name, prop.key, _conversor_da_coluna(coluna)))
+    campos = tuple(campos)
+
+    def converter(obj) -> dict:
+        out = {}
+        for nome, chave, conv in campos:
+            val = getattr(obj, chave)
+            out[nome] = val if conv is None or val is None else conv(val)
+        return out
+
+    return converter
+
+
+def conversor_do_modelo(model):
+    """Retorna (e guarda) a função obj -> dict compilada para a classe `model`."""
+    conv = _conversores_modelo.get(model)
+    if conv is None:
+        with _lock_conversores:
+            conv = _conversores_modelo.get(model)
+            if conv is None:
+                conv = _compilar_conversor(model)
+                _conversores_modelo[model] = conv
+    return conv
+
 
 def model_to_dict(obj):
     """
     Converte um objeto SQLAlchemy para dict usando as colunas definidas em obj.__table__.
-    Trata tipos comuns: datetime/date -> ISO string, Decimal -> float, UUID -> str.
-    Se algo falhar, faz um fallback para __dict__ omitindo chaves privadas.
+    Trata tipos comuns: datetime/date -> ISO string, Decimal -> str, UUID -> str.
+    O conversor de cada modelo é montado uma vez a partir dos tipos das colunas.
+    Objetos que não são modelos mapeados caem no __dict__ omitindo chaves privadas.
     """
-    try:
-        cols = getattr(obj, "__table__", None).columns
-        out = {}
-        for c in cols:
-            name = c.name
-            val = getattr(obj, name)
-            if isinstance(val, (datetime, date)):
-                out[name] = val.isoformat()
-            elif isinstance(val, Decimal):
-                try:
-                    out[name] = str(val)
-                except (ValueError, TypeError):
-                    raise
-            elif isinstance(val, uuid.UUID):
-                out[name] = str(val)
-            else:
-                out[name] = val
-        return out
-    except Exception:
-        # fallback, usa __dict__ omitindo keys privadas
-        return {k: v for k, v in getattr(obj, "__dict__", {}).items() if not k.startswith("_")}
\ No newline at end of file
+    if getattr(obj, "__table__", None) is None:
+        return {k: v for k, v in getattr(obj, "__dict__", {}).items() if not k.startswith("_")}
+    return conversor_do_modelo(type(obj))(obj)
+
+
+def models_to_dicts(objs) -> list[dict]:
+    """model_to_dict em lote; resolve o conversor uma vez por classe."""
+    out = []
+    ultimo_tipo = conv = None
+    for obj in objs:
+        tipo = type(obj)
+        if tipo is not ultimo_tipo:
+            ultimo_tipo = tipo
+            conv = conversor_do_modelo(tipo) if getattr(obj, "__table__", None) is not None else model_to_dict
+        out.append(conv(obj))
+    return out
+
+
+def _valor_json(val):
+    """Mesma conversão de model_to_dict, para valores soltos (linhas Core)."""
+    conv = _CONVERSORES_POR_TIPO.get(type(val))
+    return val if conv is None else conv(val)
+
+
+def colunas_do_modelo(model) -> dict:
+    """{nome_da_coluna: Column} na ordem da tabela; base para projeções Core."""
+    return {c.name: c for c in model.__table__.columns}
+
+
+def selecionar_campos(disponiveis: dict, fields: list | None, obrigatorios=()) -> list:
+    """
+    Monta a lista de colunas (rotuladas pelo nome de saída) para um select().
+    - disponiveis: {nome_saida: expressão SQL}
+    - fields: resultado de _parse_fields_arg(); None = todos. Nomes desconhecidos são ignorados,
+      como o _filter_fields fazia.
+    - obrigatorios: nomes sempre selecionados (ex.: chaves do cursor), mesmo fora de fields
+    """
+    nomes = list(disponiveis) if fields is None else [n for n in disponiveis if n in fields]
+    for n in obrigatorios:
+        if n not in nomes:
+            nomes.append(n)
+    return [disponiveis[n].label(n) for n in nomes]
+
+
+def linha_para_dict(row, omitir=()) -> dict:
+    """Converte uma Row do Core (select de colunas) em dict serializável."""
+    return {k: _valor_json(v) for k, v in row._mapping.items() if k not in omitir}
+
+
+def linhas_para_dicts(linhas, omitir=()) -> list[dict]:
+    """
+    Converte um lote de Rows do Core. As chaves e a conversão de cada coluna são
+    resolvidas uma vez (pelo primeiro valor não nulo) em vez de a cada célula.
+    """
+    linhas = list(linhas)
+    if not linhas:
+        return []
+    chaves = [k for k in linhas[0]._mapping.keys()]
+    indices = [i for i, k in enumerate(chaves) if k not in omitir]
+
+    convs = {}
+    for i in indices:
+        for row in linhas:
+            if row[i] is not None:
+                convs[i] = _CONVERSORES_POR_TIPO.get(type(row[i]))
+                break
+
+    campos = [(chaves[i], i, convs.get(i)) for i in indices]
+    out = []
+    for row in linhas:
+        d = {}
+        for nome, i, conv in campos:
+            val = row[i]
+            d[nome] = val if conv is None or val is None else conv(val)
+        out.append(d)
+    return out
@@ -0,0 +1,57 @@
+# benchmarks/bench_app_usuario_id.py
+"""
+Latência por transação: set_config por transação (antes) x uma vez por conexão (agora).
+
+Opt-in, precisa de um Postgres:
+    DATABASE_URL=postgresql+psycopg2://... python -m benchmarks.bench_app_usuario_id [--transacoes 2000]
+Sem DATABASE_URL sai sem fazer nada. Não grava nada no banco.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+from sqlalchemy import create_engine, text
+
+
+def _medir(conn, transacoes: int, por_transacao: bool) -> list[float]:
+    tempos = []
+    if not por_transacao:
+        conn.execute(text("SELECT set_config('app.usuario_id', '1', false)"))
+        conn.commit()
+    for _ in range(transacoes):
+        inicio = time.perf_counter()
+        if por_transacao:
+            conn.execute(text("SELECT set_config('app.usuario_id', '1', true)"))
+        conn.execute(text("SELECT current_setting('app.usuario_id', true)"))
+        conn.commit()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return tempos
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--transacoes", type=int, default=2000)
+    args = parser.parse_args()
+
+    url = os.getenv("DATABASE_URL")
+    if not url:
+        print("DATABASE_URL não definida; benchmark pulado.")
+        return 0
+
+    engine = create_engine(url, future=True)
+    with engine.connect() as conn:
+        _medir(conn, 100, True)  # aquecimento
+        antes = _medir(conn, args.transacoes, True)
+        agora = _medir(conn, args.transacoes, False)
+    engine.dispose()
+
+    for nome, tempos in (("set_config por transação", antes), ("uma vez por conexão", agora)):
+        print(f"{nome:26s} média {statistics.mean(tempos):.3f} ms  p50 {statistics.median(tempos):.3f} ms")
+    print(f"economia por transação: {statistics.mean(antes) - statistics.mean(agora):.3f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+# benchmarks/bench_rls.py
+"""
+Custo das policies RLS em produtos: mesmas consultas com RLS desligado x ligado.
+
+Opt-in, precisa de um Postgres já migrado (alembic upgrade head):
+    DATABASE_URL=postgresql+psycopg2://... python -m benchmarks.bench_rls [--linhas 100000]
+Sem DATABASE_URL sai sem fazer nada.
+
+Tudo roda numa transação que é desfeita no fim: usuário, comércios e produtos de teste
+somem, e o FORCE ROW LEVEL SECURITY (o dono da tabela ignora as policies sem ele) também.
+O FORCE trava produtos até o rollback — rodar só em banco de desenvolvimento.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+import uuid
+
+from sqlalchemy import create_engine, text
+
+CONSULTAS = {
+    "contagem": "SELECT count(*) FROM produtos WHERE comercio_id = :c",
+    "primeira página": "SELECT produto_id, nome, preco FROM produtos WHERE comercio_id = :c "
+                       "ORDER BY codigo LIMIT 100",
+    "busca por prefixo": "SELECT produto_id FROM produtos WHERE comercio_id = :c "
+                         "AND lower(nome) LIKE 'produto 12%'",
+}
+
+
+def _preparar(conn, linhas: int, comercios: int) -> int:
+    """Cria usuário + `comercios` comércios (membro só do primeiro) e `linhas` produtos; devolve o comercio_id medido."""
+    sufixo = uuid.uuid4().hex[:12]
+    usuario_id = conn.execute(text(
+        "INSERT INTO usuarios (email, nome_completo, senha_hash) VALUES (:e, 'bench', 'x') RETURNING usuario_id"
+    ), {"e": f"bench-{sufixo}@frog.test"}).scalar_one()
+    ids = [
+        conn.execute(text(
+            "INSERT INTO comercios (proprietario_id, nome) VALUES (:u, :n) RETURNING comercio_id"
+        ), {"u": usuario_id, "n": f"bench-{sufixo}-{i}"}).scalar_one()
+        for i in range(comercios)
+    ]
+    conn.execute(text(
+        "INSERT INTO comercios_usuarios (comercio_id, usuario_id, permissao) VALUES (:c, :u, 'operador')"
+    ), {"c": ids[0], "u": usuario_id})
+
+    unimed_id = conn.execute(text(
+        "SELECT unimed_id FROM unidade_medidas WHERE comercio_id IS NULL ORDER BY unimed_id LIMIT 1"
+    )).scalar_one()
+    conn.execute(text("""
+        INSERT INTO produtos (codigo, nome, preco, quantidade_estoque, comercio_id, unimed_id)
+        SELECT g, 'produto ' || g, (g % 1000) / 10.0, g % 50, (:ids)[1 + g % :n], :unimed
+        FROM generate_series(1, :linhas) AS g
+    """), {"ids": ids, "n": comercios, "unimed": unimed_id, "linhas": linhas})
+    conn.execute(text("ANALYZE produtos"))
+    conn.execute(text("SELECT set_config('app.usuario_id', :u, true)"), {"u": str(usuario_id)})
+    return ids[0]
+
+
+def _medir(conn, sql: str, comercio_id: int, repeticoes: int) -> list[float]:
+    stmt = text(sql)
+    for _ in range(10):  # aquecimento
+        conn.execute(stmt, {"c": comercio_id}).all()
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        conn.execute(stmt, {"c": comercio_id}).all()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return tempos
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--linhas", type=int, default=100_000)
+    parser.add_argument("--comercios", type=int, default=10)
+    parser.add_argument("--repeticoes", type=int, default=200)
+    args = parser.parse_args()
+
+    url = os.getenv("DATABASE_URL")
+    if not url:
+        print("DATABASE_URL não definida; benchmark pulado.")
+        return 0
+
+    engine = create_engine(url, future=True)
+    resultados = {}
+    with engine.connect() as conn:
+        trans = conn.begin()
+        try:
+            comercio_id = _preparar(conn, args.linhas, args.comercios)
+            for nome, sql in CONSULTAS.items():
+                resultados[nome] = [_medir(conn, sql, comercio_id, args.repeticoes)]
+            conn.execute(text("ALTER TABLE produtos FORCE ROW LEVEL SECURITY"))
+            # sanidade: com a policy valendo, produtos de outros comércios somem
+            if conn.execute(text("SELECT count(*) FROM produtos WHERE comercio_id <> :c"),
+                            {"c": comercio_id}).scalar_one():
+                print("RLS não está filtrando (papel com BYPASSRLS?); números abaixo não comparam nada.")
+            for nome, sql in CONSULTAS.items():
+                resultados[nome].append(_medir(conn, sql, comercio_id, args.repeticoes))
+        finally:
+            trans.rollback()
+    engine.dispose()
+
+    print(f"{args.linhas} produtos em {args.comercios} comércios, {args.repeticoes} execuções por consulta")
+    for nome, (sem, com) in resultados.items():
+        print(f"{nome:18s} sem RLS média {statistics.mean(sem):.3f} ms p50 {statistics.median(sem):.3f} ms | "
+              f"com RLS média {statistics.mean(com):.3f} ms p50 {statistics.median(com):.3f} ms | "
+              f"+{statistics.mean(com) - statistics.mean(sem):.3f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
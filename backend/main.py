@@ -33,6 +33,9 @@ def create_app():
     flask_app = Flask(__name__)
     flask_app.url_map.strict_slashes = False
 
+    from app.utils.json_utils import configurar_json
+    configurar_json(flask_app)
+
     CORS(
         flask_app,
         resources={r"/*": {"origins": ["http://localhost:5173"]}},
@@ -43,9 +46,14 @@ def create_app():
     )
     
     import app.database.session_listeners
+    from app.database.request_session import registrar_sessao_por_requisicao
+    registrar_sessao_por_requisicao(flask_app)
 
     register_blueprints(flask_app)
 
+    from app.commands import registrar_comandos
+    registrar_comandos(flask_app)
+
     print("=== Rotas registradas (app.url_map) ===")
     for rule in flask_app.url_map.iter_rules():
         print(rule, "methods=", sorted(rule.methods), "->", rule.endpoint)
@@ -0,0 +1,98 @@
+# tests/conftest.py
+"""
+Fixtures dos testes de integração. Eles rodam contra um Postgres de verdade, já
+migrado (alembic upgrade head), apontado por DATABASE_URL:
+
+    DATABASE_URL=postgresql+psycopg2://... python -m pytest
+
+Sem DATABASE_URL os testes que usam o banco são pulados. Cada teste cria o próprio
+usuário/comércio (nomes aleatórios) e apaga tudo no fim.
+"""
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+pytest.importorskip("flask")
+pytest.importorskip("sqlalchemy")
+pytest.importorskip("jwt")
+pytest.importorskip("psycopg2")
+
+
+@pytest.fixture(scope="session")
+def database_url():
+    url = os.getenv("DATABASE_URL")
+    if not url:
+        pytest.skip("DATABASE_URL não definida; testes com banco pulados")
+    return url
+
+
+@pytest.fixture(scope="session")
+def engine(database_url):
+    # app.database.database lê DATABASE_URL no import, por isso o import fica aqui
+    from app.database.database import engine as app_engine
+    return app_engine
+
+
+@pytest.fixture(scope="session")
+def app(engine):
+    from main import create_app
+    flask_app = create_app()
+    flask_app.config.update(TESTING=True)
+    return flask_app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def db(engine):
+    from app.database.database import SessionLocal
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def comercio(db, engine):
+    """(usuario_id, comercio_id) de um comércio novo, com o usuário como operador."""
+    from sqlalchemy import text
+    from app.models.usuarios_model import Usuario
+    from app.services.cadastro_comercio_service import criar_comercio
+
+    sufixo = uuid.uuid4().hex[:12]
+    usuario = Usuario(email=f"teste-{sufixo}@frog.test", nome_completo="Teste", senha_hash="x")
+    db.add(usuario)
+    db.commit()
+    comercio = criar_comercio(db, usuario.usuario_id, f"teste-{sufixo}", configs={"campo4": "0"})
+    ids = (usuario.usuario_id, comercio.comercio_id)
+    db.close()
+
+    yield ids
+
+    usuario_id, comercio_id = ids
+    with engine.begin() as conn:
+        # carrinho_itens -> produtos é RESTRICT: carrinhos (e com eles itens e movimentações) antes
+        conn.execute(text("DELETE FROM carrinhos WHERE comercio_id = :c"), {"c": comercio_id})
+        conn.execute(text("DELETE FROM comercios WHERE comercio_id = :c"), {"c": comercio_id})
+    try:
+        with engine.begin() as conn:
+            conn.execute(text("DELETE FROM usuarios WHERE usuario_id = :u"), {"u": usuario_id})
+    except Exception:
+        pass  # logs.alterado_por não tem ON DELETE; o usuário de teste fica para trás
+
+
+@pytest.fixture
+def token(comercio):
+    """Authorization header para o usuário do comércio de teste."""
+    import jwt
+    from app.middleware.auth import SECRET_KEY
+
+    agora = datetime.now(timezone.utc)
+    claims = {"usuario_id": comercio[0], "iat": agora, "exp": agora + timedelta(minutes=10)}
+    return {"Authorization": f"Bearer {jwt.encode(claims, SECRET_KEY, algorithm='HS256')}"}
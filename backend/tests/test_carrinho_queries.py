@@ -0,0 +1,72 @@
+# tests/test_carrinho_queries.py
+"""GET do carrinho faz o mesmo número de queries com 1 ou muitos itens (sem N+1)."""
+from contextlib import contextmanager
+from decimal import Decimal
+
+from sqlalchemy import event, select
+
+
+@contextmanager
+def contar_queries(engine):
+    """Lista dos statements executados no bloco (o set_config de app.usuario_id fica de fora)."""
+    statements = []
+
+    def _antes(conn, cursor, statement, parameters, context, executemany):
+        if "set_config('app.usuario_id'" not in statement:
+            statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", _antes)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", _antes)
+
+
+def _carrinho_com_itens(db, comercio_id: int, quantidade_itens: int) -> str:
+    """Cria movimentação com `quantidade_itens` produtos distintos no carrinho; retorna o link."""
+    # app.* cria o engine no import: só depois do skip por falta de DATABASE_URL
+    from app.models.produtos_model import Produto
+    from app.models.unimed_model import UnidadeMedida
+    from app.services.movimentacao_service import adicionar_produtos_em_lote, criar_movimentacao_vazia
+    from app.utils.contador_utils import alocar_codigos
+
+    unimed_id = db.execute(
+        select(UnidadeMedida.unimed_id).where(UnidadeMedida.comercio_id.is_(None)).limit(1)
+    ).scalar_one()
+    codigos = alocar_codigos(db, comercio_id, "produtos", quantidade_itens)
+    produtos = [
+        Produto(codigo=c, nome=f"produto {c}", preco=Decimal("1.50"), quantidade_estoque=100,
+                comercio_id=comercio_id, unimed_id=unimed_id)
+        for c in codigos
+    ]
+    db.add_all(produtos)
+    db.flush()
+
+    mov = criar_movimentacao_vazia(db, "saida", comercio_id)
+    adicionar_produtos_em_lote(db, mov.carrinho_id, comercio_id,
+                               [{"produto_id": p.produto_id, "quantidade": 2} for p in produtos])
+    db.commit()
+    return mov.link
+
+
+def test_get_carrinho_numero_constante_de_queries(client, engine, db, comercio, token):
+    usuario_id, comercio_id = comercio
+    link_1 = _carrinho_com_itens(db, comercio_id, 1)
+    link_30 = _carrinho_com_itens(db, comercio_id, 30)
+
+    def _get(link):
+        resp = client.get(f"/api/movimentacoes/{link}/carrinho?comercio_id={comercio_id}", headers=token)
+        assert resp.status_code == 200, resp.get_json()
+        return resp.get_json()
+
+    _get(link_1)  # aquecimento (conexão do pool, metadata)
+
+    with contar_queries(engine) as com_1:
+        corpo_1 = _get(link_1)
+    with contar_queries(engine) as com_30:
+        corpo_30 = _get(link_30)
+
+    assert len(corpo_1["carrinho"]["itens"]) == 1
+    assert len(corpo_30["carrinho"]["itens"]) == 30
+    assert all(i["unidade"] is not None for i in corpo_30["carrinho"]["itens"])
+    assert len(com_30) == len(com_1), "\n".join(com_30)
@@ -0,0 +1,70 @@
+# tests/test_explain_indices.py
+"""
+Regressão dos índices das rotas (d81f4b7c2e95, 4a9c2e7f1b36): o plano das consultas
+quentes tem que usar o índice esperado. Todo índice que a d81f4b7c2e95 cria tem pelo
+menos uma consulta aqui, mais as linhas do carrinho (atendidas por uq_carrinho_produto).
+
+enable_seqscan fica desligado na transação do teste: com as tabelas quase vazias de
+um banco de teste o planner prefere seq scan sempre, e o que se quer verificar aqui
+é que o índice existe e casa com o formato da consulta (colunas, predicado parcial,
+expressão lower()).
+"""
+import json
+
+import pytest
+from sqlalchemy import text
+
+CONSULTAS = [
+    pytest.param(
+        "SELECT mov_id FROM movimentacoes WHERE comercio_id = :c AND estado = 'aberta' ORDER BY mov_id",
+        "ix_movimentacoes_comercio_abertas", id="movimentacoes-abertas"),
+    pytest.param(
+        "SELECT mov_id, estado, total_itens FROM movimentacoes WHERE comercio_id = :c ORDER BY mov_id",
+        "ix_movimentacoes_comercio_mov", id="movimentacoes-listagem"),
+    pytest.param(
+        "SELECT mov_id FROM movimentacoes WHERE carrinho_id = :c",
+        "ix_movimentacoes_carrinho_id", id="movimentacao-por-carrinho"),
+    pytest.param(
+        "SELECT mov_id FROM movimentacoes WHERE comercio_id = :c "
+        "AND fechado_em IS NOT NULL AND fechado_em >= now() - interval '30 days'",
+        "ix_movimentacoes_comercio_fechado_em", id="movimentacoes-fechadas-periodo"),
+    pytest.param(
+        "SELECT produto_id FROM produtos WHERE comercio_id = :c AND lower(nome) LIKE 'arr%'",
+        "ix_produtos_comercio_lower_nome", id="produtos-prefixo-nome"),
+    pytest.param(
+        "SELECT produto_id FROM produtos WHERE comercio_id = :c AND quantidade_estoque = 0",
+        "ix_produtos_comercio_estoque", id="produtos-estoque-zerado"),
+    pytest.param(
+        "SELECT comercio_id FROM comercios_usuarios WHERE usuario_id = :c",
+        "ix_comercios_usuarios_usuario_comercio", id="acessos-do-usuario"),
+    pytest.param(
+        # rota_get_comercio_link: convite mais recente do comércio
+        "SELECT * FROM convites WHERE comercio_id = :c ORDER BY criado_em DESC LIMIT 1",
+        "ix_convites_comercio_criado_em", id="ultimo-convite"),
+    pytest.param(
+        # _linhas_itens_carrinho
+        "SELECT item_id, quantidade, subtotal FROM carrinho_itens WHERE carrinho_id = :c ORDER BY item_id",
+        "uq_carrinho_produto", id="linhas-do-carrinho"),
+    pytest.param(
+        "SELECT fornecedor_id FROM fornecedores WHERE comercio_id = :c AND lower(nome) IN ('a', 'b')",
+        "ux_fornecedores_comercio_lower_nome", id="fornecedores-por-nome"),
+]
+
+
+def _indices_no_plano(no: dict) -> set[str]:
+    achados = {no["Index Name"]} if "Index Name" in no else set()
+    for filho in no.get("Plans", ()):
+        achados |= _indices_no_plano(filho)
+    return achados
+
+
+@pytest.mark.parametrize("sql, indice", CONSULTAS)
+def test_consulta_usa_indice(engine, sql, indice):
+    with engine.connect() as conn, conn.begin() as trans:
+        conn.execute(text("SET LOCAL enable_seqscan = off"))
+        plano = conn.execute(text(f"EXPLAIN (FORMAT JSON) {sql}"), {"c": 1}).scalar_one()
+        trans.rollback()
+    if isinstance(plano, str):
+        plano = json.loads(plano)
+    usados = _indices_no_plano(plano[0]["Plan"])
+    assert indice in usados, f"{indice} não usado; plano usou {sorted(usados) or 'nenhum índice'}"